@@ -0,0 +1,144 @@
+"""
+Cold-start benchmark for the AgentCore runtime module.
+
+Spawns fresh interpreters that import `travel_agent` under `-X importtime`
+and reports, as medians over `--runs`:
+
+- wall time of `import travel_agent` (what gates `app.run()` accepting traffic)
+- time until `get_config()` is ready (background secret fetch + resolution)
+- optionally, time to the first completed `invoke` against the local mock
+  Cortex/Wikipedia server with a fake Bedrock agent (`--first-request`)
+- the slowest imports by self time (module body execution, incl. travel_agent)
+
+    python benchmarks/cold_start.py --runs 5 --first-request
+"""
+
+import argparse, json, os, statistics, subprocess, sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import travel_agent
+t_import = time.perf_counter() - t0
+travel_agent.get_config()
+t_config = time.perf_counter() - t0
+out = {"import_seconds": t_import, "config_seconds": t_config}
+if FIRST_REQUEST:
+    sys.path.insert(0, HERE)
+    from load_test import FakeAgent, decode_response
+    import travel_planner.agents
+    travel_planner.agents.Agent = FakeAgent
+    t1 = time.perf_counter()
+    res = decode_response(travel_agent.invoke({"prompt": "Singapore to Tokyo for 3 nights", "bypass_cache": True}))
+    out["first_invoke_seconds"] = time.perf_counter() - t1
+    out["first_request_ready_seconds"] = time.perf_counter() - t0
+    out["first_invoke_error"] = res.get("error") if isinstance(res, dict) else None
+print("COLD_START " + json.dumps(out))
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Return `{module: self_us}` from `-X importtime` output.
+
+    Self time is used rather than cumulative time because the nesting depth
+    in that output is a process-wide counter, which imports running on the
+    module's background startup thread would scramble.
+    """
+    out = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line.split("|")
+        if len(parts) < 3:
+            continue
+        try:
+            self_us = int(parts[0].split(":", 1)[1].strip())
+        except ValueError:
+            continue
+        name = parts[2].strip()
+        out[name] = out.get(name, 0) + self_us
+    return out
+
+
+def run_once(env, first_request):
+    code = CHILD.replace("FIRST_REQUEST", repr(bool(first_request))).replace("HERE", repr(HERE))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300,
+    )
+    result = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("COLD_START "):
+            result = json.loads(line[len("COLD_START "):])
+    if result is None:
+        raise RuntimeError(f"child failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure travel_agent cold-start time.")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15, help="number of slowest imports to show")
+    ap.add_argument("--first-request", action="store_true", help="also time the first invoke against the mock server")
+    ap.add_argument("--keep-secrets", action="store_true", help="keep AGENTCORE_SECRET_NAME (fetch real secrets)")
+    ap.add_argument("--json", help="also write the report to this file")
+    args = ap.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("SNOWFLAKE_ACCOUNT", "mock-account")
+    env.setdefault("SNOWFLAKE_AUTH_TOKEN", "mock-token")
+    env.setdefault("AGENT_POOL_WARM", "false")
+    if not args.keep_secrets:
+        env["AGENTCORE_SECRET_NAME"] = ""
+    server = None
+    if args.first_request:
+        from mock_servers import MockConfig, start_mock_server
+
+        server, url = start_mock_server(config=MockConfig(cortex_latency=0.2, wiki_latency=0.02))
+        env["CORTEX_BASE_URL"] = url
+        env["WIKI_BASE_URL"] = f"{url}/api/rest_v1"
+
+    runs = [run_once(env, args.first_request) for _ in range(args.runs)]
+    if server is not None:
+        server.shutdown()
+
+    def med(key):
+        vals = [r[key] for r in runs if isinstance(r.get(key), (int, float))]
+        return round(statistics.median(vals), 4) if vals else None
+
+    modules = {}
+    for r in runs:
+        for mod, us in r["imports"].items():
+            modules.setdefault(mod, []).append(us)
+    slowest = sorted(((m, statistics.median(v)) for m, v in modules.items()), key=lambda x: -x[1])[: args.top]
+
+    report = {
+        "runs": args.runs,
+        "import_seconds": med("import_seconds"),
+        "config_seconds": med("config_seconds"),
+        "first_invoke_seconds": med("first_invoke_seconds"),
+        "first_request_ready_seconds": med("first_request_ready_seconds"),
+        "slowest_imports_ms": {m: round(us / 1000, 2) for m, us in slowest},
+    }
+    print(f"runs={report['runs']}")
+    print(f"import travel_agent      {report['import_seconds']}s (median)")
+    print(f"config ready             {report['config_seconds']}s")
+    if args.first_request:
+        print(f"first invoke             {report['first_invoke_seconds']}s")
+        print(f"process start -> answer  {report['first_request_ready_seconds']}s")
+    print("slowest imports (self time, ms):")
+    for mod, ms in report["slowest_imports_ms"].items():
+        print(f"  {ms:>9.2f}  {mod}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Load-test harness for the `invoke` entrypoint in `travel_agent.py`.
+
+Drives `invoke` in-process at a chosen concurrency against the local mock
+Cortex Agent + Wikipedia server (`benchmarks/mock_servers.py`) and a fake
+Bedrock agent with configurable latency, then reports p50/p95/p99 latency,
+throughput, error rate and a per-stage breakdown taken from
+`raw_context["timings"]`. No Snowflake, Bedrock or Wikipedia access needed.
+
+    python benchmarks/load_test.py --requests 200 --concurrency 16
+    python benchmarks/load_test.py --max-p95 3.0 --json results.json
+
+`--max-p95` / `--max-error-rate` make the script exit non-zero when the
+budget is exceeded, so it can gate deploys.
+"""
+
+import argparse, concurrent.futures, json, os, sys, threading, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+from mock_servers import MockConfig, start_mock_server  # noqa: E402
+
+DEFAULT_PROMPTS = [
+    "I want to go from Delhi to Pune for 3 nights, need a hotel with breakfast, and a sightseeing plan",
+    "Plan an 8-day family trip from Bengaluru to Singapore, with hotels, sightseeing and budget.",
+    "Cheapest direct flight from Singapore to Tokyo and a 4-star hotel near Shinjuku",
+    "Honeymoon in Bali for 5 nights from Singapore with a luxury resort",
+    "Business trip from Hong Kong to Seoul for 2 nights, hotel with free Wi-Fi",
+    "Weekend in Kuala Lumpur from Jakarta, budget hotel and street food tour",
+    "Bangkok to Tokyo then Kyoto and Osaka for 7 days",
+    "Sydney to Auckland and Queenstown adventure trip for 6 nights",
+]
+
+
+class FakeAgent:
+    """Stand-in for `strands.Agent` with fixed latency and canned answers."""
+
+    latency = 0.4
+
+    def __init__(self, model=None, system_prompt=None, tools=None, **kwargs):
+        self.model = model
+        self.system_prompt = system_prompt or ""
+        self.tools = list(tools or [])
+        self.messages = []
+
+    def __call__(self, prompt):
+        time.sleep(self.latency)
+        if "extractor" in self.system_prompt:
+            return json.dumps({"destinations": ["Singapore"]})
+        if self.tools:
+            # WIKI_PIPELINE_MODE=fused: look the destination up through the
+            # tool, then answer destinations and summary in one reply.
+            self.tools[0](titles=["Singapore"])
+            return json.dumps({
+                "destinations": ["Singapore"],
+                "travel_summary": "#### Highlights\n- Great food, easy transport and family-friendly sights.",
+            })
+        return "#### Highlights\n- Great food, easy transport and family-friendly sights."
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 4) if values else 0.0,
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(max(values), 4) if values else 0.0,
+    }
+
+
+def _stage_seconds(result):
+    """Flatten `raw_context["timings"]` into `{stage: seconds}`."""
+    ctx = (result or {}).get("raw_context") or {}
+    timings = ctx.get("timings") or {}
+    out = {}
+    for stage, t in timings.items():
+        if isinstance(t, dict) and isinstance(t.get("seconds"), (int, float)):
+            out[stage] = t["seconds"]
+    return out
+
+
+def decode_response(result):
+    """`invoke` returns a pre-serialised JSON response under AgentCore; turn it back into a dict."""
+    body = getattr(result, "body", None)
+    return json.loads(body) if body is not None else result
+
+
+def run_load(invoke, prompts, total, concurrency, payload_extra=None):
+    """Call `invoke` `total` times with `concurrency` workers; return raw samples."""
+    samples, lock = [], threading.Lock()
+    payload_extra = payload_extra or {}
+
+    def one(i):
+        payload = {"prompt": prompts[i % len(prompts)], **payload_extra}
+        t0 = time.perf_counter()
+        try:
+            result = invoke(payload)
+            if hasattr(result, "__next__"):
+                # Streaming mode: drain the generator, note the first text delta
+                # (or the final event, for cache hits) and keep the final result.
+                first, final = None, None
+                for ev in result:
+                    kind = ev.get("type") if isinstance(ev, dict) else None
+                    if first is None and kind in ("delta", "final"):
+                        first = time.perf_counter() - t0
+                    if kind == "final":
+                        final = ev.get("data")
+                result = final or {"error": "stream ended without a final event"}
+            else:
+                first = None
+                result = decode_response(result)
+            err = result.get("error") if isinstance(result, dict) else None
+        except Exception as e:
+            result, err, first = None, str(e), None
+        elapsed = time.perf_counter() - t0
+        with lock:
+            samples.append({"seconds": elapsed, "first_token": first, "error": err, "stages": _stage_seconds(result)})
+
+    t_start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, range(total)))
+    return samples, time.perf_counter() - t_start
+
+
+def report(samples, wall, concurrency):
+    ok = [s["seconds"] for s in samples if not s["error"]]
+    stages = {}
+    for s in samples:
+        for stage, sec in s["stages"].items():
+            stages.setdefault(stage, []).append(sec)
+    first = [s["first_token"] for s in samples if s["first_token"] is not None]
+    errors = {}
+    for s in samples:
+        if s["error"]:
+            errors[s["error"][:120]] = errors.get(s["error"][:120], 0) + 1
+    out = {
+        "requests": len(samples),
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(samples) / wall, 3) if wall else 0.0,
+        "error_rate": round(sum(1 for s in samples if s["error"]) / len(samples), 4) if samples else 0.0,
+        "latency": summarize(ok),
+        "stages": {k: summarize(v) for k, v in sorted(stages.items())},
+        "errors": errors,
+    }
+    if first:
+        out["time_to_first_token"] = summarize(first)
+    return out
+
+
+def print_report(rep):
+    lat = rep["latency"]
+    print(f"requests={rep['requests']} concurrency={rep['concurrency']} wall={rep['wall_seconds']}s "
+          f"throughput={rep['throughput_rps']} req/s error_rate={rep['error_rate']:.2%}")
+    print(f"{'stage':<24}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    rows = [("end_to_end", lat)] + list(rep["stages"].items())
+    if "time_to_first_token" in rep:
+        rows.append(("time_to_first_token", rep["time_to_first_token"]))
+    for name, st in rows:
+        print(f"{name:<24}{st['p50']:>9.3f}{st['p95']:>9.3f}{st['p99']:>9.3f}{st['max']:>9.3f}")
+    for msg, n in rep["errors"].items():
+        print(f"  error x{n}: {msg}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load-test travel_agent.invoke against local mock services.")
+    ap.add_argument("--requests", type=int, default=100)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--prompts-file", help="newline-separated prompts (default: built-in mix)")
+    ap.add_argument("--stream", action="store_true", help="use payload stream=true and record time to first token")
+    ap.add_argument("--use-cache", action="store_true", help="allow trip response cache hits (bypassed by default)")
+    ap.add_argument("--mock-url", help="use an already running mock server instead of starting one")
+    ap.add_argument("--cortex-latency", type=float, default=0.8)
+    ap.add_argument("--cortex-event-delay", type=float, default=0.01)
+    ap.add_argument("--cortex-error-rate", type=float, default=0.0)
+    ap.add_argument("--wiki-latency", type=float, default=0.08)
+    ap.add_argument("--wiki-error-rate", type=float, default=0.0)
+    ap.add_argument("--bedrock-latency", type=float, default=0.4, help="latency of the fake Strands agent")
+    ap.add_argument("--live-bedrock", action="store_true", help="use real Strands/Bedrock instead of the fake agent")
+    ap.add_argument("--max-p95", type=float, help="fail if end-to-end p95 latency exceeds this many seconds")
+    ap.add_argument("--max-error-rate", type=float, help="fail if the error rate exceeds this fraction")
+    ap.add_argument("--json", help="also write the report to this file")
+    args = ap.parse_args()
+
+    server = None
+    url = args.mock_url
+    if not url:
+        server, url = start_mock_server(config=MockConfig(
+            cortex_latency=args.cortex_latency, cortex_event_delay=args.cortex_event_delay,
+            cortex_error_rate=args.cortex_error_rate, wiki_latency=args.wiki_latency,
+            wiki_error_rate=args.wiki_error_rate,
+        ))
+
+    # travel_agent reads its configuration from the environment, so the mock
+    # endpoints must be in the environment first. Empty secret name = no AWS call.
+    os.environ["AGENTCORE_SECRET_NAME"] = ""
+    os.environ.setdefault("SNOWFLAKE_ACCOUNT", "mock-account")
+    os.environ.setdefault("SNOWFLAKE_AUTH_TOKEN", "mock-token")
+    os.environ["CORTEX_BASE_URL"] = url
+    os.environ["WIKI_BASE_URL"] = f"{url}/api/rest_v1"
+    os.environ.setdefault("AGENT_POOL_WARM", "false")
+
+    import travel_agent
+    import travel_planner.agents
+
+    if not args.live_bedrock:
+        FakeAgent.latency = args.bedrock_latency
+        travel_planner.agents.Agent = FakeAgent
+
+    prompts = DEFAULT_PROMPTS
+    if args.prompts_file:
+        with open(args.prompts_file, encoding="utf-8") as fh:
+            prompts = [ln.strip() for ln in fh if ln.strip()]
+
+    extra = {}
+    if args.stream:
+        extra["stream"] = True
+    if not args.use_cache:
+        extra["bypass_cache"] = True
+    samples, wall = run_load(travel_agent.invoke, prompts, args.requests, args.concurrency, extra)
+    rep = report(samples, wall, args.concurrency)
+    print_report(rep)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(rep, fh, indent=2)
+    if server is not None:
+        server.shutdown()
+
+    failed = False
+    if args.max_p95 is not None and rep["latency"]["p95"] > args.max_p95:
+        print(f"FAIL: p95 {rep['latency']['p95']:.3f}s > budget {args.max_p95:.3f}s")
+        failed = True
+    if args.max_error_rate is not None and rep["error_rate"] > args.max_error_rate:
+        print(f"FAIL: error rate {rep['error_rate']:.2%} > budget {args.max_error_rate:.2%}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+Local stand-ins for the services `travel_agent.py` talks to, for load tests
+and offline development:
+
+- A Snowflake Cortex Agent endpoint (`POST .../agents/{AGENT}:run`) that
+  replays a realistic `text/event-stream`: status updates, a tool use, text
+  deltas, flight/hotel `response.table` events built from FLIGHT_DATA.csv and
+  HOTEL_DATA.csv, and the final aggregated `response` event.
+- A Wikipedia REST endpoint (`GET /page/summary/{title}`) returning
+  summary JSON in the real shape.
+
+Both support configurable latency and error injection (429/500 responses,
+404 pages, Cortex streams that stall). Run standalone:
+
+    python benchmarks/mock_servers.py --port 8765 --cortex-latency 0.8
+
+then point the runtime at it with
+`CORTEX_BASE_URL=http://127.0.0.1:8765` and
+`WIKI_BASE_URL=http://127.0.0.1:8765/api/rest_v1`. To exercise Cortex
+routing, start several instances on consecutive ports, each with its own
+overrides, and export the printed `CORTEX_ENDPOINTS`:
+
+    python benchmarks/mock_servers.py --instances '[{}, {"cortex_latency": 3}, {"cortex_error_rate": 1}]'
+"""
+
+import argparse, csv, json, os, random, threading, time, urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FLIGHT_ROW_TYPE = [
+    ("AIRLINE", "text"), ("SOURCE", "text"), ("DESTINATION", "text"),
+    ("IATA_SOURCE", "text"), ("IATA_DESTINATION", "text"),
+    ("DEP_TIME", "time"), ("ARRIVAL_TIME", "time"), ("DURATION", "text"),
+    ("TOTAL_STOPS", "fixed"), ("PRICE", "fixed"), ("DIRECT_CONNECTING", "text"),
+]
+# Snowflake types of the non-text columns, for the SQL API snapshot queries.
+COLUMN_TYPES = {
+    "DEP_TIME": "time", "ARRIVAL_TIME": "time", "TOTAL_STOPS": "fixed", "PRICE": "fixed",
+    "HOTEL_RATING": "real", "HOTEL_PRICE": "fixed",
+}
+HOTEL_ROW_TYPE = [
+    ("HOTEL_NAME", "text"), ("HOTEL_RATING", "real"), ("CITY", "text"),
+    ("HOTEL_TYPE", "text"), ("BREAKFAST_INCLUDED", "text"), ("HOTEL_PRICE", "fixed"),
+]
+
+
+class MockConfig:
+    """
+    Latency and error-injection knobs shared by both services of one mock
+    instance. A stalled Cortex run (`cortex_stall_rate`) sends its first
+    status event and then nothing for `cortex_stall_seconds`.
+    """
+
+    def __init__(self, cortex_latency=0.5, cortex_event_delay=0.02, cortex_error_rate=0.0,
+                 cortex_status=429, retry_after=None, wiki_latency=0.05, wiki_error_rate=0.0,
+                 wiki_not_found_rate=0.0, jitter=0.2, max_rows=50, seed=None, auth_token=None,
+                 cortex_stall_rate=0.0, cortex_stall_seconds=30.0):
+        self.cortex_latency = cortex_latency
+        self.cortex_event_delay = cortex_event_delay
+        self.cortex_error_rate = cortex_error_rate
+        self.cortex_status = cortex_status
+        self.retry_after = retry_after
+        self.cortex_stall_rate = cortex_stall_rate
+        self.cortex_stall_seconds = cortex_stall_seconds
+        self.wiki_latency = wiki_latency
+        self.wiki_error_rate = wiki_error_rate
+        self.wiki_not_found_rate = wiki_not_found_rate
+        self.jitter = jitter
+        self.max_rows = max_rows
+        # When set, only this bearer token is accepted (others get 401), so
+        # token rotation can be exercised by changing it at runtime.
+        self.auth_token = auth_token
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {
+            "cortex_requests": 0, "cortex_errors": 0, "cortex_stalls": 0, "cortex_disconnects": 0,
+            "wiki_requests": 0, "wiki_errors": 0, "sql_requests": 0,
+        }
+
+    def sleep(self, base):
+        if base > 0:
+            with self.lock:
+                factor = 1 + self.rng.uniform(-self.jitter, self.jitter)
+            time.sleep(base * factor)
+
+    def roll(self, rate):
+        with self.lock:
+            return rate > 0 and self.rng.random() < rate
+
+    def count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+
+def _load_csv(name):
+    with open(os.path.join(DATA_DIR, name), newline="", encoding="utf-8") as fh:
+        return list(csv.DictReader(fh))
+
+
+def _time_to_seconds(value):
+    # Snowflake's JSON result format encodes TIME as seconds since midnight.
+    try:
+        h, m, rest = value.split(":")
+        return f"{int(h) * 3600 + int(m) * 60 + float(rest):.9f}"
+    except Exception:
+        return value
+
+
+class TravelData:
+    """FLIGHT_DATA / HOTEL_DATA rows and the city names they mention."""
+
+    def __init__(self):
+        self.flights = _load_csv("FLIGHT_DATA.csv")
+        self.hotels = _load_csv("HOTEL_DATA.csv")
+        cities = {r["SOURCE"] for r in self.flights} | {r["DESTINATION"] for r in self.flights}
+        cities |= {r["CITY"] for r in self.hotels}
+        # Longest names first so "Ho Chi Minh City" wins over shorter overlaps.
+        self.cities = sorted((c for c in cities if c), key=len, reverse=True)
+
+    def cities_in(self, text):
+        low = (text or "").lower()
+        found = []
+        for c in self.cities:
+            key = c.split(" (")[0].lower()
+            idx = low.find(key)
+            if idx >= 0:
+                found.append((idx, c))
+        return [c for _, c in sorted(found)]
+
+    def result_set(self, rows, row_type, max_rows):
+        rows = rows[:max_rows]
+        data = []
+        for r in rows:
+            data.append([_time_to_seconds(r[c]) if t == "time" else r[c] for c, t in row_type])
+        meta = {
+            "numRows": len(data),
+            "format": "jsonv2",
+            "rowType": [
+                {"name": c, "type": t, "nullable": True, "scale": 1 if t == "real" else 0}
+                for c, t in row_type
+            ],
+        }
+        return {"resultSetMetaData": meta, "data": data}
+
+    def query(self, statement):
+        """Result set for the `SELECT <cols> FROM FLIGHT_DATA|HOTEL_DATA` snapshot queries."""
+        upper = statement.upper()
+        rows = self.flights if "FLIGHT_DATA" in upper else self.hotels
+        select = upper.split("SELECT", 1)[-1].split("FROM", 1)[0]
+        names = [c.strip() for c in select.split(",") if c.strip() and c.strip() != "*"] or list(rows[0])
+        row_type = [(n, COLUMN_TYPES.get(n, "text")) for n in names]
+        return self.result_set(rows, row_type, len(rows))
+
+    def plan(self, prompt, max_rows):
+        """Text answer and tables for `prompt`, loosely mimicking TRAVEL_AGENT."""
+        cities = self.cities_in(prompt)
+        origin = cities[0] if len(cities) > 1 else None
+        dest = cities[-1] if cities else "Singapore"
+        flights = [
+            r for r in self.flights
+            if r["DESTINATION"].startswith(dest) and (origin is None or r["SOURCE"].startswith(origin))
+        ]
+        flights.sort(key=lambda r: int(r["PRICE"] or 0))
+        hotels = [r for r in self.hotels if r["CITY"] == dest.split(" (")[0]]
+        hotels.sort(key=lambda r: -float(r["HOTEL_RATING"] or 0))
+        lines = [f"## Trip plan: {origin or 'your city'} to {dest}", ""]
+        if flights:
+            f = flights[0]
+            lines.append(f"**Cheapest flight:** {f['AIRLINE']} {f['ROUTE']} departing {f['DEP_TIME'][:5]}, {f['PRICE']}.")
+        if hotels:
+            h = hotels[0]
+            lines.append(f"**Top hotel:** {h['HOTEL_NAME']} ({h['HOTEL_RATING']}★), {h['BREAKFAST_INCLUDED'].lower()}.")
+        lines += ["", "### Day-wise plan"]
+        for day in range(1, 4):
+            lines.append(f"- Day {day}: explore {dest}, local food and sightseeing.")
+        tables = []
+        if flights:
+            tables.append((f"Flights to {dest}", self.result_set(flights, FLIGHT_ROW_TYPE, max_rows)))
+        if hotels:
+            tables.append((f"Hotels in {dest}", self.result_set(hotels, HOTEL_ROW_TYPE, max_rows)))
+        return "\n".join(lines), tables, cities
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def make_handler(cfg, data):
+    """Build the request handler class bound to `cfg` and `data`."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, obj, extra_headers=None):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (extra_headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urllib.parse.urlparse(self.path).path
+            if path == "/healthz":
+                return self._json(200, {"ok": True, **cfg.counters})
+            marker = "/page/summary/"
+            if marker not in path:
+                return self._json(404, {"error": "not_found"})
+            cfg.count("wiki_requests")
+            title = urllib.parse.unquote(path.split(marker, 1)[1]).replace("_", " ")
+            cfg.sleep(cfg.wiki_latency)
+            if cfg.roll(cfg.wiki_error_rate):
+                cfg.count("wiki_errors")
+                return self._json(503, {"error": "injected"})
+            if cfg.roll(cfg.wiki_not_found_rate):
+                return self._json(404, {"type": "not_found", "title": title})
+            slug = urllib.parse.quote(title.replace(" ", "_"))
+            return self._json(200, {
+                "type": "standard",
+                "title": title,
+                "description": f"City and destination: {title}",
+                "extract": f"{title} is a popular travel destination known for its culture, food and sights.",
+                "lang": "en",
+                "content_urls": {"desktop": {"page": f"https://en.wikipedia.org/wiki/{slug}"}},
+                "thumbnail": {"source": f"https://upload.wikimedia.org/thumb/{slug}/320px-{slug}.jpg", "width": 320, "height": 213},
+                "originalimage": {"source": f"https://upload.wikimedia.org/{slug}.jpg", "width": 4000, "height": 2667},
+            })
+
+        def do_POST(self):
+            path = urllib.parse.urlparse(self.path).path
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b"{}"
+            if path == "/api/v2/statements":
+                cfg.count("sql_requests")
+                if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+                    return self._json(401, {"message": "missing token"})
+                try:
+                    statement = json.loads(raw or b"{}").get("statement") or ""
+                except Exception:
+                    statement = ""
+                cfg.sleep(cfg.cortex_latency)
+                rs = data.query(statement)
+                return self._json(200, {"statementHandle": "mock-handle", **rs})
+            if not path.endswith(":run"):
+                return self._json(404, {"error": "not_found"})
+            cfg.count("cortex_requests")
+            if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+                return self._json(401, {"message": "missing token"})
+            if cfg.auth_token and self.headers.get("Authorization") != f"Bearer {cfg.auth_token}":
+                return self._json(401, {"message": "invalid token"})
+            if cfg.roll(cfg.cortex_error_rate):
+                cfg.count("cortex_errors")
+                headers = {"Retry-After": str(cfg.retry_after)} if cfg.retry_after is not None else {}
+                return self._json(cfg.cortex_status, {"message": "injected error"}, headers)
+            try:
+                body = json.loads(raw or b"{}")
+                prompt = body["messages"][-1]["content"][0]["text"]
+            except Exception:
+                prompt = ""
+            text, tables, cities = data.plan(prompt, cfg.max_rows)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                self.wfile.write(_sse("response.status", {"status": "planning", "message": "Planning the next steps"}))
+                self.wfile.flush()
+                if cfg.roll(cfg.cortex_stall_rate):
+                    cfg.count("cortex_stalls")
+                    time.sleep(cfg.cortex_stall_seconds)
+                cfg.sleep(cfg.cortex_latency)
+                tool_input = {"query": prompt, "cities": cities}
+                self.wfile.write(_sse("response.tool_use", {
+                    "content_index": 0, "tool_use_id": "toolu_1", "type": "cortex_analyst_text_to_sql",
+                    "name": "flight_hotel_analyst", "input": tool_input,
+                }))
+                content = []
+                for i, (title, rs) in enumerate(tables, start=1):
+                    cfg.sleep(cfg.cortex_event_delay)
+                    self.wfile.write(_sse("response.table", {"content_index": i, "tool_use_id": "toolu_1", "title": title, "result_set": rs}))
+                    content.append({"type": "table", "table": {"title": title, "result_set": rs}})
+                words = text.split(" ")
+                for i in range(0, len(words), 4):
+                    cfg.sleep(cfg.cortex_event_delay)
+                    chunk = " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+                    self.wfile.write(_sse("response.text.delta", {"content_index": len(tables) + 1, "text": chunk}))
+                    self.wfile.flush()
+                content.append({"type": "text", "text": text})
+                self.wfile.write(_sse("response", {"role": "assistant", "content": content}))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                cfg.count("cortex_disconnects")
+
+    return Handler
+
+
+def start_mock_server(host="127.0.0.1", port=0, config=None):
+    """
+    Start the combined Cortex + Wikipedia mock on a background thread.
+    Returns `(server, base_url)`; call `server.shutdown()` to stop it.
+    """
+    cfg = config or MockConfig()
+    server = ThreadingHTTPServer((host, port), make_handler(cfg, TravelData()))
+    server.daemon_threads = True
+    server.config = cfg
+    threading.Thread(target=server.serve_forever, name="mock-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def start_mock_servers(configs, host="127.0.0.1", port=0):
+    """
+    Start one mock instance per `MockConfig` in `configs` (on consecutive
+    ports from `port`, or free ports with 0). Returns `[(server, base_url)]`.
+    """
+    return [start_mock_server(host, port + i if port else 0, cfg) for i, cfg in enumerate(configs)]
+
+
+def cortex_endpoints(urls, **fields):
+    """A `CORTEX_ENDPOINTS` value routing across the mock instances at `urls`."""
+    return json.dumps([{"name": f"mock{i}", "base_url": url, **fields} for i, url in enumerate(urls)])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--cortex-latency", type=float, default=0.5, help="seconds before the first tool/text event")
+    ap.add_argument("--cortex-event-delay", type=float, default=0.02, help="seconds between streamed events")
+    ap.add_argument("--cortex-error-rate", type=float, default=0.0, help="fraction of runs answered with --cortex-status")
+    ap.add_argument("--cortex-status", type=int, default=429)
+    ap.add_argument("--retry-after", type=float, default=None)
+    ap.add_argument("--wiki-latency", type=float, default=0.05)
+    ap.add_argument("--wiki-error-rate", type=float, default=0.0)
+    ap.add_argument("--wiki-not-found-rate", type=float, default=0.0)
+    ap.add_argument("--max-rows", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--auth-token", default=None, help="accept only this bearer token")
+    ap.add_argument("--cortex-stall-rate", type=float, default=0.0, help="fraction of Cortex runs that stall")
+    ap.add_argument("--cortex-stall-seconds", type=float, default=30.0)
+    ap.add_argument("--instances", default=None,
+                    help='JSON list of per-instance MockConfig overrides, e.g. \'[{}, {"cortex_latency": 3}]\'')
+    args = ap.parse_args()
+    base = dict(
+        cortex_latency=args.cortex_latency, cortex_event_delay=args.cortex_event_delay,
+        cortex_error_rate=args.cortex_error_rate, cortex_status=args.cortex_status,
+        retry_after=args.retry_after, wiki_latency=args.wiki_latency,
+        wiki_error_rate=args.wiki_error_rate, wiki_not_found_rate=args.wiki_not_found_rate,
+        max_rows=args.max_rows, seed=args.seed, auth_token=args.auth_token,
+        cortex_stall_rate=args.cortex_stall_rate, cortex_stall_seconds=args.cortex_stall_seconds,
+    )
+    overrides = json.loads(args.instances) if args.instances else [{}]
+    servers = start_mock_servers([MockConfig(**{**base, **o}) for o in overrides], args.host, args.port)
+    urls = [url for _, url in servers]
+    print(f"Mock Cortex Agent + Wikipedia listening on {', '.join(urls)}")
+    print(f"  CORTEX_BASE_URL={urls[0]}")
+    print(f"  WIKI_BASE_URL={urls[0]}/api/rest_v1")
+    if len(urls) > 1:
+        print(f"  CORTEX_ENDPOINTS='{cortex_endpoints(urls)}'")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server, _ in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,8 @@ AgentCore. Here we:
 - Render the returned trip plan, structured tables, and wiki destination info.
 """
 
-import os, json, streamlit as st
-import uuid, boto3
+import os, re, json, codecs, time, streamlit as st
+import uuid, boto3, urllib.request
 from botocore.config import Config
 
 # ======================
@@ -49,13 +49,89 @@ def get_region():
 
 REGION = get_region()
 
+# ======================
+# Transport (AgentCore client + event-stream decoding)
+# ======================
+# Most bytes taken per read from the runtime's response stream.
+STREAM_CHUNK_BYTES = int(os.environ.get("AGENTCORE_STREAM_CHUNK_BYTES", "65536"))
+# Minimum seconds between redraws of the streaming Travel Plan card.
+STREAM_RENDER_INTERVAL = float(os.environ.get("AGENTCORE_STREAM_RENDER_INTERVAL", "0.1"))
+
+
+@st.cache_resource(show_spinner=False)
+def _agentcore_client(region, read_timeout, connect_timeout):
+    """One boto3 client per (region, timeouts), shared across reruns and sessions."""
+    cfg = Config(read_timeout=read_timeout, connect_timeout=connect_timeout)
+    return boto3.client("bedrock-agentcore", region_name=region, config=cfg)
+
+
 def get_agentcore_client(region_name=None):
     region = region_name or REGION
     # Increase Bedrock AgentCore timeouts so long-running trip plans don't hit client read timeouts.
     read_t = int(os.environ.get("AGENTCORE_READ_TIMEOUT", "300"))
     conn_t = int(os.environ.get("AGENTCORE_CONNECT_TIMEOUT", "10"))
-    cfg = Config(read_timeout=read_t, connect_timeout=conn_t)
-    return boto3.client("bedrock-agentcore", region_name=region, config=cfg)
+    return _agentcore_client(region, read_t, conn_t)
+
+
+def _iter_body_chunks(body, chunk_size):
+    """
+    Bytes of a streamed response body as soon as they arrive, up to
+    `chunk_size` at a time. botocore's `StreamingBody.read(n)` (and so
+    `iter_chunks`) waits until it has n bytes or the body ends; the urllib3
+    response underneath can hand over whatever has arrived instead.
+    """
+    raw = getattr(body, "_raw_stream", None)
+    if raw is None:
+        yield from body.iter_chunks(chunk_size=chunk_size) if hasattr(body, "iter_chunks") else body
+    elif raw.chunked and raw.supports_chunked_reads():
+        yield from raw.read_chunked(None, decode_content=True)
+    else:
+        if hasattr(raw, "read1"):
+            # urllib3 2.x
+            read = raw.read1
+        elif not raw.headers.get("Content-Encoding") and hasattr(getattr(raw, "_fp", None), "read1"):
+            # urllib3 1.26, identity body: read the http.client response directly.
+            read = raw._fp.read1
+        else:
+            yield from body.iter_chunks(chunk_size=chunk_size)
+            return
+        while True:
+            chunk = read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_sse_data(body, chunk_size=None):
+    """
+    Yield the payload of each `data:` line of an event-stream body as soon as
+    its line is complete.
+
+    Takes whatever bytes have arrived (at most `chunk_size`, default
+    STREAM_CHUNK_BYTES) and decodes them with an incremental UTF-8 decoder,
+    so multibyte characters split across reads are kept intact. Lines are
+    cut from the decoded buffer; nothing is decoded or joined per line.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    chunks = _iter_body_chunks(body, chunk_size or STREAM_CHUNK_BYTES)
+    buf = ""
+    for chunk in chunks:
+        buf += decoder.decode(chunk)
+        if "\n" not in buf:
+            continue
+        *lines, buf = buf.split("\n")
+        for line in lines:
+            if line.startswith("data:"):
+                yield _sse_payload(line)
+    buf += decoder.decode(b"", final=True)
+    if buf.startswith("data:"):
+        yield _sse_payload(buf)
+
+
+def _sse_payload(line):
+    """`data: {...}` -> `{...}` (one optional space after the colon, no trailing CR)."""
+    value = line[5:].rstrip("\r")
+    return value[1:] if value.startswith(" ") else value
 
 agent_arn = st.sidebar.text_input("Agent ARN", value="", key="agent_arn_input")
 
@@ -95,32 +171,153 @@ with st.form("planner"):
 # ======================
 card = lambda t, h: st.markdown(f"<div class='card'><h4>{t}</h4>{h}</div>", unsafe_allow_html=True)
 
-def parse_event_stream(lines_iter):
+def parse_event_stream(data_iter):
     """
-    Minimal event-stream helper: assumes backend eventually emits one JSON object as `data: ...`.
-    Uses tolerant UTF-8 decoding to avoid crashes on partial multibyte sequences.
+    Minimal event-stream helper: assumes backend eventually emits one JSON
+    object as `data: ...`. Takes the `data:` payloads from `iter_sse_data`.
     """
-    chunks = []
-    for raw in lines_iter:
-        if not raw:
-            continue
-        try:
-            line = raw.decode("utf-8", errors="ignore")
-        except Exception:
-            # Fallback: best-effort decode
-            line = str(raw)
-        if line.startswith("data: "):
-            chunks.append(line[6:])
-    raw_text = "".join(chunks)
+    raw_text = "".join(data_iter)
     try:
         return json.loads(raw_text), raw_text
     except Exception:
         return {"raw": raw_text}, raw_text
 
+def table_frame(tbl):
+    """
+    DataFrame for a columnar `tables` entry from the backend
+    (`{"columns": [{"name", "dtype"}], "data": {name: [...]}}`), with date and
+    timestamp columns parsed into datetimes.
+    """
+    import pandas as pd
+
+    columns = [c.get("name") for c in tbl.get("columns") or []]
+    df = pd.DataFrame(tbl.get("data") or {}, columns=columns or None)
+    for col in tbl.get("columns") or []:
+        if col.get("dtype") in ("date", "timestamp") and col.get("name") in df:
+            df[col["name"]] = pd.to_datetime(df[col["name"]], errors="coerce")
+    return df
+
+
+# Page sizes offered by the table viewer; the first one is the default.
+TABLE_PAGE_SIZES = (25, 50, 100, 250)
+# Wikipedia images are shown as thumbnails of this width, fetched once and cached.
+THUMBNAIL_WIDTH = int(os.environ.get("THUMBNAIL_WIDTH", "320"))
+THUMBNAIL_MAX_BYTES = int(os.environ.get("THUMBNAIL_MAX_BYTES", str(512 * 1024)))
+THUMBNAIL_CACHE_ENTRIES = int(os.environ.get("THUMBNAIL_CACHE_ENTRIES", "256"))
+
+
+def render_table(df, key):
+    """
+    Sortable, paginated viewer for a full result set. Sorting applies to every
+    row, then one page is handed to `st.dataframe`, whose grid only draws the
+    visible cells.
+    """
+    if df.empty:
+        st.caption("No rows.")
+        return
+    c_sort, c_desc, c_size, c_page = st.columns([3, 2, 2, 2])
+    sort_col = c_sort.selectbox("Sort by", ["(none)", *df.columns], key=f"{key}_sort")
+    desc = c_desc.checkbox("Descending", key=f"{key}_desc")
+    size = c_size.selectbox("Rows per page", TABLE_PAGE_SIZES, key=f"{key}_size")
+    pages = max(1, -(-len(df) // size))
+    page = c_page.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    if sort_col != "(none)":
+        df = df.sort_values(sort_col, ascending=not desc, kind="stable", na_position="last")
+    start = (int(page) - 1) * size
+    st.dataframe(df.iloc[start:start + size], hide_index=True, use_container_width=True)
+    st.caption(f"Rows {start + 1}–{min(start + size, len(df))} of {len(df)} · page {int(page)} of {pages}")
+
+
+def thumbnail_url(url, width=None):
+    """Point a Wikimedia `/thumb/.../NNNpx-Name` URL at a `width`-pixel rendition (never larger)."""
+    width = width or THUMBNAIL_WIDTH
+    m = re.search(r"/(\d+)px-[^/]+$", url or "")
+    if not m or int(m.group(1)) <= width:
+        return url
+    return f"{url[:m.start(1)]}{width}{url[m.end(1):]}"
+
+
+@st.cache_data(max_entries=THUMBNAIL_CACHE_ENTRIES, show_spinner=False)
+def fetch_thumbnail(url):
+    """Image bytes for `url`, or None if the fetch fails or exceeds THUMBNAIL_MAX_BYTES."""
+    req = urllib.request.Request(url, headers={"User-Agent": "TravelPlannerUI/1.0"})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            body = resp.read(THUMBNAIL_MAX_BYTES + 1)
+    except Exception:
+        return None
+    return body if len(body) <= THUMBNAIL_MAX_BYTES else None
+
+
+def render_event_stream(data_iter):
+    """
+    Streaming counterpart of `parse_event_stream` for `{"stream": true}` calls.
+
+    The backend emits one JSON event per `data:` line (`delta`, `status`,
+    `wiki`, `final`, `error`, ...), which `iter_sse_data` hands over as they
+    arrive. The Travel Plan card and a status line are updated in place, the
+    card at most every STREAM_RENDER_INTERVAL seconds; the placeholders are
+    cleared at the end so the regular result rendering below takes over.
+    Falls back to the single-JSON behaviour if the lines are not individually
+    decodable.
+    """
+    status_ph, plan_ph, wiki_ph = st.empty(), st.empty(), st.empty()
+    lines, plan_parts, result = [], [], None
+    drawn_at, pending = 0.0, False
+
+    def draw_plan():
+        with plan_ph.container():
+            card("Travel Plan", f"<div class='mono' style='white-space:pre-wrap'>{''.join(plan_parts)}</div>")
+
+    for line in data_iter:
+        if not line:
+            continue
+        lines.append(line)
+        try:
+            ev = json.loads(line)
+        except Exception:
+            continue
+        if not isinstance(ev, dict) or "type" not in ev:
+            result = ev
+            continue
+        kind = ev["type"]
+        if kind == "delta":
+            plan_parts.append(ev.get("text") or "")
+            pending = True
+        if pending and (kind != "delta" or time.monotonic() - drawn_at >= STREAM_RENDER_INTERVAL):
+            # Catch up on held-back text before slower events (wiki, final) arrive.
+            draw_plan()
+            drawn_at, pending = time.monotonic(), False
+        if kind == "status" and ev.get("message"):
+            status_ph.caption(f"Status: {ev['message']}")
+        elif kind == "tool_use" and ev.get("name"):
+            status_ph.caption(f"Running tool: {ev['name']}")
+        elif kind == "wiki":
+            names = ", ".join((ev.get("data") or {}).get("destinations") or [])
+            if names:
+                wiki_ph.caption(f"Destination info ready: {names}")
+        elif kind == "final":
+            result = ev.get("data") or {}
+        elif kind == "error":
+            result = {"error": ev.get("error"), "raw_context": ev.get("raw_context")}
+    for ph in (status_ph, plan_ph, wiki_ph):
+        ph.empty()
+    raw_text = "\n".join(lines)
+    if result is None:
+        try:
+            result = json.loads("".join(lines))
+        except Exception:
+            result = {"raw": raw_text}
+    return result, raw_text
+
 # ======================
 # Submit flow: call Bedrock AgentCore runtime
 # ======================
 raw, data = None, None
+# Table paging/sorting widgets rerun the script; keep the last result so it
+# stays on screen instead of disappearing until the next submit.
+if not submitted and "last_result" in st.session_state:
+    data, raw = st.session_state.last_result
 if submitted:
     if not agent_arn:
         st.error("Agent ARN is required to invoke the agent. Please provide it in the sidebar.")
@@ -128,7 +325,9 @@ if submitted:
         try:
             with st.spinner("Planning your trip…"):
                 client = get_agentcore_client(REGION)
-                payload = json.dumps({"prompt": prompt}).encode()
+                # `stream` asks the runtime for incremental SSE events so the plan renders as it is written;
+                # the "ui" profile leaves out raw Cortex/Wikipedia payloads this page never renders.
+                payload = json.dumps({"prompt": prompt, "stream": True, "profile": "ui"}).encode()
                 response = client.invoke_agent_runtime(
                     agentRuntimeArn=agent_arn,
                     runtimeSessionId=st.session_state.runtime_session_id,
@@ -136,9 +335,9 @@ if submitted:
                 )
                 ct = response.get("contentType", "")
                 if "text/event-stream" in ct:
-                    data, raw = parse_event_stream(response["response"].iter_lines(chunk_size=10))
+                    data, raw = render_event_stream(iter_sse_data(response["response"]))
                 elif "application/json" in ct:
-                    raw = "".join([chunk.decode("utf-8") for chunk in response.get("response", [])])
+                    raw = response["response"].read().decode("utf-8")
                     try: data = json.loads(raw)
                     except Exception: data = {"raw": raw}
                 else:
@@ -146,6 +345,8 @@ if submitted:
                     data = {"raw": raw}
         except Exception as e:
             st.error(f"Request failed: {e}")
+        if data is not None:
+            st.session_state.last_result = (data, raw)
 
 if submitted and raw is not None:
     with st.expander("Debug: Backend Response", expanded=False):
@@ -162,6 +363,9 @@ st.markdown(
 # ======================
 # Main Display: Wikipedia info, trip plan, and raw context
 # ======================
+if isinstance(data, dict) and data.get("error"):
+    st.error(f"Agent error: {data['error']}")
+
 if data:
     best = data.get("best_trip_recommendation")
     raw_context = data.get("raw_context")
@@ -192,13 +396,15 @@ if data:
                         desc = s.get("description")
 
                         st.markdown(f"### {title}")
-                        # Show primary thumbnail if available
-                        if thumb:
-                            st.image(thumb, width=260)
-                        # Show any additional images (e.g., original image) for richer visuals
-                        for img in images:
-                            if img and img != thumb:
-                                st.image(img, width=260)
+                        # Only a thumbnail-size rendition is loaded (and cached);
+                        # full-size originals are linked rather than embedded.
+                        thumb_src = thumbnail_url(thumb or next((i for i in images if i), None))
+                        img = fetch_thumbnail(thumb_src) if thumb_src else None
+                        if img:
+                            st.image(img, width=260)
+                        full = next((i for i in images if i and i != thumb), None)
+                        if full:
+                            st.markdown(f"[Full-size image]({full})")
                         if desc:
                             st.markdown(f"**Short description:** {desc}")
                         if extract:
@@ -215,9 +421,20 @@ if data:
 
         # Additionally, try to surface any structured tables the Cortex Agent returned
         # (e.g. flights and hotels) in a friendlier format, similar to the Snowflake UI.
+        tables = data.get("tables")
+        if isinstance(tables, list) and tables:
+            # Columnar, already-typed tables from the backend: build each frame
+            # directly from its columns instead of one dict per row.
+            for i, tbl in enumerate(tables):
+                if not isinstance(tbl, dict) or not tbl.get("num_rows"):
+                    continue
+                with st.expander(f"Details: {tbl.get('title') or 'Details'}", expanded=False):
+                    render_table(table_frame(tbl), key=f"table_{i}")
         cortex_resp = raw_context.get("cortex_agent_response")
-        if isinstance(cortex_resp, dict):
-            for item in cortex_resp.get("content", []):
+        if not tables and isinstance(cortex_resp, dict):
+            import pandas as pd
+
+            for i, item in enumerate(cortex_resp.get("content", [])):
                 if not isinstance(item, dict):
                     continue
                 if item.get("type") != "table":
@@ -232,8 +449,5 @@ if data:
                 rows = rs.get("data") or []
                 if not columns or not rows:
                     continue
-                # Map each row to a dict for nicer display; limit to first N rows for readability
-                max_rows = 30
-                row_dicts = [dict(zip(columns, r)) for r in rows[:max_rows]]
                 with st.expander(f"Details: {title}", expanded=False):
-                    st.table(row_dicts)
+                    render_table(pd.DataFrame(rows, columns=columns), key=f"table_{i}")
@@ -0,0 +1,49 @@
+"""Shared fixtures: a fresh configuration per test and the local mock services."""
+
+import os, sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from load_test import FakeAgent  # noqa: E402
+from mock_servers import MockConfig, start_mock_server  # noqa: E402
+from travel_planner import agents, config  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_config(monkeypatch):
+    """Every test resolves its own config from the environment, without Secrets Manager."""
+    monkeypatch.setenv("AGENTCORE_SECRET_NAME", "")
+    monkeypatch.setenv("SNOWFLAKE_ACCOUNT", "mock-account")
+    monkeypatch.setenv("SNOWFLAKE_AUTH_TOKEN", "mock-token")
+    config.reset()
+    yield
+    config.reset()
+
+
+@pytest.fixture
+def mock_server(monkeypatch):
+    """
+    A Cortex + Wikipedia mock with no jitter or injected errors; tweak
+    `server.config` in the test. The runtime is pointed at it.
+    """
+    server, url = start_mock_server(config=MockConfig(cortex_latency=0.05, cortex_event_delay=0.0,
+                                                      wiki_latency=0.0, jitter=0.0, seed=1))
+    monkeypatch.setenv("CORTEX_BASE_URL", url)
+    monkeypatch.setenv("WIKI_BASE_URL", f"{url}/api/rest_v1")
+    # A worker left over from an earlier test may have resolved the config
+    # before the URLs above were set.
+    config.reset()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    """Answer the wiki pipeline's Claude calls with canned replies instead of Bedrock."""
+    monkeypatch.setattr(FakeAgent, "latency", 0.0)
+    monkeypatch.setattr(agents, "Agent", FakeAgent)
+    return FakeAgent
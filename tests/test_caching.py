@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+from travel_planner.caching import TripResponseCache, TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache("test", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache("test", ttl_seconds=0.05)
+    cache.set("short", "x")
+    cache.set("long", "y", ttl_seconds=60)
+    cache.set("never", "z", ttl_seconds=0)
+    time.sleep(0.1)
+
+    assert cache.get("short", "expired") == "expired"
+    assert cache.get("long") == "y"
+    assert cache.get("never") is None
+    assert cache.stats()["size"] == 1
+
+
+def test_ttl_cache_persists_to_sqlite(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = TTLCache("test", max_entries=3, path=path)
+    cache.set("a", {"title": "Tokyo"})
+    cache.set("b", ["Kyoto"])
+    cache.set("gone", 1, ttl_seconds=0.05)
+    cache.set("c", "Osaka")  # evicts "a" from memory and disk
+    time.sleep(0.1)
+
+    restarted = TTLCache("test", max_entries=3, path=path)
+    assert restarted.get("a") is None
+    assert restarted.get("b") == ["Kyoto"]
+    assert restarted.get("gone") is None
+    assert restarted.stats()["disk_hits"] == 1
+    # Caches sharing one file keep their entries apart.
+    assert TTLCache("other", path=path).get("b") is None
+
+
+def _trip(text="Fly SQ12", **extra):
+    return {"best_trip_recommendation": text, "raw_context": {"timings": {"cortex_agent": {"status": "ok"}}}, **extra}
+
+
+def test_trip_cache_matches_normalised_prompts():
+    cache = TripResponseCache()
+    cache.store("Singapore to Tokyo, 3 nights!", _trip())
+
+    hit = cache.lookup("  singapore TO tokyo 3 nights ")
+    assert hit["best_trip_recommendation"] == "Fly SQ12"
+    assert hit["raw_context"]["cache"]["match"] == "exact"
+    assert "cache" not in cache.lookup("Singapore to Tokyo 3 nights")["raw_context"]["timings"]
+    assert cache.lookup("Singapore to Osaka 3 nights") is None
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("Singapore to Tokyo for 3 nights with breakfast", "Singapore to Tokyo for 4 nights with breakfast"),
+    ("Singapore to Tokyo for 3 nights with breakfast", "Singapore to Tokyo for 3 nights without breakfast"),
+    ("Delhi to Pune for a long weekend please", "Delhi to Goa for a long weekend please"),
+    ("Delhi to Pune for a long weekend please", "Pune to Delhi for a long weekend please"),
+])
+def test_semantic_match_requires_the_same_signature(stored, asked):
+    cache = TripResponseCache(semantic=True, threshold=0.5)
+    cache.store(stored, _trip())
+
+    assert cache.lookup(asked) is None
+    assert cache.stats()["semantic_hits"] == 0
+
+
+def test_semantic_match_accepts_a_rewording():
+    cache = TripResponseCache(semantic=True, threshold=0.7)
+    cache.store("Plan a trip from Singapore to Tokyo for 3 nights with breakfast", _trip())
+
+    hit = cache.lookup("plan trip from Singapore to Tokyo for 3 nights, with breakfast please")
+    assert hit["raw_context"]["cache"]["match"] == "semantic"
+    assert hit["raw_context"]["cache"]["similarity"] >= 0.7
+    assert cache.stats()["semantic_hits"] == 1
+    assert TripResponseCache(semantic=True, threshold=0.99).lookup("plan trip") is None
+
+
+@pytest.mark.parametrize("response", [
+    {"error": "Cortex Agent error: 429"},
+    _trip(partial=True, missing=["wiki_destination_info"]),
+    {"best_trip_recommendation": "Fly SQ12",
+     "raw_context": {"timings": {"cortex_agent": {"status": "ok"}, "wiki": {"status": "error"}}}},
+    {"best_trip_recommendation": "Fly SQ12",
+     "raw_context": {"timings": {"cortex_agent": {"status": "ok"}, "wiki": {"status": "cancelled"}}}},
+])
+def test_trip_cache_skips_failed_responses(response):
+    cache = TripResponseCache()
+    cache.store("Singapore to Tokyo", response)
+    assert cache.lookup("Singapore to Tokyo") is None
+
+
+def test_semantic_match_skips_expired_entries():
+    asked = "plan trip from Singapore to Tokyo for 3 nights, with breakfast please"
+    cache = TripResponseCache(semantic=True, threshold=0.7, ttl_seconds=0.2)
+    cache.store("Plan a trip from Singapore to Tokyo for 3 nights with breakfast please", _trip("Fly SQ12"))
+    time.sleep(0.25)
+    cache.store("Plan a trip from Singapore to Tokyo for 3 nights with breakfast", _trip("Fly NH842"))
+
+    # The closer, expired prompt is passed over for the live one.
+    assert cache.lookup(asked)["best_trip_recommendation"] == "Fly NH842"
+    assert len(cache._index) == 1
@@ -0,0 +1,29 @@
+import os
+
+from travel_planner import config
+
+
+def test_secret_values_stay_out_of_the_process_environment(monkeypatch):
+    monkeypatch.setenv("AGENTCORE_SECRET_NAME", "test-secret")
+    monkeypatch.delenv("SNOWFLAKE_ACCOUNT")
+    monkeypatch.delenv("WIKI_USER_AGENT", raising=False)
+    secret = {"SNOWFLAKE_ACCOUNT": "secret-account", "WIKI_USER_AGENT": "SecretAgent/1.0"}
+    monkeypatch.setattr(config, "load_secrets_from_aws", lambda name: dict(secret))
+
+    assert config.load_secrets_in_background().wait(5)
+    cfg = config.get_config()
+
+    assert cfg.snowflake_account == "secret-account" and cfg.wiki_user_agent == "SecretAgent/1.0"
+    assert config.credentials().get("SNOWFLAKE_AUTH_TOKEN") == "mock-token"
+    assert "SNOWFLAKE_ACCOUNT" not in os.environ and "WIKI_USER_AGENT" not in os.environ
+
+
+def test_malformed_knobs_fall_back_to_their_defaults(monkeypatch, capsys):
+    monkeypatch.setenv("BATCH_MAX_CONCURRENCY", "four")
+    monkeypatch.setenv("REQUEST_DEADLINE_SECONDS", "30")
+
+    cfg = config.get_config()
+
+    assert cfg.batch_max_concurrency == 4
+    assert cfg.request_deadline_seconds == 30.0
+    assert "BATCH_MAX_CONCURRENCY='four'" in capsys.readouterr().out
@@ -0,0 +1,137 @@
+import json, time
+
+import pytest
+
+from mock_servers import MockConfig, cortex_endpoints, start_mock_servers
+from travel_planner import config, cortex_client, scheduler
+
+
+@pytest.fixture
+def cortex_pair(monkeypatch):
+    """
+    Two mock instances behind CORTEX_ENDPOINTS. `primary` (weight 1) is
+    always picked first, `backup` (weight 0) only runs as a hedge or a
+    failover. Yields `(primary, backup)` servers; tweak their `config`.
+    """
+    servers = start_mock_servers([
+        MockConfig(cortex_latency=0.05, cortex_event_delay=0.0, jitter=0.0, seed=i) for i in range(2)
+    ])
+    urls = [url for _, url in servers]
+    endpoints = json.loads(cortex_endpoints(urls))
+    endpoints[1]["weight"] = 0
+    monkeypatch.setenv("CORTEX_ENDPOINTS", json.dumps(endpoints))
+    monkeypatch.setenv("CORTEX_HEDGE_MIN_DELAY_SECONDS", "0.2")
+    monkeypatch.setenv("CORTEX_MAX_RETRIES", "0")
+    config.reset()
+    yield servers[0][0], servers[1][0]
+    for server, _ in servers:
+        server.shutdown()
+
+
+def _wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+@pytest.mark.parametrize("slowdown", ["latency", "stall"])
+def test_slow_primary_is_hedged(cortex_pair, slowdown):
+    primary, backup = cortex_pair
+    if slowdown == "latency":
+        primary.config.cortex_latency = 3.0
+    else:
+        primary.config.cortex_stall_rate = 1.0
+        primary.config.cortex_stall_seconds = 3.0
+
+    t0 = time.monotonic()
+    res = cortex_client.call_cortex_agent("Singapore to Tokyo for 3 nights")
+    elapsed = time.monotonic() - t0
+
+    assert "error" not in res
+    assert elapsed < 1.5
+    stats = cortex_client.cortex_router_stats()["endpoints"]
+    assert stats["mock1"]["hedges"] == 1 and stats["mock1"]["wins"] == 1
+    assert stats["mock0"]["cancelled"] == 1
+    assert backup.config.counters["cortex_requests"] == 1
+    # The losing attempt is aborted, not read to the end: both Snowflake
+    # slots are free long before the primary would have answered.
+    snowflake = scheduler.limits()["snowflake"]
+    assert _wait_for(lambda: snowflake.stats()["in_flight"] == 0, timeout=0.5)
+
+
+def test_failing_primary_fails_over(cortex_pair):
+    primary, backup = cortex_pair
+    primary.config.cortex_error_rate = 1.0
+    primary.config.cortex_status = 500
+
+    res = cortex_client.call_cortex_agent("Singapore to Tokyo for 3 nights")
+
+    assert "error" not in res
+    assert primary.config.counters["cortex_errors"] == 1
+    assert backup.config.counters["cortex_requests"] == 1
+    stats = cortex_client.cortex_router_stats()["endpoints"]
+    assert stats["mock0"]["errors"] == 1
+    assert stats["mock1"]["ok"] == 1 and stats["mock1"]["hedges"] == 0
+
+
+def _router(n=2, **kwargs):
+    endpoints = [cortex_client.CortexEndpoint(f"ep{i}", f"http://ep{i}", "db", "sch", "agent") for i in range(n)]
+    return cortex_client.CortexRouter(endpoints, **kwargs), endpoints
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_once():
+    router, (a, b) = _router(breaker_failures=2, breaker_cooldown=0.1)
+    for _ in range(2):
+        assert router.admit(a)
+        router.record(a, "error")
+
+    assert all(router.plan() == [b] for _ in range(20))
+    assert not router.admit(a)
+    time.sleep(0.15)
+    # Half open: one probe gets through, a second has to wait for its outcome.
+    assert router.admit(a) and not router.admit(a)
+    router.record(a, "ok", 0.1)
+    stats = router.stats()["endpoints"]["ep0"]
+    assert stats["state"] == "closed" and stats["breaker_opens"] == 1 and stats["consecutive_failures"] == 0
+
+
+def test_failed_probe_reopens_the_breaker():
+    router, (a, b) = _router(breaker_failures=1, breaker_cooldown=0.05)
+    router.admit(a)
+    router.record(a, "error")
+    time.sleep(0.1)
+    assert router.admit(a)
+    router.record(a, "error")
+    assert router.stats()["endpoints"]["ep0"]["state"] == "open"
+    assert router.plan() == [b]
+
+
+def test_plan_falls_back_when_every_breaker_is_open():
+    router, (a, b) = _router(breaker_failures=1)
+    for ep in (b, a):
+        router.admit(ep)
+        router.record(ep, "error")
+    # The endpoint that has been resting longest is tried.
+    assert router.plan() == [b]
+
+
+def test_hedge_delay_follows_the_latency_quantile():
+    router, (a, _) = _router(hedge_min_delay=0.5, hedge_quantile=0.9)
+    assert router.hedge_delay(a) == 0.5
+    for latency in (0.2, 0.3, 0.4, 0.6, 0.8, 1.5, 0.7, 0.9, 1.0, 1.1):
+        router.record(a, "ok", latency)
+    assert router.hedge_delay(a) == 1.5
+
+
+def test_every_endpoint_failing_reports_the_route(cortex_pair):
+    for server in cortex_pair:
+        server.config.cortex_error_rate = 1.0
+        server.config.cortex_status = 503
+
+    res = cortex_client.call_cortex_agent("Singapore to Tokyo for 3 nights")
+
+    assert "error" in res
+    assert [(r["endpoint"], r["outcome"]) for r in res["route"]] == [("mock0", "error"), ("mock1", "error")]
@@ -0,0 +1,49 @@
+import json
+
+from travel_planner.gazetteer import Gazetteer, gazetteer_destinations, get_gazetteer
+
+
+def _find(text):
+    return [(m["text"], m["title"], m["role"]) for m in get_gazetteer().find(text)]
+
+
+def test_find_marks_origin_and_destinations():
+    assert _find("Delhi to Pune for 3 nights") == [
+        ("Delhi", "Delhi", "origin"), ("Pune", "Pune", "destination"),
+    ]
+    assert _find("from Bombay, visiting Goa and Jaipur") == [
+        ("Bombay", "Mumbai", "origin"), ("Goa", "Goa", "destination"), ("Jaipur", "Jaipur", "destination"),
+    ]
+
+
+def test_find_prefers_longest_match_and_resolves_aliases():
+    assert _find("New Delhi hotels") == [("New Delhi", "Delhi", "destination")]
+    assert _find("a week in saigon") == [("saigon", "Ho Chi Minh City", "destination")]
+
+
+def test_iata_codes_are_upper_case_only():
+    assert _find("fly SIN to NRT") == [("SIN", "Singapore", "origin"), ("NRT", "Tokyo", "destination")]
+    assert _find("sin city trip") == []
+
+
+def test_gazetteer_destinations_skip_the_origin_and_duplicates():
+    out = gazetteer_destinations("Singapore to Tokyo, Kyoto and back to Tokyo")
+    assert out["destinations"] == ["Tokyo", "Kyoto"]
+    assert out["raw"]["source"] == "gazetteer"
+
+
+def test_aliases_file_extends_the_gazetteer(tmp_path, monkeypatch):
+    path = tmp_path / "aliases.json"
+    path.write_text(json.dumps({"The Big Apple": "New York City"}))
+    monkeypatch.setenv("GAZETTEER_ALIASES_FILE", str(path))
+
+    assert _find("Christmas in the big apple") == [("the big apple", "New York City", "destination")]
+
+
+def test_add_counts_distinct_names():
+    gaz = Gazetteer()
+    gaz.add("Kuala Lumpur", "Kuala Lumpur")
+    gaz.add("kuala lumpur", "Kuala Lumpur")
+    gaz.add("KL", "Kuala Lumpur")
+    assert gaz.size == 2
+    assert [m["title"] for m in gaz.find("KL and Kuala Lumpur")] == ["Kuala Lumpur", "Kuala Lumpur"]
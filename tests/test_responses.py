@@ -0,0 +1,15 @@
+from travel_planner.responses import shape_events
+
+
+def test_streamed_tables_point_at_the_final_copy_outside_debug():
+    table = {"title": "Flights", "num_rows": 1, "columns": [{"name": "FLIGHT"}], "data": {"FLIGHT": ["SQ12"]}}
+    events = [
+        {"type": "table", "title": "Flights", "index": 0, "result_set": {"data": [["SQ12"]]}, "table": table},
+        {"type": "final", "data": {"best_trip_recommendation": "Fly SQ12", "tables": [table], "raw_context": {}}},
+    ]
+
+    for profile in ("minimal", "ui"):
+        streamed, final = shape_events((ev for ev in events), profile, False)
+        assert streamed == {"type": "table", "title": "Flights", "index": 0, "num_rows": 1}
+        assert final["data"]["tables"][streamed["index"]] == table
+    assert list(shape_events((ev for ev in events), "debug", False)) == events
@@ -0,0 +1,80 @@
+from travel_planner.result_sets import agent_tables, decode_result_set
+
+
+def _rs(row_type, rows):
+    return {"resultSetMetaData": {"rowType": row_type}, "data": rows}
+
+
+def test_decode_result_set_types_each_column():
+    rs = _rs(
+        [
+            {"name": "FLIGHT", "type": "text"},
+            {"name": "STOPS", "type": "fixed", "scale": 0},
+            {"name": "PRICE", "type": "fixed", "scale": 2},
+            {"name": "RATING", "type": "real"},
+            {"name": "REFUNDABLE", "type": "boolean"},
+            {"name": "DEPARTS", "type": "date"},
+            {"name": "AT", "type": "time"},
+            {"name": "BOOKED", "type": "timestamp_ntz"},
+        ],
+        [
+            ["SQ12", "0", "412.50", "4.5", "true", "20089", "30600.5", "1735689600.000000000"],
+            ["JL36", None, "389.00", None, "FALSE", "2025-01-02", "23:59:59", "2025-01-01 12:30:00"],
+        ],
+    )
+
+    out = decode_result_set(rs, title="Flights")
+
+    assert out["title"] == "Flights" and out["num_rows"] == 2
+    assert [c["dtype"] for c in out["columns"]] == [
+        "string", "int64", "float64", "float64", "bool", "date", "time", "timestamp",
+    ]
+    data = out["data"]
+    assert data["FLIGHT"] == ["SQ12", "JL36"]
+    assert data["STOPS"] == [0, None]
+    assert data["PRICE"] == [412.5, 389.0]
+    assert data["RATING"] == [4.5, None]
+    assert data["REFUNDABLE"] == [True, False]
+    assert data["DEPARTS"] == ["2025-01-01", "2025-01-02"]
+    assert data["AT"] == ["08:30:00.500000", "23:59:59"]
+    assert data["BOOKED"] == ["2025-01-01T00:00:00", "2025-01-01T12:30:00"]
+
+
+def test_decode_result_set_timestamp_tz_is_utc_with_offset():
+    rs = _rs([{"name": "TS", "type": "timestamp_tz"}], [["1735689600 1770"], ["1735693200 1770"]])
+
+    out = decode_result_set(rs)
+
+    col = out["columns"][0]
+    assert col["tz"] == "UTC" and col["utc_offset_minutes"] == 330
+    assert out["data"]["TS"] == ["2025-01-01T00:00:00", "2025-01-01T01:00:00"]
+
+
+def test_decode_result_set_falls_back_to_strings_and_dedupes_names():
+    rs = _rs(
+        [{"name": "N", "type": "fixed"}, {"name": "N", "type": "fixed"}, {"type": "text"}],
+        [["1", "n/a", "x"], ["2", "3", "y"]],
+    )
+
+    out = decode_result_set(rs)
+
+    assert [(c["name"], c["dtype"]) for c in out["columns"]] == [("N", "int64"), ("N_1", "string"), ("col_2", "string")]
+    assert out["data"] == {"N": [1, 2], "N_1": ["n/a", "3"], "col_2": ["x", "y"]}
+
+
+def test_decode_result_set_handles_empty_input():
+    assert decode_result_set(None) == {"title": None, "num_rows": 0, "columns": [], "data": {}}
+    out = decode_result_set(_rs([{"name": "A", "type": "fixed"}], []))
+    assert out["num_rows"] == 0 and out["data"] == {"A": []}
+
+
+def test_agent_tables_decodes_only_table_items():
+    rs = _rs([{"name": "CITY", "type": "text"}], [["Tokyo"]])
+    resp = {"content": [
+        {"type": "text", "text": "Here you go"},
+        {"type": "table", "table": {"title": "Hotels", "result_set": rs}},
+        {"type": "table", "table": {}},
+    ]}
+
+    assert agent_tables(resp) == [decode_result_set(rs, title="Hotels")]
+    assert agent_tables({"raw": ""}) == []
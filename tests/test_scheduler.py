@@ -0,0 +1,91 @@
+import threading, time
+
+import pytest
+
+from travel_planner.scheduler import DeadlineExceeded, Limiter, SchedulerOverloaded, request_deadline
+
+
+def _queue(limiter, lane, admitted):
+    """Start a thread that acquires `limiter` in `lane`, records its lane and releases at once."""
+    def run():
+        with limiter.acquire(lane):
+            admitted.append(lane)
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    return t
+
+
+def _wait_queued(limiter, n):
+    deadline = time.monotonic() + 2
+    while sum(limiter.stats()["queued"].values()) < n and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_waiters_are_served_by_lane_priority():
+    limiter = Limiter("test", 1)
+    held = limiter.acquire("interactive")
+    admitted = []
+    threads = []
+    for lane in ("background", "batch", "background", "interactive"):
+        threads.append(_queue(limiter, lane, admitted))
+        _wait_queued(limiter, len(threads))
+
+    held.release()
+    for t in threads:
+        t.join(2)
+
+    assert admitted == ["interactive", "batch", "background", "background"]
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_a_full_lane_is_shed_without_blocking_other_lanes():
+    limiter = Limiter("test", 1, queue_max=1)
+    held = limiter.acquire("interactive")
+    admitted = []
+    waiter = _queue(limiter, "background", admitted)
+    _wait_queued(limiter, 1)
+
+    t0 = time.monotonic()
+    with pytest.raises(SchedulerOverloaded) as exc:
+        limiter.acquire("background")
+    assert time.monotonic() - t0 < 0.1
+    assert exc.value.retry_after > 0
+    # Interactive callers still queue, and go first.
+    interactive = _queue(limiter, "interactive", admitted)
+    _wait_queued(limiter, 2)
+    held.release()
+    waiter.join(2)
+    interactive.join(2)
+
+    assert admitted == ["interactive", "background"]
+    lanes = limiter.stats()["lanes"]
+    assert lanes["background"]["shed"] == 1 and lanes["background"]["admitted"] == 1
+
+
+def test_waiters_give_up_after_the_queue_timeout_or_request_deadline():
+    limiter = Limiter("test", 1, queue_timeout=0.1)
+    held = limiter.acquire()
+    with pytest.raises(SchedulerOverloaded):
+        limiter.acquire("batch")
+
+    token = request_deadline.set(time.monotonic() + 0.05)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            limiter.acquire()
+    finally:
+        request_deadline.reset(token)
+    held.release()
+
+    stats = limiter.stats()
+    assert stats["queued"] == {"interactive": 0, "batch": 0, "background": 0}
+    assert stats["lanes"]["batch"]["timeouts"] == 1 and stats["lanes"]["interactive"]["timeouts"] == 1
+
+
+def test_rate_limit_spaces_out_admissions():
+    limiter = Limiter("test", 10, rate=20)
+    t0 = time.monotonic()
+    for _ in range(25):
+        limiter.acquire().release()
+    # A one-second burst of 20, then one token every 50ms.
+    assert 0.2 <= time.monotonic() - t0 < 1.0
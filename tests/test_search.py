@@ -0,0 +1,133 @@
+import time
+
+import pytest
+
+from travel_planner import search
+from travel_planner.config import get_config
+from travel_planner.search import (
+    _FLIGHT_ROW_TYPE, _HOTEL_ROW_TYPE, TravelSearchIndex, TravelSearchStore, parse_search_prompt, travel_search,
+)
+
+
+def _rs(row_type, rows):
+    names = [c["name"] for c in row_type]
+    return {"resultSetMetaData": {"rowType": row_type}, "data": [[row.get(n) for n in names] for row in rows]}
+
+
+def _flight(airline, src, dst, price, stops, duration, dep):
+    return {"AIRLINE": airline, "SOURCE": src[0], "IATA_SOURCE": src[1], "DESTINATION": dst[0],
+            "IATA_DESTINATION": dst[1], "PRICE": str(price), "TOTAL_STOPS": str(stops),
+            "DURATION": duration, "DEP_TIME": dep}
+
+
+def _hotel(name, city, price, rating, breakfast):
+    return {"HOTEL_NAME": name, "CITY": city, "HOTEL_PRICE": str(price), "HOTEL_RATING": str(rating),
+            "BREAKFAST_INCLUDED": breakfast}
+
+
+SIN, HND, DEL, DPS = ("Singapore", "SIN"), ("Tokyo", "HND"), ("Delhi", "DEL"), ("Denpasar (Bali)", "DPS")
+FLIGHTS = [
+    _flight("Singapore Airlines", SIN, HND, 520, 0, "7:10", "08:00:00"),
+    _flight("ANA", SIN, HND, 480, 0, "7:00", "23:15:00"),
+    _flight("Scoot", SIN, HND, 310, 1, "11:30", "06:40:00"),
+    _flight("IndiGo", DEL, SIN, 290, 1, "9:05", "02:10:00"),
+    _flight("Garuda", SIN, DPS, 150, 0, "2:40", "10:00:00"),
+]
+HOTELS = [
+    _hotel("Shinjuku Stay", "Tokyo", 180, 4.1, "Free breakfast"),
+    _hotel("Ginza Grand", "Tokyo", 420, 4.8, "Paid"),
+    _hotel("Asakusa Inn", "Tokyo", 95, 3.6, None),
+    _hotel("Ubud Villas", "Denpasar (Bali)", 210, 4.6, "Free breakfast"),
+]
+
+
+@pytest.fixture
+def index():
+    return TravelSearchIndex(_rs(_FLIGHT_ROW_TYPE, FLIGHTS), _rs(_HOTEL_ROW_TYPE, HOTELS), origin="test")
+
+
+def _airlines(index, **query):
+    ids, _ = index.search_flights(**query)
+    return [index.flights.column("AIRLINE")[i] for i in ids]
+
+
+def _hotels(index, **query):
+    ids, _ = index.search_hotels(**query)
+    return [index.hotels.column("HOTEL_NAME")[i] for i in ids]
+
+
+def test_search_flights_by_route_code_or_city(index):
+    assert _airlines(index, source="SIN", destination="HND") == ["Scoot", "ANA", "Singapore Airlines"]
+    assert _airlines(index, source="singapore", destination="tokyo", max_stops=0) == ["ANA", "Singapore Airlines"]
+    # "Denpasar (Bali)" is indexed under the full name and both of its parts.
+    assert _airlines(index, destination="Bali") == ["Garuda"]
+    assert _airlines(index, source="Nowhere") == []
+
+
+def test_search_flights_filters_and_sorts(index):
+    ids, total = index.search_flights(min_price=300, max_price=500, limit=1)
+    assert total == 2 and [index.flights.column("AIRLINE")[i] for i in ids] == ["Scoot"]
+    assert _airlines(index, source="SIN", sort="duration") == ["Garuda", "ANA", "Singapore Airlines", "Scoot"]
+    assert _airlines(index, source="SIN", direct=True, sort="departure") == ["Singapore Airlines", "Garuda", "ANA"]
+    assert _airlines(index, airline="singapore") == ["Singapore Airlines"]
+    with pytest.raises(ValueError):
+        index.search_flights(sort="cheapest")
+
+
+def test_search_hotels(index):
+    assert _hotels(index, city="Tokyo") == ["Asakusa Inn", "Shinjuku Stay", "Ginza Grand"]
+    assert _hotels(index, city="tokyo", sort="rating", limit=2) == ["Ginza Grand", "Shinjuku Stay"]
+    assert _hotels(index, min_rating=4.5) == ["Ubud Villas", "Ginza Grand"]
+    assert _hotels(index, breakfast=True, max_price=200) == ["Shinjuku Stay"]
+    assert _hotels(index, min_price=100, max_price=250) == ["Shinjuku Stay", "Ubud Villas"]
+
+
+def test_vectorised_filtering_matches_plain_python(index, monkeypatch):
+    pytest.importorskip("numpy")
+    queries = [dict(source="SIN", max_price=500), dict(max_stops=0, sort="duration"), dict(min_price=200, limit=2)]
+    expected = [index.search_flights(**q) for q in queries]
+    monkeypatch.setattr(TravelSearchIndex, "VECTOR_MIN_ROWS", 1)
+    assert [index.search_flights(**q) for q in queries] == expected
+
+
+@pytest.mark.parametrize("prompt, kind, filters", [
+    ("cheapest direct flight SIN→HND", "flights", {"source": "SIN", "destination": "HND", "max_stops": 0}),
+    ("top 3 fastest flights from Delhi to Mumbai under 8,000", "flights",
+     {"max_price": 8000.0, "limit": 3, "source": "Delhi", "destination": "Mumbai", "sort": "duration"}),
+    ("earliest flight Delhi to Goa", "flights", {"source": "Delhi", "destination": "Goa", "sort": "departure"}),
+    ("hotels in Tokyo under 300 with free breakfast", "hotels", {"max_price": 300.0, "city": "Tokyo", "breakfast": True}),
+    ("best rated hotels in Bali 4+ stars", "hotels", {"city": "Bali", "min_rating": 4.0, "sort": "rating"}),
+])
+def test_parse_search_prompt(prompt, kind, filters):
+    assert parse_search_prompt(prompt) == (kind, filters)
+
+
+def test_travel_search_answers_from_the_csv_snapshot(monkeypatch):
+    monkeypatch.setenv("TRAVEL_SEARCH_REFRESH_SECONDS", "0")
+
+    out = travel_search(prompt="cheapest direct flight SIN→HND", filters={"limit": 2})
+
+    assert out["kind"] == "flights" and out["source"]["origin"] == "csv"
+    assert out["query"]["limit"] == 2 and out["total_matches"] >= 2
+    table = out["tables"][0]
+    assert table["num_rows"] == 2
+    assert table["data"]["PRICE"] == sorted(table["data"]["PRICE"])
+    assert set(table["data"]["IATA_DESTINATION"]) == {"HND"}
+    assert travel_search(kind="trains")["error"]
+    assert "invalid search filters" in travel_search(kind="hotels", filters={"seats": 2})["error"]
+
+
+def test_store_refreshes_from_snowflake_only_once_the_csv_snapshot_is_stale(monkeypatch):
+    queries = []
+    monkeypatch.setattr(search, "snowflake_query", lambda statement: queries.append(statement) or {})
+    store = TravelSearchStore(get_config().gazetteer_data_dir, refresh_seconds=0.2, retry_seconds=60)
+
+    assert store.get().origin == "csv"
+    time.sleep(0.05)
+    assert queries == []
+    time.sleep(0.2)
+    store.get()
+    deadline = time.monotonic() + 2
+    while len(queries) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(queries) == 2 and store.get().origin == "snowflake"
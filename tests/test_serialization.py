@@ -0,0 +1,43 @@
+import datetime, decimal, json
+
+import pytest
+
+from travel_planner.serialization import json_dumps, make_json_safe
+
+
+def test_json_dumps_converts_known_types():
+    value = {
+        "when": datetime.date(2025, 1, 2),
+        "at": datetime.datetime(2025, 1, 2, 8, 30),
+        "price": decimal.Decimal("412.50"),
+        "tags": frozenset({"direct"}),
+        "blob": b"SIN\xe2\x86\x92NRT",
+        "big": 2 ** 70,
+        1: "non-str key",
+    }
+
+    out = json.loads(json_dumps(value))
+
+    assert out == {
+        "when": "2025-01-02", "at": "2025-01-02 08:30:00", "price": 412.5, "tags": ["direct"],
+        "blob": "SIN→NRT", "big": 2 ** 70, "1": "non-str key",
+    }
+    assert make_json_safe(value) == out
+
+
+def test_json_dumps_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        json_dumps({"error": ValueError("boom")})
+
+
+def test_unknown_types_are_encoded_once(monkeypatch):
+    pytest.importorskip("orjson")
+    from travel_planner import serialization
+
+    calls = []
+    monkeypatch.setattr(serialization.json, "dumps", lambda *a, **kw: calls.append(a) or "")
+    with pytest.raises(TypeError):
+        json_dumps({"error": ValueError("boom")})
+    assert calls == []
+    json_dumps({"big": 2 ** 70})
+    assert len(calls) == 1
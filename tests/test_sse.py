@@ -0,0 +1,90 @@
+import json, time
+
+from travel_planner.cortex_client import (
+    CortexStreamCollector, iter_cortex_agent_events, iter_cortex_events, iter_sse, parse_cortex_sse,
+)
+
+STREAM = (
+    'event: response.status\ndata: {"status": "planning"}\n\n'
+    'event: response.text.delta\ndata: {"text": "Fly "}\n\n'
+    ': keep-alive comment\n\n'
+    'event: response.text.delta\r\ndata: {"text": "SIN\\u2192NRT"}\r\n\r\n'
+    'event: response.table\ndata: {"result_set":\ndata:  {"data": [["SQ12"]]}}\n\n'
+    'event: response\ndata: {"role": "assistant", "content": [{"type": "text", "text": "Fly SIN\\u2192NRT"}]}'
+)
+
+
+def _chunked_lines(raw, size):
+    """Re-split `raw` into lines the way a streamed response does, reading `size`-byte chunks."""
+    pending = b""
+    data = raw.encode("utf-8")
+    for i in range(0, len(data), size):
+        pending += data[i:i + size]
+        *lines, pending = pending.split(b"\n")
+        for ln in lines:
+            yield ln.rstrip(b"\r")
+    if pending:
+        yield pending
+
+
+def test_iter_sse_frames_events_across_chunk_boundaries():
+    expected = list(iter_sse(STREAM.splitlines()))
+    assert [name for name, _ in expected] == [
+        "response.status", "response.text.delta", "response.text.delta", "response.table", "response",
+    ]
+    # Multi-line data is joined with newlines and still decodes.
+    assert json.loads(expected[3][1]) == {"result_set": {"data": [["SQ12"]]}}
+    for size in (1, 3, 7, 64, 4096):
+        assert list(iter_sse(_chunked_lines(STREAM, size))) == expected
+
+
+def test_iter_sse_yields_each_event_before_reading_the_next():
+    read = []
+
+    def lines():
+        for ln in ["event: a", "data: 1", "", "event: b", "data: 2", ""]:
+            read.append(ln)
+            yield ln
+
+    events = iter_sse(lines())
+    assert next(events) == ("a", "1")
+    assert read == ["event: a", "data: 1", ""]
+    assert next(events) == ("b", "2")
+
+
+def test_iter_sse_defaults_and_skips_empty_blocks():
+    lines = ["data:no-space", "", "event: orphan", "", "", "data: tail"]
+    assert list(iter_sse(lines)) == [("message", "no-space"), ("message", "tail")]
+
+
+def test_cortex_events_are_typed_and_collected():
+    stats = {}
+    events = list(iter_cortex_events(_chunked_lines(STREAM, 5), stats=stats))
+
+    assert [ev["type"] for ev in events] == ["status", "text_delta", "text_delta", "table", "response"]
+    assert "".join(ev["text"] for ev in events if ev["type"] == "text_delta") == "Fly SIN→NRT"
+    assert events[3]["result_set"] == {"data": [["SQ12"]]}
+    assert stats["events"] == 5
+
+    collector = CortexStreamCollector()
+    for ev in events[:-1]:
+        collector.add(ev)
+    partial = collector.result()
+    assert partial["incomplete"] is True
+    assert partial["content"][0] == {"type": "text", "text": "Fly SIN→NRT"}
+    collector.add(events[-1])
+    assert collector.result() == parse_cortex_sse(STREAM)
+
+
+def test_events_are_delivered_as_they_arrive(mock_server):
+    # Events 0.2s apart, each smaller than a read buffer: none may wait for the buffer to fill.
+    mock_server.config.cortex_event_delay = 0.2
+    t0 = time.monotonic()
+    arrivals = [(ev["type"], time.monotonic() - t0) for ev in iter_cortex_agent_events("Singapore to Tokyo")]
+
+    content = [t for kind, t in arrivals if kind in ("status", "tool_use", "table", "text_delta")]
+    end = arrivals[-1][1]
+    assert end > 1.0
+    assert content[0] < 0.5
+    # Successive events arrive spread out over the stream, not in one burst.
+    assert sum(1 for t in content if t < end - 0.5) >= 3
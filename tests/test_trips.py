@@ -0,0 +1,109 @@
+import time
+
+from travel_planner import scheduler, trips
+
+
+def _wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def test_cortex_branch_timeout_stops_the_stream(mock_server, fake_agent, monkeypatch):
+    # The plan streams one text delta every 0.1s for well over a second;
+    # the branch is cut off after 0.4s.
+    monkeypatch.setenv("CORTEX_BRANCH_TIMEOUT_SECONDS", "0.4")
+    mock_server.config.cortex_latency = 0.0
+    mock_server.config.cortex_event_delay = 0.1
+
+    result = trips.cortex_agent_trip("Singapore to Tokyo for 3 nights", use_cache=False)
+
+    timings = result["raw_context"]["timings"]
+    assert timings["cortex_agent"]["status"] == "timeout"
+    assert result["partial"] is True
+    assert result["raw_context"]["cortex_agent_response"]["incomplete"] is True
+    # The abandoned branch closes its response at the next event, which
+    # releases its Snowflake slot long before the stream would have ended.
+    snowflake = scheduler.limits()["snowflake"]
+    assert _wait_for(lambda: snowflake.stats()["in_flight"] == 0, timeout=0.5)
+
+
+def test_concurrent_trip_combines_both_branches(mock_server, fake_agent):
+    result = trips.cortex_agent_trip("Singapore to Tokyo for 3 nights", use_cache=False)
+
+    assert "partial" not in result
+    assert result["best_trip_recommendation"]
+    assert result["tables"]
+    assert result["raw_context"]["timings"]["cortex_agent"]["status"] == "ok"
+    assert result["raw_context"]["wiki_destination_info"]["destinations"]
+
+
+def test_trip_with_a_failed_wiki_branch_is_not_cached(mock_server, fake_agent, monkeypatch):
+    def broken_wiki(*args, **kwargs):
+        raise RuntimeError("wiki down")
+
+    monkeypatch.setattr(trips, "wiki_destination_info_from_prompt", broken_wiki)
+    result = trips.cortex_agent_trip("Singapore to Tokyo for 3 nights")
+
+    assert result["raw_context"]["timings"]["wiki"]["status"] == "error"
+    assert "partial" not in result
+    assert trips.trip_cache_stats()["size"] == 0
+
+
+def _stream(prompt, deadline_seconds):
+    token = scheduler.request_deadline.set(time.monotonic() + deadline_seconds)
+    try:
+        return list(trips.cortex_agent_trip_stream(prompt, use_cache=False))
+    finally:
+        scheduler.request_deadline.reset(token)
+
+
+def test_stream_ends_at_the_deadline_while_the_agent_is_silent(mock_server, fake_agent):
+    # One event every second: the deadline passes while waiting for the second table.
+    mock_server.config.cortex_latency = 0.0
+    mock_server.config.cortex_event_delay = 1.0
+
+    t0 = time.monotonic()
+    events = _stream("Singapore to Tokyo for 3 nights", 1.3)
+
+    assert time.monotonic() - t0 < 1.8
+    assert [ev["type"] for ev in events].count("table") == 1
+    final = events[-1]
+    assert final["type"] == "final"
+    assert final["data"]["partial"] is True and "trip_plan" in final["data"]["missing"]
+    assert final["data"]["raw_context"]["timings"]["cortex_agent"]["status"] == "timeout"
+    snowflake = scheduler.limits()["snowflake"]
+    assert _wait_for(lambda: snowflake.stats()["in_flight"] == 0, timeout=0.5)
+
+
+def test_stalled_stream_reports_a_timeout(mock_server, fake_agent):
+    mock_server.config.cortex_stall_rate = 1.0
+    mock_server.config.cortex_stall_seconds = 3.0
+
+    t0 = time.monotonic()
+    events = _stream("Singapore to Tokyo for 3 nights", 0.5)
+
+    assert time.monotonic() - t0 < 1.5
+    assert events[-1]["type"] == "error"
+    assert events[-1]["raw_context"]["deadline_exceeded"] is True
+    assert events[-1]["raw_context"]["timings"]["cortex_agent"]["status"] == "timeout"
+
+
+def test_stream_keeps_events_that_arrive_after_the_deadline(mock_server, fake_agent, monkeypatch):
+    # Everything arrives in one burst once the deadline has passed.
+    def late_events(user_input, stats=None):
+        time.sleep(0.4)
+        yield {"type": "text_delta", "event": "response.text.delta", "data": {}, "text": "Fly SQ12"}
+        yield {"type": "text_delta", "event": "response.text.delta", "data": {}, "text": " on Friday"}
+        yield {"type": "result", "data": {"error": "Cortex Agent error: deadline", "deadline_exceeded": True}}
+
+    monkeypatch.setattr(trips, "iter_cortex_agent_events", late_events)
+    events = _stream("Singapore to Tokyo for 3 nights", 0.2)
+
+    final = events[-1]
+    assert final["type"] == "final"
+    assert final["data"]["best_trip_recommendation"] == "Fly SQ12"
+    assert final["data"]["partial"] is True and "trip_plan" in final["data"]["missing"]
@@ -0,0 +1,65 @@
+import threading
+
+from travel_planner import wiki
+
+
+def _observe_text(prefetch, text):
+    prefetch.observe({"type": "text_delta", "text": text + "\n"})
+
+
+def test_prefetch_does_not_deadlock_a_small_wiki_pool(mock_server, monkeypatch):
+    # Two workers: both are busy with prefetches when the request's own
+    # fetches for Tokyo and Kyoto queue up behind the prefetches of the same
+    # titles. A prefetch waiting on those fetches would hold both workers.
+    monkeypatch.setenv("WIKI_MAX_CONCURRENCY", "2")
+    mock_server.config.wiki_latency = 0.3
+    prefetch = wiki.WikiPrefetcher()
+    _observe_text(prefetch, "Fly into Bangkok, then on to Hanoi.")
+    _observe_text(prefetch, "Finish the trip in Tokyo and Kyoto.")
+    assert prefetch.stats()["titles"] == ["Bangkok", "Hanoi", "Tokyo", "Kyoto"]
+
+    result = {}
+    worker = threading.Thread(
+        target=lambda: result.update(wiki.wiki_destination_info(["Tokyo", "Kyoto"])), daemon=True
+    )
+    worker.start()
+    worker.join(timeout=10)
+    assert not worker.is_alive(), "wiki_destination_info deadlocked behind the prefetcher"
+    assert result["destinations"] == ["Tokyo", "Kyoto"]
+    assert [s["title"] for s in result["summaries"]] == ["Tokyo", "Kyoto"]
+    prefetch.finish()
+
+
+def test_prefetched_summaries_are_cached(mock_server):
+    prefetch = wiki.WikiPrefetcher()
+    _observe_text(prefetch, "Stay three nights in Singapore.")
+    assert prefetch.wait_destinations(timeout=5) == ["Singapore"]
+    prefetch.finish()
+    for f in prefetch._futures:
+        f.result(timeout=5)
+    before = mock_server.config.counters["wiki_requests"]
+    info = wiki.wiki_destination_info(["Singapore"])
+    assert info["summaries"][0]["title"] == "Singapore"
+    assert mock_server.config.counters["wiki_requests"] == before
+
+
+def test_travel_summary_is_not_cached_when_every_lookup_failed(fake_agent):
+    failed = {"wiki": {"summaries": [{"title": "Tokyo", "error": "503"}, {"title": "Kyoto", "error": "not_found"}]}}
+    found = {"wiki": {"summaries": [{"title": "Tokyo", "extract": "Capital of Japan."}, {"title": "Kyoto", "error": "503"}]}}
+    cache = wiki._travel_summary_cache()
+
+    assert wiki.wiki_travel_summary(failed, destinations=["Tokyo", "Kyoto"])
+    assert cache.stats()["size"] == 0
+    wiki.wiki_travel_summary(found, destinations=["Tokyo", "Kyoto"])
+    assert cache.stats()["size"] == 1
+
+
+def test_prefetch_keeps_only_the_unscanned_tail(mock_server):
+    prefetch = wiki.WikiPrefetcher()
+    _observe_text(prefetch, "Fly into Bangkok.")
+    prefetch.observe({"type": "text_delta", "text": "Then on to Ha"})
+    assert prefetch._text == "Then on to Ha"
+    prefetch.observe({"type": "text_delta", "text": "noi."})
+    prefetch.finish()
+    assert prefetch._text == ""
+    assert prefetch.stats()["titles"] == ["Bangkok", "Hanoi"]
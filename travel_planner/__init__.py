@@ -0,0 +1,39 @@
+"""
+Travel planning pipeline behind the AgentCore entrypoint in `travel_agent.py`:
+Snowflake Cortex Agent trips, Wikipedia enrichment, local flight/hotel search,
+and the scheduling, caching and telemetry around them.
+"""
+
+from .agents import agent_pool_stats
+from .config import Config, credentials_stats, get_config
+from .cortex_client import cortex_http_stats, cortex_router_stats
+from .result_sets import decode_result_set
+from .scheduler import DeadlineExceeded, SchedulerOverloaded, scheduler_stats
+from .search import travel_search, travel_search_stats
+from .telemetry import telemetry
+from .trips import cortex_agent_trip, cortex_agent_trip_batch, cortex_agent_trip_stream, trip_cache_stats
+from .wiki import travel_summary_cache_stats, wiki_cache_stats, wiki_destination_info, wiki_travel_summary
+
+__all__ = [
+    "Config",
+    "DeadlineExceeded",
+    "SchedulerOverloaded",
+    "agent_pool_stats",
+    "cortex_agent_trip",
+    "cortex_agent_trip_batch",
+    "cortex_agent_trip_stream",
+    "cortex_http_stats",
+    "cortex_router_stats",
+    "credentials_stats",
+    "decode_result_set",
+    "get_config",
+    "scheduler_stats",
+    "telemetry",
+    "travel_search",
+    "travel_search_stats",
+    "travel_summary_cache_stats",
+    "trip_cache_stats",
+    "wiki_cache_stats",
+    "wiki_destination_info",
+    "wiki_travel_summary",
+]
@@ -0,0 +1,149 @@
+"""Pooled Strands agents for the Claude calls of the wiki pipeline."""
+
+import concurrent.futures, threading, time
+
+from .config import get_config, singleton
+from .scheduler import DeadlineExceeded, limits, shared_executor, stage_timeout
+from .telemetry import span, submit_in_context
+
+
+# Heavy dependencies (strands, requests, boto3) are imported on first use so
+# module import stays fast on AgentCore cold starts.
+Agent = None  # strands.Agent, resolved by agent_class()
+
+
+def agent_class():
+    global Agent
+    if Agent is None:
+        from strands import Agent as _StrandsAgent
+
+        Agent = _StrandsAgent
+    return Agent
+
+
+class AgentPool:
+    """
+    Pool of pre-built Strands `Agent`s keyed by `(model, system_prompt)`.
+
+    Building an Agent resolves credentials and creates a Bedrock client, so
+    agents are reused across calls instead of constructed per request. Each
+    agent is checked out by one caller at a time and its conversation history
+    is cleared on checkout and return, so concurrent requests never share
+    messages. Construction and call times are tracked separately.
+    """
+
+    def __init__(self, max_idle=8):
+        self.max_idle = max(0, int(max_idle))
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._metrics = {
+            "constructed": 0,
+            "construct_seconds": 0.0,
+            "reused": 0,
+            "calls": 0,
+            "call_seconds": 0.0,
+            "call_errors": 0,
+        }
+
+    def _build(self, model, system_prompt, tools=()):
+        t0 = time.perf_counter()
+        kwargs = {"tools": list(tools)} if tools else {}
+        agent = agent_class()(model=model, system_prompt=system_prompt, **kwargs)
+        with self._lock:
+            self._metrics["constructed"] += 1
+            self._metrics["construct_seconds"] += time.perf_counter() - t0
+        return agent
+
+    def _checkout(self, key):
+        """Return `(agent, constructed)` — an idle agent, or a newly built one."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._metrics["reused"] += 1
+                return idle.pop(), False
+        return self._build(*key), True
+
+    def _checkin(self, key, agent):
+        agent.messages.clear()
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(agent)
+
+    def call(self, model, system_prompt, prompt, tools=()) -> str:
+        """Run `prompt` through a pooled agent (with `tools`, if any) and return its text output."""
+        key = (model, system_prompt, tuple(tools))
+        with span("llm.call", model=model, prompt_chars=len(prompt)) as sp:
+            left = stage_timeout(None, "the model call")
+            agent, constructed = self._checkout(key)
+            sp.set("agent_constructed", constructed)
+            if left is None:
+                out = self._invoke(agent, prompt)
+            else:
+                out = self._invoke_within(agent, prompt, left)
+            sp.set("output_chars", len(out))
+        self._checkin(key, agent)
+        return out
+
+    def _invoke_within(self, agent, prompt, seconds):
+        """`_invoke` bounded to `seconds`; on timeout the busy agent is dropped, not pooled."""
+        fut = submit_in_context(_llm_executor(), self._invoke, agent, prompt)
+        try:
+            return fut.result(timeout=seconds)
+        except concurrent.futures.TimeoutError:
+            if not fut.done():
+                raise DeadlineExceeded(f"model call exceeded the request deadline ({seconds:.1f}s left)") from None
+            raise
+
+    def _invoke(self, agent, prompt):
+        agent.messages.clear()
+        t0 = time.perf_counter()
+        try:
+            with limits()["bedrock"].acquire():
+                return str(agent(prompt))
+        except Exception:
+            # Don't return an agent in an unknown state to the pool.
+            with self._lock:
+                self._metrics["call_errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._metrics["calls"] += 1
+                self._metrics["call_seconds"] += time.perf_counter() - t0
+
+    def warm(self, specs):
+        """Pre-build one idle agent per `(model, system_prompt[, tools])` in `specs`."""
+        for model, system_prompt, *tools in specs:
+            key = (model, system_prompt, tuple(tools[0]) if tools else ())
+            with self._lock:
+                if self._idle.get(key):
+                    continue
+            try:
+                self._checkin(key, self._build(*key))
+            except Exception as e:
+                print(f"Warning: could not pre-build Strands agent for {model}: {e}")
+
+    def stats(self):
+        with self._lock:
+            m = dict(self._metrics)
+            m["idle"] = sum(len(v) for v in self._idle.values())
+        m["avg_construct_seconds"] = round(m["construct_seconds"] / m["constructed"], 4) if m["constructed"] else 0.0
+        m["avg_call_seconds"] = round(m["call_seconds"] / m["calls"], 4) if m["calls"] else 0.0
+        m["construct_seconds"] = round(m["construct_seconds"], 4)
+        m["call_seconds"] = round(m["call_seconds"], 4)
+        return m
+
+
+@singleton
+def agent_pool():
+    return AgentPool(max_idle=get_config().agent_pool_max_idle)
+
+
+def _llm_executor():
+    """Model calls under a request deadline run here so the caller can stop waiting."""
+    return shared_executor("llm-call", max(4, 2 * get_config().bedrock_max_concurrency))
+
+
+def agent_pool_stats():
+    """Construction vs. call timing counters for the Strands agent pool."""
+    return agent_pool().stats()
@@ -0,0 +1,275 @@
+"""In-process caches: the TTL/LRU cache and the trip response cache."""
+
+import json, threading, time
+
+from .gazetteer import get_gazetteer
+from .serialization import json_dumps
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry expiry and hit/miss counters.
+
+    Entries live in an in-memory `OrderedDict` bounded to `max_entries`
+    (least recently used evicted first). When `path` is set, entries are
+    also written through to a SQLite table so a restarted process starts
+    warm; values must then be JSON-serialisable.
+    """
+
+    _MISS = object()
+
+    def __init__(self, name, max_entries=1024, ttl_seconds=3600.0, path=None):
+        import collections
+
+        self.name = name
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._path = path or None
+        self._db_conn = None
+        self.hits = self.misses = self.evictions = self.disk_hits = 0
+
+    @property
+    def _db(self):
+        """The SQLite connection when `path` is set, opened on first use (callers hold `_lock`)."""
+        if self._path is not None:
+            path, self._path = self._path, None
+            try:
+                self._db_conn = self._open_db(path)
+            except Exception as e:
+                print(f"Warning: {self.name} cache persistence disabled ({path}): {e}")
+        return self._db_conn
+
+    def _open_db(self, path):
+        import sqlite3
+
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " cache TEXT NOT NULL, key TEXT NOT NULL, expires REAL NOT NULL, value TEXT NOT NULL,"
+            " PRIMARY KEY (cache, key))"
+        )
+        # Drop expired rows and anything beyond the size bound (soonest expiry first).
+        db.execute("DELETE FROM cache_entries WHERE cache = ? AND expires <= ?", (self.name, time.time()))
+        db.execute(
+            "DELETE FROM cache_entries WHERE cache = ? AND key NOT IN ("
+            " SELECT key FROM cache_entries WHERE cache = ? ORDER BY expires DESC LIMIT ?)",
+            (self.name, self.name, self.max_entries),
+        )
+        return db
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+            value = self._db_get(key, now)
+            if value is not self._MISS:
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else float(ttl_seconds)
+        if ttl <= 0:
+            return
+        expires = time.time() + ttl
+        with self._lock:
+            self._put(key, expires, value)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO cache_entries (cache, key, expires, value) VALUES (?, ?, ?, ?)",
+                        (self.name, key, expires, json_dumps(value).decode("utf-8")),
+                    )
+                except Exception as e:
+                    print(f"Warning: could not persist {self.name} cache entry: {e}")
+
+    def _put(self, key, expires, value):
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            old_key, _ = self._data.popitem(last=False)
+            self.evictions += 1
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache_entries WHERE cache = ? AND key = ?", (self.name, old_key))
+
+    def _db_get(self, key, now):
+        if self._db is None:
+            return self._MISS
+        try:
+            row = self._db.execute(
+                "SELECT expires, value FROM cache_entries WHERE cache = ? AND key = ?", (self.name, key)
+            ).fetchone()
+        except Exception:
+            return self._MISS
+        if not row or row[0] <= now:
+            return self._MISS
+        value = json.loads(row[1])
+        self._put(key, row[0], value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache_entries WHERE cache = ?", (self.name,))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
+
+
+_PROMPT_TOKEN_RE = None
+
+
+def _normalise_prompt(text: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a prompt."""
+    global _PROMPT_TOKEN_RE
+    if _PROMPT_TOKEN_RE is None:
+        import re
+
+        _PROMPT_TOKEN_RE = re.compile(r"[^\W_]+")
+    import unicodedata
+
+    return " ".join(_PROMPT_TOKEN_RE.findall(unicodedata.normalize("NFKC", text or "").casefold()))
+
+
+def _prompt_vector(norm: str, dims: int = 4096):
+    """
+    Cheap local embedding: L2-normalised hashed bag of word unigrams and
+    character trigrams, as a sparse `{bucket: weight}` dict.
+    """
+    import hashlib
+
+    feats = {}
+    grams = norm.split()
+    padded = f" {norm} "
+    grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    for g in grams:
+        h = int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "big") % dims
+        feats[h] = feats.get(h, 0.0) + 1.0
+    norm2 = sum(v * v for v in feats.values()) ** 0.5 or 1.0
+    return {k: v / norm2 for k, v in feats.items()}
+
+
+class TripResponseCache:
+    """
+    Response cache for `cortex_agent_trip`.
+
+    Lookups first try the normalised prompt. With `semantic=True` a miss then
+    scans a local vector index for the most similar cached prompt; a match
+    must reach `threshold` cosine similarity *and* mention exactly the same
+    numbers, negations and gazetteer places, so "3 nights" never answers
+    "4 nights", "without breakfast" never answers "with breakfast", and
+    "Delhi to Pune" never answers "Delhi to Goa".
+    """
+
+    _NEGATIONS = frozenset({"no", "not", "without", "except", "avoid", "never", "non"})
+
+    def __init__(self, max_entries=256, ttl_seconds=900.0, semantic=False, threshold=0.85):
+        import collections
+
+        self._responses = TTLCache("trip_response", max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._index = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = self._responses.max_entries
+        self.semantic = semantic
+        self.threshold = float(threshold)
+        self.semantic_hits = 0
+
+    def _signature(self, user_input, norm):
+        tokens = norm.split()
+        numbers = frozenset(t for t in tokens if any(c.isdigit() for c in t))
+        negations = frozenset(t for t in tokens if t in self._NEGATIONS)
+        places = frozenset((m["title"], m["role"]) for m in get_gazetteer().find(user_input or ""))
+        return numbers, negations, places
+
+    def lookup(self, user_input):
+        """Return a copy of the cached response with `raw_context["cache"]` set, or None."""
+        norm = _normalise_prompt(user_input)
+        if not norm:
+            return None
+        entry = self._responses.get(norm)
+        meta = {"hit": True, "match": "exact"}
+        if entry is None and self.semantic:
+            vec = _prompt_vector(norm)
+            sig = self._signature(user_input, norm)
+            with self._lock:
+                candidates = list(self._index.items())
+            matches = []
+            for key, item in candidates:
+                other_vec, other_sig = item
+                if other_sig != sig:
+                    continue
+                small, large = (vec, other_vec) if len(vec) <= len(other_vec) else (other_vec, vec)
+                sim = sum(w * large.get(k, 0.0) for k, w in small.items())
+                if sim >= self.threshold:
+                    matches.append((sim, key, item))
+            matches.sort(key=lambda m: m[0], reverse=True)
+            for sim, key, item in matches:
+                entry = self._responses.get(key)
+                if entry is not None:
+                    meta = {"hit": True, "match": "semantic", "similarity": round(sim, 4)}
+                    with self._lock:
+                        self.semantic_hits += 1
+                    break
+                # The response expired or was evicted: drop its vector (unless
+                # it was stored again meanwhile) and try the next best match.
+                with self._lock:
+                    if self._index.get(key) is item:
+                        del self._index[key]
+        if entry is None:
+            return None
+        cached_at, response = entry
+        meta["age_seconds"] = round(time.time() - cached_at, 3)
+        out = dict(response)
+        out["raw_context"] = {**(response.get("raw_context") or {}), "cache": meta}
+        return out
+
+    def store(self, user_input, response):
+        """
+        Cache a successful response. Error and partial responses are never
+        cached, nor are ones where a branch in `raw_context["timings"]` did
+        not finish "ok" (e.g. the wiki branch raised or was cancelled).
+        """
+        if not isinstance(response, dict) or response.get("error") or response.get("partial"):
+            return
+        timings = (response.get("raw_context") or {}).get("timings") or {}
+        if any(isinstance(t, dict) and t.get("status", "ok") != "ok" for t in timings.values()):
+            return
+        norm = _normalise_prompt(user_input)
+        if not norm:
+            return
+        self._responses.set(norm, (time.time(), response))
+        if self.semantic:
+            item = (_prompt_vector(norm), self._signature(user_input, norm))
+            with self._lock:
+                self._index[norm] = item
+                self._index.move_to_end(norm)
+                while len(self._index) > self.max_entries:
+                    self._index.popitem(last=False)
+
+    def stats(self):
+        out = self._responses.stats()
+        out.update(semantic=self.semantic, semantic_hits=self.semantic_hits, threshold=self.threshold)
+        return out
@@ -0,0 +1,470 @@
+"""Runtime configuration and the cached AgentCore credentials."""
+
+import contextvars, dataclasses, functools, json, os, threading, time
+
+from .telemetry import span
+
+
+def load_secrets_from_aws(secret_name, region_name=None):
+    try:
+        import boto3
+        session = boto3.session.Session()
+        if region_name is None:
+            region_name = os.environ.get('AWS_REGION', 'us-east-1')
+        client = session.client(service_name='secretsmanager', region_name=region_name)
+        secret = client.get_secret_value(SecretId=secret_name)['SecretString']
+        return json.loads(secret)
+    except Exception as e:
+        print(f"Warning: Could not load secrets from AWS Secrets Manager: {e}"); return {}
+
+
+# Default AgentCore secret; AGENTCORE_SECRET_NAME="" disables Secrets Manager.
+_DEFAULT_SECRET_NAME = "arn:aws:secretsmanager:us-east-1:484577546576:secret:agentcore/travelplanner/credentials-tmqDBh"
+# FLIGHT_DATA.csv / HOTEL_DATA.csv ship next to travel_agent.py.
+_DEFAULT_DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _CredentialProvider:
+    """
+    In-memory cache of the AgentCore secret with refresh-ahead.
+
+    `get()` never waits: once the cached secret is due for refresh it starts
+    one background fetch and keeps serving the current value. Refreshes are
+    single-flight, so readers, the startup thread and any number of requests
+    that hit a 401 at the same time share one Secrets Manager call. The
+    secret is kept here and never copied into `os.environ`. Keys not present
+    in the secret fall back to the process environment, which is also the
+    only source when no secret name is configured.
+    """
+
+    def __init__(self, secret_name, refresh_seconds, refresh_ahead_seconds, retry_seconds, wait_seconds=10.0, fetch=None):
+        self.secret_name = secret_name
+        self.refresh_seconds = refresh_seconds
+        self.refresh_ahead_seconds = min(refresh_ahead_seconds, refresh_seconds)
+        self.retry_seconds = retry_seconds
+        self.wait_seconds = wait_seconds
+        self._fetch = fetch or load_secrets_from_aws
+        self._lock = threading.Lock()
+        self._values = {}
+        self._version = 0
+        self._fetched_at = None
+        self._next_refresh = 0.0 if secret_name else float("inf")
+        self._inflight = None
+        self._stats = {"refreshes": 0, "failures": 0, "coalesced": 0, "forced": 0}
+
+    @property
+    def version(self):
+        """Incremented on every successful fetch."""
+        return self._version
+
+    def get(self, key, default=None):
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        with self._lock:
+            value = self._values.get(key)
+        return value if value else os.getenv(key, default)
+
+    def refresh(self, wait=None):
+        """
+        Start a refresh, or join the one already running, and return its
+        completion event. With `wait` (seconds), block until it finishes or
+        the wait runs out; returns whether it finished.
+        """
+        if not self.secret_name:
+            done = threading.Event()
+            done.set()
+            return True if wait is not None else done
+        with self._lock:
+            done = self._inflight
+            if done is not None:
+                self._stats["coalesced"] += 1
+            else:
+                done = self._inflight = threading.Event()
+                threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(self._refresh, done),
+                    name="credentials-refresh",
+                    daemon=True,
+                ).start()
+        if wait is None:
+            return done
+        return done.wait(wait)
+
+    def refresh_rejected(self, key, rejected, wait=None):
+        """
+        Called when `rejected` (the value of `key`) was refused upstream.
+        Returns a different value to retry with, or None when a refresh did
+        not produce one within `wait` seconds.
+        """
+        current = self.get(key)
+        if current and current != rejected:
+            return current
+        with self._lock:
+            self._stats["forced"] += 1
+        self.refresh(wait=self.wait_seconds if wait is None else wait)
+        current = self.get(key)
+        return current if current and current != rejected else None
+
+    def _refresh(self, done):
+        values = {}
+        try:
+            with span("secrets.load") as sp:
+                values = self._fetch(self.secret_name) or {}
+                sp.set("secret_keys", len(values))
+        except Exception as e:
+            print(f"Warning: credential refresh failed: {e}")
+        now = time.monotonic()
+        with self._lock:
+            if values:
+                self._values = dict(values)
+                self._version += 1
+                self._fetched_at = time.time()
+                self._next_refresh = now + self.refresh_seconds - self.refresh_ahead_seconds
+                self._stats["refreshes"] += 1
+            else:
+                self._next_refresh = now + self.retry_seconds
+                self._stats["failures"] += 1
+            self._inflight = None
+        done.set()
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            out.update(
+                source="secretsmanager" if self.secret_name else "env",
+                version=self._version,
+                fetched_at=self._fetched_at,
+                refresh_in_seconds=(
+                    round(self._next_refresh - time.monotonic(), 1)
+                    if self._next_refresh != float("inf") else None
+                ),
+            )
+        return out
+
+
+def credentials_stats():
+    """Refresh counters and the age of the cached AgentCore secret."""
+    return credentials().stats()
+
+
+def try_load_secrets():
+    credentials().refresh(wait=Config.from_env().secrets_load_timeout_seconds)
+
+
+_config_lock = threading.Lock()
+_secrets_loaded = None  # threading.Event, once load_secrets_in_background() has run
+
+
+def load_secrets_in_background():
+    """
+    Start fetching the AgentCore secret (once) and return the event set when
+    it has finished. Without it, `get_config()` reads the environment as is.
+    """
+    global _secrets_loaded
+    with _config_lock:
+        if _secrets_loaded is None:
+            _secrets_loaded = credentials().refresh()
+        return _secrets_loaded
+
+
+def _normalise_account(raw: str) -> str:
+    """
+    Normalise Snowflake account so users can pass either just the locator
+    (e.g. "sfseapac-bsuresh") or the full host
+    (e.g. "sfseapac-bsuresh.snowflakecomputing.com" or a full https URL).
+    """
+    acct = (raw or "").strip()
+    acct = acct.replace("https://", "").replace("http://", "")
+    acct = acct.split("/")[0]
+    if ".snowflakecomputing.com" in acct:
+        acct = acct.split(".snowflakecomputing.com")[0]
+    return acct
+
+
+def _knob(default, env=None, lower=False):
+    """
+    A tuning field read from the environment variable `env` (default: the
+    field name upper-cased) and parsed by the type of `default`.
+    """
+    return dataclasses.field(default=default, metadata={"env": env, "lower": lower})
+
+
+def _parse_knob(field, raw):
+    if isinstance(field.default, bool):
+        return raw.lower() in ("1", "true", "yes")
+    if isinstance(field.default, (int, float)):
+        return type(field.default)(raw)
+    return raw.lower() if field.metadata["lower"] else raw
+
+
+@dataclasses.dataclass(frozen=True)
+class Config:
+    """
+    Runtime configuration, resolved once from the environment after secrets
+    have been loaded. Immutable, so it can be shared freely across threads.
+    Every tuning knob below is read from the upper-cased field name unless
+    noted otherwise.
+    """
+
+    snowflake_account: str
+    # Default to your actual Snowflake objects: database `travel_db`, schema `public`
+    snowflake_database: str
+    snowflake_schema: str
+    # Default orchestration model for Claude via Bedrock/Strands (used only for Wikipedia destination extraction)
+    model_id: str
+    # Cortex Agent defaults – you have an agent at travel_db.public.TRAVEL_AGENT
+    cortex_agent_database: str
+    cortex_agent_schema: str
+    cortex_agent_name: str
+    cortex_base_url: str
+    # Optional JSON list of Cortex Agent endpoints to route across (see cortex_hedge)
+    cortex_endpoints: str
+    # Wikipedia REST API configuration (for destination info lookups)
+    wiki_base_url: str
+    wiki_user_agent: str
+
+    # Credentials: the secret is cached in memory and re-read from Secrets
+    # Manager credentials_refresh_ahead_seconds before it is
+    # credentials_refresh_seconds old, so a rotated Snowflake PAT is picked up
+    # without a redeploy. A failed fetch is retried after
+    # credentials_retry_seconds; a 401 from Snowflake forces a refresh and
+    # waits for it at most credentials_wait_seconds. The first `get_config()`
+    # waits at most secrets_load_timeout_seconds for the startup fetch.
+    agentcore_secret_name: str = _knob(_DEFAULT_SECRET_NAME)
+    credentials_refresh_seconds: float = _knob(3600.0)
+    credentials_refresh_ahead_seconds: float = _knob(300.0)
+    credentials_retry_seconds: float = _knob(30.0)
+    credentials_wait_seconds: float = _knob(10.0)
+    secrets_load_timeout_seconds: float = _knob(15.0)
+    # Local span exporter (TRAVEL_AGENT_TRACE_FILE): every pipeline span is
+    # appended to this file as one JSON object per line.
+    trace_file: str = _knob("", env="TRAVEL_AGENT_TRACE_FILE")
+
+    # Wikipedia fetches: titles fetched in parallel (also the size of the
+    # keep-alive pool) and the per-fetch timeout. Summaries are cached in a
+    # bounded LRU with a TTL for found pages, a shorter one for 404s, and an
+    # optional SQLite file so warm entries survive restarts.
+    wiki_max_concurrency: int = _knob(8)
+    wiki_timeout_seconds: float = _knob(10.0)
+    wiki_cache_max_entries: int = _knob(1024)
+    wiki_cache_ttl_seconds: float = _knob(86400.0)
+    wiki_cache_negative_ttl_seconds: float = _knob(3600.0)
+    wiki_cache_path: str = _knob("")
+    # Destination extraction: "auto" tries the local gazetteer first and calls
+    # Claude only when it finds nothing, "gazetteer" never calls Claude, "llm"
+    # always does (the original behaviour).
+    destination_extractor: str = _knob("auto", lower=True)
+    # Speculative prefetch: destinations the Cortex Agent mentions while it
+    # streams have their summaries fetched straight away, at most
+    # wiki_prefetch_max_titles per request. When the prompt names no known
+    # place these stand in for the Claude extraction call; the wiki branch
+    # waits for the first one at most wiki_prefetch_wait_seconds.
+    wiki_prefetch: bool = _knob(True)
+    wiki_prefetch_max_titles: int = _knob(6)
+    wiki_prefetch_wait_seconds: float = _knob(30.0)
+    # Wiki pipeline: "staged" makes separate Claude calls for extraction and
+    # the travel summary; "fused" makes one call in which Claude fetches the
+    # summaries through a tool. Travel summaries are cached per destination set.
+    wiki_pipeline_mode: str = _knob("staged", lower=True)
+    travel_summary_cache_max_entries: int = _knob(512)
+    travel_summary_cache_ttl_seconds: float = _knob(86400.0)
+    # Directory holding FLIGHT_DATA.csv / HOTEL_DATA.csv, and an optional JSON
+    # file of extra {"alias": "Wikipedia title"} entries for the gazetteer.
+    gazetteer_data_dir: str = _knob(_DEFAULT_DATA_DIR)
+    gazetteer_aliases_file: str = _knob("")
+
+    # Local flight/hotel search (`mode="search"`): the CSV snapshot is
+    # re-read from Snowflake (SQL API, optional SNOWFLAKE_WAREHOUSE) every
+    # travel_search_refresh_seconds; 0 keeps the CSV snapshot.
+    travel_search_refresh_seconds: float = _knob(3600.0)
+    travel_search_retry_seconds: float = _knob(300.0)
+    snowflake_warehouse: str = _knob("")
+
+    # Strands agent pool: idle agents kept per (model, system prompt), and
+    # whether to pre-build them in the background at startup.
+    agent_pool_max_idle: int = _knob(8)
+    agent_pool_warm: bool = _knob(True)
+
+    # Cortex Agent HTTP client: keep-alive pool size, HTTP/2 ("auto" uses
+    # httpx+h2 when installed), retry policy for 429/5xx and connection
+    # errors, the longest Retry-After honoured, and the per-call timeout.
+    cortex_http_pool_size: int = _knob(32)
+    cortex_http2: str = _knob("auto", lower=True)
+    cortex_connect_timeout_seconds: float = _knob(10.0)
+    cortex_max_retries: int = _knob(3)
+    cortex_retry_backoff_seconds: float = _knob(0.5)
+    cortex_retry_max_backoff_seconds: float = _knob(8.0)
+    cortex_retry_after_max_seconds: float = _knob(30.0)
+    cortex_agent_timeout_seconds: float = _knob(60.0)
+    # Cortex Agent routing across cortex_endpoints (a JSON list of {"name",
+    # "base_url", "database", "schema", "agent", "weight", "token_key"}):
+    # each call goes to a weighted pick among healthy endpoints. With no
+    # content after that endpoint's recent cortex_hedge_quantile time to
+    # first event (at least cortex_hedge_min_delay_seconds), one hedged
+    # duplicate goes to the next endpoint. Failures before the first event
+    # fail over after cortex_failover_max_retries retries, and
+    # cortex_breaker_failures in a row open the endpoint's circuit for
+    # cortex_breaker_cooldown_seconds.
+    cortex_hedge: bool = _knob(True)
+    cortex_hedge_quantile: float = _knob(0.95)
+    cortex_hedge_min_delay_seconds: float = _knob(2.0)
+    cortex_failover_max_retries: int = _knob(0)
+    cortex_ewma_alpha: float = _knob(0.2)
+    cortex_breaker_failures: int = _knob(5)
+    cortex_breaker_cooldown_seconds: float = _knob(30.0)
+
+    # Trip response cache: exact match on the normalised prompt, plus
+    # optional similarity matching over hashed n-gram vectors.
+    trip_cache_max_entries: int = _knob(256)
+    trip_cache_ttl_seconds: float = _knob(900.0)
+    trip_cache_semantic: bool = _knob(False)
+    trip_cache_similarity: float = _knob(0.85)
+    # Trip execution: "concurrent" starts the Cortex Agent call and the
+    # Wikipedia enrichment at the same time, on trip_branch_workers threads,
+    # each under its own budget (0 disables); "sequential" keeps the
+    # original order.
+    trip_execution_mode: str = _knob("concurrent", lower=True)
+    trip_branch_workers: int = _knob(16)
+    cortex_branch_timeout_seconds: float = _knob(90.0)
+    wiki_branch_timeout_seconds: float = _knob(45.0)
+    # Batch mode: prompts run against Cortex at once (a per-request
+    # `max_concurrency` may only lower it) and the largest batch accepted.
+    batch_max_concurrency: int = _knob(4)
+    batch_max_items: int = _knob(500)
+
+    # Response profiles: "minimal", "ui" or "debug" (everything, including
+    # the raw payloads). With `payload["compress"]`, raw blobs of at least
+    # response_compress_min_bytes are sent gzip-compressed and base64-encoded.
+    response_profile: str = _knob("debug", lower=True)
+    response_compress_min_bytes: int = _knob(16384)
+
+    # Request scheduler: each invoke is admitted into a priority lane with at
+    # most scheduler_max_concurrency running at once. Calls to each
+    # dependency also go through a bounded pool and a token bucket
+    # (<dep>_rate_per_second, 0 disables). A lane holding scheduler_queue_max
+    # waiters sheds new work immediately, and waiters give up after
+    # scheduler_queue_timeout_seconds. Bedrock quotas vary by model and
+    # account, so its bucket is off by default.
+    scheduler_max_concurrency: int = _knob(32)
+    scheduler_queue_max: int = _knob(64)
+    scheduler_queue_timeout_seconds: float = _knob(15.0)
+    snowflake_max_concurrency: int = _knob(16)
+    snowflake_rate_per_second: float = _knob(10.0)
+    bedrock_max_concurrency: int = _knob(8)
+    bedrock_rate_per_second: float = _knob(0.0)
+    wiki_rate_per_second: float = _knob(50.0)
+    # Request deadline: `payload["deadline_seconds"]` or this (0 disables);
+    # each stage's timeout is capped to the time left, and once it runs out
+    # the request returns what is ready, marked `"partial": true`.
+    request_deadline_seconds: float = _knob(120.0)
+
+    @classmethod
+    def from_env(cls, getenv=os.getenv):
+        """
+        Resolve every field through `getenv(name, default)`: the process
+        environment, or `credentials().get` to see the AgentCore secret too.
+        """
+        account = _normalise_account(getenv("SNOWFLAKE_ACCOUNT", ""))
+        database = getenv("SNOWFLAKE_DATABASE", "travel_db")
+        schema = getenv("SNOWFLAKE_SCHEMA", "public")
+        knobs = {}
+        for field in dataclasses.fields(cls):
+            if "env" not in field.metadata:
+                continue
+            name = field.metadata["env"] or field.name.upper()
+            raw = getenv(name)
+            if raw is None:
+                continue
+            try:
+                knobs[field.name] = _parse_knob(field, raw)
+            except ValueError:
+                print(f"Warning: ignoring {name}={raw!r}; using the default {field.default!r}")
+        return cls(
+            snowflake_account=account,
+            snowflake_database=database,
+            snowflake_schema=schema,
+            model_id=getenv("MODEL_ID", "us.anthropic.claude-3-7-sonnet-20250219-v1:0"),
+            cortex_agent_database=getenv("CORTEX_AGENT_DATABASE", database or "travel_db"),
+            cortex_agent_schema=getenv("CORTEX_AGENT_SCHEMA", schema or "public"),
+            cortex_agent_name=getenv("CORTEX_AGENT_NAME", "TRAVEL_AGENT"),
+            cortex_base_url=getenv(
+                "CORTEX_BASE_URL", f"https://{account}.snowflakecomputing.com" if account else ""
+            ),
+            cortex_endpoints=getenv("CORTEX_ENDPOINTS", ""),
+            wiki_base_url=getenv("WIKI_BASE_URL", "https://en.wikipedia.org/api/rest_v1"),
+            wiki_user_agent=getenv(
+                "WIKI_USER_AGENT",
+                "TravelPlannerAgent/1.0 (Snowflake-AWS-AgentCore-Travel-Planner)",
+            ),
+            **knobs,
+        )
+
+
+_config = None
+_config_version = None
+
+
+def get_config() -> Config:
+    """
+    Resolve the runtime `Config` once, after the background secret fetch.
+    An incomplete config (no Snowflake account, e.g. because the fetch at
+    boot failed) is resolved again once a later credential refresh succeeds.
+    """
+    global _config, _config_version
+    if _config is None or (not _config.cortex_base_url and _config_version != credentials().version):
+        loaded = _secrets_loaded
+        if loaded is not None and not loaded.wait(Config.from_env().secrets_load_timeout_seconds):
+            print("Warning: secrets not loaded yet; resolving configuration from the current environment")
+        with _config_lock:
+            if _config is None or (not _config.cortex_base_url and _config_version != credentials().version):
+                _config_version = credentials().version
+                _config = Config.from_env(credentials().get)
+                if not _config.cortex_base_url:
+                    print("Warning: SNOWFLAKE_ACCOUNT is not set. Check Secrets Manager config.")
+    return _config
+
+
+_singletons = []
+
+
+def singleton(factory):
+    """
+    Decorator for process-wide objects built from the config: `factory()`
+    runs once, on first call, so importing the package builds nothing.
+    `reset()` drops them all (and the resolved config) for tests.
+    """
+    lock = threading.Lock()
+    box = []
+
+    @functools.wraps(factory)
+    def get():
+        if not box:
+            with lock:
+                if not box:
+                    box.append(factory())
+        return box[0]
+
+    _singletons.append(box)
+    return get
+
+
+@singleton
+def credentials():
+    """The AgentCore secret cache, configured from the environment alone (it feeds `get_config`)."""
+    cfg = Config.from_env()
+    return _CredentialProvider(
+        cfg.agentcore_secret_name,
+        refresh_seconds=cfg.credentials_refresh_seconds,
+        refresh_ahead_seconds=cfg.credentials_refresh_ahead_seconds,
+        retry_seconds=cfg.credentials_retry_seconds,
+        wait_seconds=cfg.credentials_wait_seconds,
+    )
+
+
+def reset():
+    """Forget the resolved config and every singleton, so the next use re-reads the environment."""
+    global _config, _config_version, _secrets_loaded
+    with _config_lock:
+        _config = _config_version = _secrets_loaded = None
+        for box in _singletons:
+            box.clear()
@@ -0,0 +1,1261 @@
+"""Snowflake REST client: Cortex Agent event streams, endpoint routing and the SQL API."""
+
+import json, socket, threading, time
+
+from .config import credentials, get_config, singleton
+from .scheduler import (
+    DeadlineExceeded,
+    SchedulerOverloaded,
+    check_cancel,
+    deadline_budget,
+    limits,
+    shared_executor,
+    stage_timeout,
+    time_left,
+)
+from .telemetry import span, submit_in_context, telemetry
+
+
+def _canon_ident(ident: str) -> str:
+    """
+    Normalise Snowflake identifiers for REST paths.
+    - If the identifier is unquoted and all-lowercase, Snowflake will have stored it uppercased,
+      so we upcase it for the REST API.
+    - If it contains quotes or any uppercase characters, leave it as-is.
+    """
+    if not isinstance(ident, str):
+        return ident
+    if '"' in ident:
+        return ident
+    if ident.islower():
+        return ident.upper()
+    return ident
+
+def iter_sse(lines):
+    """
+    Incrementally decode a text/event-stream from an iterable of lines and
+    yield `(event_type, data_str)` for each complete event block.
+
+    Only the current event's `data:` lines are held in memory, so the stream
+    is processed as it arrives and state stays bounded regardless of its
+    total size. Blank lines are event boundaries, as defined by SSE.
+    """
+    event_type = None
+    data_lines = []
+    for ln in lines:
+        if isinstance(ln, bytes):
+            ln = ln.decode("utf-8", errors="replace")
+        if ln.strip() == "":
+            # End of current event block
+            if data_lines:
+                yield event_type or "message", "\n".join(data_lines)
+            event_type = None
+            data_lines = []
+            continue
+        if ln.startswith("event:"):
+            event_type = ln.split(":", 1)[1].strip()
+        elif ln.startswith("data:"):
+            data_lines.append(ln.split(":", 1)[1].lstrip())
+    # Catch any trailing event without a final blank line
+    if data_lines:
+        yield event_type or "message", "\n".join(data_lines)
+
+
+# Cortex Agent SSE event names -> the typed event kinds yielded by
+# `iter_cortex_events`. Anything else is passed through as "other".
+_CORTEX_EVENT_TYPES = {
+    "response.text.delta": "text_delta",
+    "response.thinking.delta": "thinking_delta",
+    "response.text": "text",
+    "response.tool_use": "tool_use",
+    "response.tool_result": "tool_result",
+    "response.table": "table",
+    "response.chart": "chart",
+    "response.status": "status",
+    "response": "response",
+    "error": "error",
+}
+
+
+def iter_cortex_events(lines, stats=None):
+    """
+    Turn a Cortex Agent text/event-stream into typed events as chunks arrive:
+
+    - `{"type": "text_delta", "text": ...}` incremental answer text
+    - `{"type": "tool_use", "name": ..., "input": ...}` tool invocations
+    - `{"type": "table", "result_set": ...}` SQL result tables
+    - `{"type": "response", "data": {...}}` the final aggregated message
+    - `{"type": "error", "message": ...}` errors reported by the agent
+
+    plus `thinking_delta`, `text`, `tool_result`, `chart`, `status` and
+    `other`. Every event also carries the original SSE name as `event` and
+    the decoded payload as `data`. Blocks whose data is not valid JSON are
+    skipped, matching the previous whole-body parser.
+
+    If a `stats` dict is passed it is updated in place with `events`,
+    `data_bytes` and `parse_seconds` (time spent decoding event payloads).
+    """
+    for event_name, data_str in iter_sse(lines):
+        t0 = time.perf_counter()
+        try:
+            data = json.loads(data_str)
+        except Exception:
+            continue
+        finally:
+            if stats is not None:
+                stats["events"] = stats.get("events", 0) + 1
+                stats["data_bytes"] = stats.get("data_bytes", 0) + len(data_str)
+                stats["parse_seconds"] = stats.get("parse_seconds", 0.0) + time.perf_counter() - t0
+        kind = _CORTEX_EVENT_TYPES.get(event_name, "other")
+        ev = {"type": kind, "event": event_name, "data": data}
+        if isinstance(data, dict):
+            if kind in ("text_delta", "thinking_delta", "text"):
+                ev["text"] = data.get("text") or ""
+            elif kind == "tool_use":
+                ev["name"] = data.get("name")
+                ev["input"] = data.get("input")
+            elif kind == "table":
+                ev["result_set"] = data.get("result_set")
+                ev["title"] = data.get("title")
+            elif kind == "error":
+                ev["message"] = data.get("message") or data.get("code") or "unknown error"
+        yield ev
+
+
+class CortexStreamCollector:
+    """
+    Bounded accumulator over `iter_cortex_events`: keeps the last `response`
+    event plus the text deltas and tables seen so far, and builds the
+    `parse_cortex_sse`-compatible result once the stream ends.
+    """
+
+    def __init__(self):
+        self.final = None
+        self.error = None
+        self.text_parts = []
+        self.tables = []
+        self.event_count = 0
+
+    def add(self, ev):
+        self.event_count += 1
+        kind = ev["type"]
+        if kind == "response" and isinstance(ev["data"], dict):
+            self.final = ev["data"]
+            # The final message already aggregates deltas and tables.
+            self.text_parts, self.tables = [], []
+        elif kind == "text_delta" and self.final is None:
+            self.text_parts.append(ev.get("text") or "")
+        elif kind == "table" and self.final is None:
+            self.tables.append({"type": "table", "table": ev["data"]})
+        elif kind == "error":
+            self.error = ev.get("message")
+
+    def result(self):
+        if self.final is not None:
+            return self.final
+        if self.text_parts or self.tables:
+            # Stream ended without a `response` event; rebuild what we saw.
+            content = []
+            if self.text_parts:
+                content.append({"type": "text", "text": "".join(self.text_parts)})
+            return {"role": "assistant", "content": content + self.tables, "incomplete": True}
+        if self.error:
+            return {"error": f"Cortex Agent error: {self.error}"}
+        return None
+
+
+def parse_cortex_sse(raw: str):
+    """
+    Parse a Cortex Agent text/event-stream response and return the last
+    `response` event's data as a dict, if available.
+    """
+    last = None
+    for ev in iter_cortex_events(raw.splitlines()):
+        if ev["type"] == "response":
+            last = ev["data"]
+    return last if last is not None else {"raw": raw}
+
+
+class _HTTPXStreamResponse:
+    """Adapts a streamed `httpx.Response` to the subset of the requests API we use."""
+
+    def __init__(self, resp):
+        self._resp = resp
+        self.status_code = resp.status_code
+        self.headers = resp.headers
+        self.encoding = resp.encoding
+
+    @property
+    def text(self):
+        self._resp.read()
+        return self._resp.text
+
+    def json(self):
+        self._resp.read()
+        return self._resp.json()
+
+    def raise_for_status(self):
+        self._resp.raise_for_status()
+
+    def close(self):
+        self._resp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _iter_response_chunks(resp):
+    """
+    Body bytes of a streamed response, each piece as soon as it arrives.
+    `requests`' `iter_lines()` / `iter_content(n)` read through urllib3's
+    `read(n)`, which waits for n bytes or the end of the body, so SSE events
+    would be held back and then delivered all at once.
+    """
+    if isinstance(resp, _HTTPXStreamResponse):
+        yield from resp._resp.iter_bytes()
+        return
+    raw = resp.raw
+    if raw.chunked and raw.supports_chunked_reads():
+        # One HTTP chunk at a time (urllib3 1.26 and 2.x).
+        yield from raw.read_chunked(None, decode_content=True)
+        return
+    if hasattr(raw, "read1"):
+        # urllib3 2.x: whatever is available, up to 8 KB.
+        read = lambda: raw.read1(8192)
+    elif not resp.headers.get("Content-Encoding") and hasattr(getattr(raw, "_fp", None), "read1"):
+        # urllib3 1.26, identity body: read the http.client response directly.
+        read = lambda: raw._fp.read1(8192)
+    else:
+        yield from resp.iter_content(chunk_size=None)
+        return
+    while True:
+        chunk = read()
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_response_lines(resp):
+    """Lines of a streamed response (SSE is always UTF-8), each yielded as soon as its newline arrives."""
+    import codecs
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    for chunk in _iter_response_chunks(resp):
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for ln in lines:
+            yield ln.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+def _response_socket(resp):
+    """The socket a streamed HTTP/1.1 response is read from, when it can be found."""
+    if isinstance(resp, _HTTPXStreamResponse):
+        # An HTTP/2 connection is shared with other streams; leave it open.
+        if resp._resp.http_version != "HTTP/1.1":
+            return None
+        stream = resp._resp.extensions.get("network_stream")
+        return stream.get_extra_info("socket") if stream is not None else None
+    # requests: urllib3 response -> http.client response -> buffered socket file.
+    fp = getattr(getattr(resp, "raw", None), "_fp", None)
+    return getattr(getattr(getattr(fp, "fp", None), "raw", None), "_sock", None)
+
+
+def _abort_response(resp):
+    """
+    Close a streamed response from a thread other than the one reading it.
+    Closing its file objects alone would wait for the reader's blocked
+    receive, so the socket is shut down first, which ends that read at once.
+    """
+    sock = _response_socket(resp)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    try:
+        resp.close()
+    except Exception:
+        pass
+
+
+_STREAM_DEADLINE_ERROR = {"error": "Cortex Agent error: request deadline reached while streaming", "deadline_exceeded": True}
+
+
+class _DeadlineWatchdog:
+    """
+    Aborts a streamed response when the request deadline passes, so a read
+    that is stalled waiting for the next event ends on time instead of at
+    the read timeout. `fired` tells whether it went off.
+    """
+
+    def __init__(self, resp):
+        self.fired = False
+        self._timer = None
+        left = time_left()
+        if left is not None:
+            self._timer = threading.Timer(max(left, 0.0), self._fire, (resp,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _fire(self, resp):
+        self.fired = True
+        _abort_response(resp)
+
+    def cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+class CortexHTTPClient:
+    """
+    Shared HTTP client for Snowflake Cortex REST calls.
+
+    One keep-alive connection pool (`pool_size` connections per host) is
+    shared by every request in the process, so concurrent AgentCore sessions
+    reuse TLS connections instead of opening one per trip plan. HTTP/2 is
+    used through httpx when it is installed with h2 support; otherwise a
+    `requests.Session` is used. 429/5xx responses and connection errors are
+    retried with full-jitter exponential backoff, honouring `Retry-After`.
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, pool_size=32, http2="auto", max_retries=3, backoff=0.5, max_backoff=8.0,
+                 retry_after_max=30.0, connect_timeout=10.0):
+        self.pool_size = max(1, int(pool_size))
+        self.max_retries = max(0, int(max_retries))
+        self.backoff = float(backoff)
+        self.max_backoff = float(max_backoff)
+        self.retry_after_max = float(retry_after_max)
+        self.connect_timeout = float(connect_timeout)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "attempts": 0, "retries": 0, "failures": 0}
+        self._httpx = self._build_httpx() if http2 in ("auto", "1", "true", "yes") else None
+        self._session = None if self._httpx is not None else self._build_session()
+        self.transport = "httpx-h2" if self._httpx is not None else "requests"
+
+    def _build_httpx(self):
+        try:
+            import httpx
+            import h2  # noqa: F401  (httpx needs it for http2=True)
+        except ImportError:
+            return None
+        limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+        return httpx.Client(http2=True, limits=limits)
+
+    def _build_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        sess = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+        sess.mount("https://", adapter)
+        sess.mount("http://", adapter)
+        return sess
+
+    def _send(self, url, headers, body, timeout):
+        if self._httpx is not None:
+            import httpx
+
+            req = self._httpx.build_request(
+                "POST", url, headers=headers, json=body,
+                timeout=httpx.Timeout(timeout, connect=self.connect_timeout),
+            )
+            return _HTTPXStreamResponse(self._httpx.send(req, stream=True))
+        return self._session.post(
+            url, headers=headers, json=body, timeout=(self.connect_timeout, timeout), stream=True
+        )
+
+    def get(self, url, headers, timeout):
+        """Single GET over the shared pool (no retries). The caller closes the response."""
+        if self._httpx is not None:
+            import httpx
+
+            req = self._httpx.build_request(
+                "GET", url, headers=headers, timeout=httpx.Timeout(timeout, connect=self.connect_timeout)
+            )
+            return _HTTPXStreamResponse(self._httpx.send(req, stream=True))
+        return self._session.get(url, headers=headers, timeout=(self.connect_timeout, timeout))
+
+    def _retry_after(self, resp):
+        value = (resp.headers.get("Retry-After") or "").strip()
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            import email.utils
+
+            when = email.utils.parsedate_to_datetime(value)
+            return max(0.0, when.timestamp() - time.time())
+        except Exception:
+            return None
+
+    def _backoff(self, attempt):
+        import random
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def post_stream(self, url, headers, body, timeout, attempts=None, max_retries=None):
+        """
+        POST `body` as JSON and return the streamed response once headers
+        arrive with a non-retryable status. `attempts` (a list) receives one
+        `{"attempt", "status_code"|"error", "seconds", "sleep"}` dict per try.
+        `max_retries` overrides the client's retry count for this call. The
+        caller must close the returned response.
+        """
+        attempts = attempts if attempts is not None else []
+        max_retries = self.max_retries if max_retries is None else max(0, int(max_retries))
+        with self._lock:
+            self._stats["requests"] += 1
+        for attempt in range(max_retries + 1):
+            t0 = time.perf_counter()
+            record = {"attempt": attempt + 1}
+            attempts.append(record)
+            with self._lock:
+                self._stats["attempts"] += 1
+                if attempt:
+                    self._stats["retries"] += 1
+            try:
+                resp = self._send(url, headers, body, deadline_budget(timeout))
+            except Exception as e:
+                record.update(error=str(e), seconds=round(time.perf_counter() - t0, 3))
+                delay = self._backoff(attempt)
+                if attempt >= max_retries or not self._is_retryable_error(e) or not self._may_wait(delay):
+                    with self._lock:
+                        self._stats["failures"] += 1
+                    raise
+                record["sleep"] = round(delay, 3)
+                time.sleep(delay)
+                continue
+
+            record.update(status_code=resp.status_code, seconds=round(time.perf_counter() - t0, 3))
+            if resp.status_code not in self.RETRY_STATUSES or attempt >= max_retries:
+                if resp.status_code >= 400:
+                    with self._lock:
+                        self._stats["failures"] += 1
+                return resp
+            retry_after = self._retry_after(resp)
+            if retry_after is not None and retry_after > self.retry_after_max:
+                with self._lock:
+                    self._stats["failures"] += 1
+                return resp
+            delay = self._backoff(attempt)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            if not self._may_wait(delay):
+                # Another attempt would land past the request deadline.
+                with self._lock:
+                    self._stats["failures"] += 1
+                return resp
+            resp.close()
+            record["sleep"] = round(delay, 3)
+            time.sleep(delay)
+
+    @staticmethod
+    def _may_wait(delay):
+        left = time_left()
+        return left is None or delay < left
+
+    @staticmethod
+    def _is_retryable_error(exc):
+        # Connection-level failures are safe to retry; a read timeout after the
+        # request was accepted is not, since the agent may already be running.
+        name = type(exc).__name__
+        return name in ("ConnectionError", "ConnectTimeout", "ConnectError", "RemoteProtocolError")
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+        out.update(transport=self.transport, pool_size=self.pool_size)
+        return out
+
+
+@singleton
+def _cortex_http():
+    """Process-wide Cortex HTTP client, built on first use."""
+    cfg = get_config()
+    return CortexHTTPClient(
+        pool_size=cfg.cortex_http_pool_size,
+        http2=cfg.cortex_http2,
+        max_retries=cfg.cortex_max_retries,
+        backoff=cfg.cortex_retry_backoff_seconds,
+        max_backoff=cfg.cortex_retry_max_backoff_seconds,
+        retry_after_max=cfg.cortex_retry_after_max_seconds,
+        connect_timeout=cfg.cortex_connect_timeout_seconds,
+    )
+
+
+def cortex_http_stats():
+    """Request/attempt/retry counters for the shared Cortex HTTP client."""
+    return _cortex_http().stats()
+
+
+# Cortex event kinds that show an endpoint has started answering; status
+# events and the transport record arrive before any work has been done.
+_CORTEX_CONTENT_EVENTS = frozenset(
+    {"text_delta", "thinking_delta", "text", "tool_use", "tool_result", "table", "chart", "response"}
+)
+
+
+def _cortex_event_outcome(ev):
+    """
+    Classify an event seen before an endpoint has answered: "ok" once content
+    (or a successful non-streaming body) arrives, "error" for failures that
+    another endpoint might not have, "local" for failures raised by this
+    process (deadline, scheduler), and None while it is still undecided.
+    """
+    if ev is None:
+        return "error"
+    kind = ev["type"]
+    if kind == "result":
+        data = ev.get("data")
+        if isinstance(data, dict) and data.get("error"):
+            if data.get("deadline_exceeded") or data.get("overloaded"):
+                return "local"
+            return "error"
+        return "ok"
+    if kind == "error":
+        return "error"
+    return "ok" if kind in _CORTEX_CONTENT_EVENTS else None
+
+
+class CortexEndpoint:
+    """
+    One Cortex Agent deployment the router can send calls to, with its health:
+    EWMAs of time to first content and of the error rate, a window of recent
+    latencies for the hedge delay, and a consecutive-failure circuit breaker.
+    All mutable state is guarded by the owning `CortexRouter`'s lock.
+    """
+
+    def __init__(self, name, base_url, database, schema, agent, weight=1.0,
+                 token_key="SNOWFLAKE_AUTH_TOKEN", window=128):
+        import collections
+
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.database = database
+        self.schema = schema
+        self.agent = agent
+        self.weight = max(0.0, float(weight))
+        self.token_key = token_key
+        self.latency_ewma = None
+        self.error_ewma = 0.0
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._latencies = collections.deque(maxlen=window)
+        self._counts = {"calls": 0, "ok": 0, "errors": 0, "cancelled": 0, "hedges": 0, "wins": 0, "breaker_opens": 0}
+
+    @property
+    def url(self):
+        # Official Cortex Agents endpoint:
+        # /api/v2/databases/{DATABASE}/schemas/{SCHEMA}/agents/{AGENT}:run
+        db, sch, name = (_canon_ident(v) for v in (self.database, self.schema, self.agent))
+        return f"{self.base_url}/api/v2/databases/{db}/schemas/{sch}/agents/{name}:run"
+
+    def spec(self):
+        return (self.name, self.base_url, self.database, self.schema, self.agent, self.weight, self.token_key)
+
+    def state(self, now, cooldown):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if now - self.opened_at >= cooldown else "open"
+
+    def quantile(self, q):
+        """Latency at quantile `q` of the recent window, or None with too few samples."""
+        if len(self._latencies) < 5:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CortexRouter:
+    """
+    Routes Cortex Agent calls across weighted endpoints.
+
+    `plan()` orders the endpoints for one call: a weighted random pick among
+    the ones whose breaker admits traffic (weights are scaled down by the
+    error EWMA and by latency EWMA relative to the fastest endpoint), then
+    the rest by latency EWMA. `admit()` claims an endpoint
+    right before a request goes out, letting a single probe through a
+    half-open breaker, and `record()` feeds the outcome back. `stats()`
+    reports per-endpoint health and counters.
+    """
+
+    def __init__(self, endpoints, hedge=True, hedge_quantile=0.95, hedge_min_delay=2.0, alpha=0.2,
+                 breaker_failures=5, breaker_cooldown=30.0, failover_retries=0):
+        self.endpoints = list(endpoints)
+        self.hedge = bool(hedge) and len(self.endpoints) > 1
+        self.hedge_quantile = min(1.0, max(0.0, float(hedge_quantile)))
+        self.hedge_min_delay = max(0.0, float(hedge_min_delay))
+        self.alpha = min(1.0, max(0.01, float(alpha)))
+        self.breaker_failures = max(1, int(breaker_failures))
+        self.breaker_cooldown = max(0.0, float(breaker_cooldown))
+        self.failover_retries = failover_retries
+        self._lock = threading.Lock()
+
+    def plan(self):
+        import random
+
+        now = time.monotonic()
+        with self._lock:
+            ready = [ep for ep in self.endpoints if ep.state(now, self.breaker_cooldown) != "open"]
+            if not ready:
+                # Every breaker is open: try the one that has been resting longest.
+                return [min(self.endpoints, key=lambda ep: ep.opened_at)]
+            known = [ep.latency_ewma for ep in ready if ep.latency_ewma]
+            fastest = min(known) if known else None
+            weights = [
+                ep.weight * max(0.05, 1.0 - ep.error_ewma) * (fastest / ep.latency_ewma if ep.latency_ewma else 1.0)
+                for ep in ready
+            ]
+            if sum(weights) > 0:
+                primary = random.choices(ready, weights=weights)[0]
+            else:
+                primary = ready[0]
+            rest = sorted(
+                (ep for ep in ready if ep is not primary),
+                key=lambda ep: (ep.latency_ewma is None, ep.latency_ewma or 0.0, -ep.weight),
+            )
+            return [primary] + rest
+
+    def admit(self, ep):
+        """Claim `ep` for one request; False while its breaker is open or already probing."""
+        with self._lock:
+            if len(self.endpoints) > 1:
+                state = ep.state(time.monotonic(), self.breaker_cooldown)
+                if state == "open" and any(e.opened_at is None for e in self.endpoints):
+                    return False
+                if state != "closed":
+                    if ep.probing:
+                        return False
+                    ep.probing = True
+            ep._counts["calls"] += 1
+            return True
+
+    def record(self, ep, outcome, latency=None, hedge=False):
+        """Feed back how a claimed request went: "ok", "error", "local" or "cancelled"."""
+        with self._lock:
+            ep.probing = False
+            if hedge:
+                ep._counts["hedges"] += 1
+            if outcome == "ok":
+                ep._counts["ok"] += 1
+                if latency is not None:
+                    ep._latencies.append(latency)
+                    ep.latency_ewma = latency if ep.latency_ewma is None else (
+                        self.alpha * latency + (1 - self.alpha) * ep.latency_ewma
+                    )
+                ep.error_ewma *= 1 - self.alpha
+                ep.failures = 0
+                ep.opened_at = None
+            elif outcome == "error":
+                ep._counts["errors"] += 1
+                ep.error_ewma = self.alpha + (1 - self.alpha) * ep.error_ewma
+                ep.failures += 1
+                if len(self.endpoints) > 1 and (ep.opened_at is not None or ep.failures >= self.breaker_failures):
+                    if ep.opened_at is None:
+                        ep._counts["breaker_opens"] += 1
+                    ep.opened_at = time.monotonic()
+            else:
+                ep._counts["cancelled"] += 1
+                if latency is not None:
+                    # An attempt that lost a race took at least this long.
+                    ep.latency_ewma = latency if ep.latency_ewma is None else max(
+                        ep.latency_ewma, self.alpha * latency + (1 - self.alpha) * ep.latency_ewma
+                    )
+
+    def won(self, ep):
+        with self._lock:
+            ep._counts["wins"] += 1
+
+    def hedge_delay(self, ep):
+        """Seconds to wait on `ep` before hedging: its recent latency quantile, at least the minimum."""
+        with self._lock:
+            q = ep.quantile(self.hedge_quantile)
+        return max(self.hedge_min_delay, q or 0.0)
+
+    def stats(self):
+        now = time.monotonic()
+        out = {}
+        with self._lock:
+            for ep in self.endpoints:
+                p95 = ep.quantile(0.95)
+                out[ep.name] = dict(
+                    ep._counts,
+                    url=ep.url,
+                    weight=ep.weight,
+                    state=ep.state(now, self.breaker_cooldown),
+                    latency_ewma_ms=None if ep.latency_ewma is None else round(ep.latency_ewma * 1000, 3),
+                    latency_p95_ms=None if p95 is None else round(p95 * 1000, 3),
+                    error_ewma=round(ep.error_ewma, 4),
+                    consecutive_failures=ep.failures,
+                )
+        return {"hedge": self.hedge, "endpoints": out}
+
+
+def _cortex_endpoints_from_config(cfg):
+    """Endpoints listed in `cfg.cortex_endpoints`, or the single configured agent."""
+    default = {
+        "name": "default",
+        "base_url": cfg.cortex_base_url,
+        "database": cfg.cortex_agent_database,
+        "schema": cfg.cortex_agent_schema,
+        "agent": cfg.cortex_agent_name,
+        "weight": 1.0,
+        "token_key": "SNOWFLAKE_AUTH_TOKEN",
+    }
+    specs = []
+    if cfg.cortex_endpoints.strip():
+        try:
+            specs = json.loads(cfg.cortex_endpoints)
+            if not isinstance(specs, list) or not all(isinstance(s, dict) for s in specs):
+                raise ValueError("expected a JSON list of objects")
+        except ValueError as e:
+            print(f"Warning: ignoring CORTEX_ENDPOINTS ({e}); using the single configured Cortex Agent")
+            specs = []
+    endpoints = []
+    for i, spec in enumerate(specs or [{}]):
+        merged = dict(default, **{k: v for k, v in spec.items() if v not in (None, "")})
+        if spec and "name" not in spec:
+            merged["name"] = f"endpoint-{i + 1}"
+        if not merged["base_url"]:
+            continue
+        endpoints.append(CortexEndpoint(
+            merged["name"], merged["base_url"], merged["database"], merged["schema"], merged["agent"],
+            weight=merged["weight"], token_key=merged["token_key"],
+        ))
+    return endpoints
+
+
+_cortex_router_obj = None
+_cortex_router_lock = threading.Lock()
+
+
+def _cortex_router():
+    """
+    Process-wide Cortex router for the current config. Rebuilt only when the
+    endpoint list changes (e.g. once secrets arrive), so health survives.
+    """
+    global _cortex_router_obj
+    cfg = get_config()
+    endpoints = _cortex_endpoints_from_config(cfg)
+    specs = [ep.spec() for ep in endpoints]
+    router = _cortex_router_obj
+    if router is None or [ep.spec() for ep in router.endpoints] != specs:
+        with _cortex_router_lock:
+            router = _cortex_router_obj
+            if router is None or [ep.spec() for ep in router.endpoints] != specs:
+                router = _cortex_router_obj = CortexRouter(
+                    endpoints,
+                    hedge=cfg.cortex_hedge,
+                    hedge_quantile=cfg.cortex_hedge_quantile,
+                    hedge_min_delay=cfg.cortex_hedge_min_delay_seconds,
+                    alpha=cfg.cortex_ewma_alpha,
+                    breaker_failures=cfg.cortex_breaker_failures,
+                    breaker_cooldown=cfg.cortex_breaker_cooldown_seconds,
+                    failover_retries=cfg.cortex_failover_max_retries if len(endpoints) > 1 else None,
+                )
+    return router
+
+
+def cortex_router_stats():
+    """Per-endpoint latency/error EWMAs, breaker state and call counters for Cortex Agent routing."""
+    return _cortex_router().stats()
+
+
+def call_cortex_agent(user_input, on_event=None, cancel_event=None):
+    """
+    Call your Snowflake Cortex Agent (travel_db.public.TRAVEL_AGENT by default)
+    directly with the user's question, instead of invoking Cortex Analyst and
+    Cortex Search separately.
+
+    The event stream is consumed incrementally; pass `on_event` to observe each
+    typed event (see `iter_cortex_events`) as it arrives. The return value is
+    the final `response` message, as before. Once `cancel_event` is set the
+    call closes the response and raises `BranchCancelled` at the next event.
+    """
+    with span("cortex_agent.call", prompt_chars=len(str(user_input or ""))) as sp:
+        stats = {}
+        collector = CortexStreamCollector()
+        t0 = time.perf_counter()
+        res = None
+        events = iter_cortex_agent_events(user_input, stats=stats)
+        try:
+            for ev in events:
+                check_cancel(cancel_event)
+                if ev["type"] == "result":
+                    res = ev["data"]
+                    break
+                if ev["type"] == "transport":
+                    sp.set("http_attempts", len(ev["attempts"]))
+                elif "first_event_ms" not in stats:
+                    stats["first_event_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+                collector.add(ev)
+                if on_event is not None:
+                    on_event(ev)
+        finally:
+            # Closing the generator closes the HTTP response (and releases
+            # the Snowflake slot) without reading the rest of the stream.
+            events.close()
+        if res is None:
+            res = collector.result()
+            if res is None:
+                res = {"raw": "", "error": "Cortex Agent returned an empty event stream"}
+        _annotate_cortex_span(sp, stats, collector, res)
+        return res
+
+
+def _annotate_cortex_span(sp, stats, collector, res):
+    """Attach SSE sizes/counts and parse time to a Cortex span and histograms."""
+    sp.set("sse_events", stats.get("events", 0))
+    sp.set("sse_data_bytes", stats.get("data_bytes", 0))
+    sp.set("sse_parse_ms", round(stats.get("parse_seconds", 0.0) * 1000, 3))
+    sp.set("first_event_ms", stats.get("first_event_ms"))
+    sp.set("queue_wait_ms", stats.get("queue_wait_ms"))
+    sp.set("endpoint", stats.get("endpoint"))
+    content = res.get("content") if isinstance(res, dict) else None
+    if isinstance(content, list):
+        sp.set("tables", sum(1 for c in content if isinstance(c, dict) and c.get("type") == "table"))
+    else:
+        sp.set("tables", len(collector.tables))
+    sp.set("error", res.get("error") if isinstance(res, dict) else None)
+    if stats.get("events"):
+        telemetry.observe("cortex_agent.sse_parse", stats.get("parse_seconds", 0.0))
+        telemetry.observe_size("cortex_sse", stats.get("data_bytes", 0))
+
+
+def iter_cortex_agent_events(user_input, stats=None):
+    """
+    Generator form of `call_cortex_agent`: yields typed Cortex events while
+    the response streams in. Non-streaming outcomes (HTTP errors, JSON or
+    unexpected bodies) are yielded as a single `{"type": "result", "data": ...}`
+    event carrying the dict `call_cortex_agent` would return.
+
+    With more than one endpoint configured the call is routed, hedged and
+    failed over by `_iter_routed_cortex_events`; the transport event then also
+    names the `endpoint` that answered and the `route` taken.
+    """
+    router = _cortex_router()
+    if not router.endpoints:
+        yield {"type": "result", "data": {"error": "SNOWFLAKE_ACCOUNT is not set. Check Secrets Manager config."}}
+        return
+    body = {
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": str(user_input),
+                    }
+                ],
+            }
+        ]
+    }
+    if len(router.endpoints) > 1:
+        yield from _iter_routed_cortex_events(router, body, stats)
+        return
+    ep = router.endpoints[0]
+    stats = stats if stats is not None else {}
+    stats["endpoint"] = ep.name
+    router.admit(ep)
+    t0 = time.perf_counter()
+    outcome = None
+    try:
+        for ev in _cortex_endpoint_events(ep, body, stats):
+            if outcome is None:
+                outcome = _cortex_event_outcome(ev)
+                if outcome is not None:
+                    latency = time.perf_counter() - t0 - stats.get("queue_wait_ms", 0) / 1000
+                    router.record(ep, outcome, latency)
+            yield ev
+        if outcome is None:
+            outcome = "error"
+            router.record(ep, outcome)
+    finally:
+        if outcome is None:
+            router.record(ep, "cancelled")
+
+
+def _cortex_endpoint_events(ep, body, stats, max_retries=None, on_sent=None, on_response=None):
+    """
+    Events of one Cortex Agent call to endpoint `ep`, under a Snowflake
+    scheduler slot. `on_sent` is called once the slot is held and the
+    request is about to go out, and `on_response` with the streamed HTTP
+    response before it is read, so another thread can close it.
+    """
+    token = credentials().get(ep.token_key)
+    if not token:
+        yield {"type": "result", "data": {"error": f"{ep.token_key} is not set. Check Secrets Manager."}}
+        return
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream",
+        "X-Snowflake-Authorization-Token-Type": "PROGRAMMATIC_ACCESS_TOKEN",
+    }
+    try:
+        slot = limits()["snowflake"].acquire()
+    except DeadlineExceeded as e:
+        yield {"type": "result", "data": {"error": f"Cortex Agent error: {e}", "deadline_exceeded": True}}
+        return
+    except SchedulerOverloaded as e:
+        yield {"type": "result", "data": {"error": f"Cortex Agent error: {e}", "overloaded": True}}
+        return
+    if stats is not None:
+        stats["queue_wait_ms"] = round(slot.wait_seconds * 1000, 3)
+    # The pool slot is held until the event stream has been read to the end.
+    with slot:
+        try:
+            timeout_s = stage_timeout(get_config().cortex_agent_timeout_seconds, "the Cortex Agent call")
+        except DeadlineExceeded as e:
+            yield {"type": "result", "data": {"error": f"Cortex Agent error: {e}", "deadline_exceeded": True}}
+            return
+        if on_sent is not None:
+            on_sent()
+        yield from _cortex_agent_request_events(
+            ep.url, headers, body, token, stats, timeout_s, token_key=ep.token_key, max_retries=max_retries,
+            on_response=on_response,
+        )
+
+
+def _cortex_route_executor():
+    """Worker threads reading routed Cortex Agent attempts (a hedged call reads two)."""
+    return shared_executor("cortex-route", max(8, 4 * get_config().snowflake_max_concurrency))
+
+
+class _CortexAttempt:
+    """One routed request to one endpoint, read on a worker thread into a shared queue."""
+
+    def __init__(self, endpoint, role, out):
+        self.endpoint = endpoint
+        self.role = role
+        self.stats = {"endpoint": endpoint.name}
+        self.buffer = []
+        self.outcome = None
+        self._out = out
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._resp = None
+        self._started = time.perf_counter()
+
+    def start(self, body, max_retries):
+        submit_in_context(_cortex_route_executor(), self._pump, body, max_retries)
+
+    def _sent(self):
+        # Not a Cortex event: tells the router the request left the scheduler queue.
+        self._out.put((self, {"type": "sent"}))
+
+    def _opened(self, resp):
+        with self._lock:
+            if not self._stop.is_set():
+                self._resp = resp
+                return
+        resp.close()
+
+    def _pump(self, body, max_retries):
+        events = _cortex_endpoint_events(
+            self.endpoint, body, self.stats, max_retries, on_sent=self._sent, on_response=self._opened
+        )
+        try:
+            for ev in events:
+                if self._stop.is_set():
+                    break
+                self._out.put((self, ev))
+        except Exception as e:
+            if not self._stop.is_set():
+                self._out.put((self, {"type": "result", "data": {"error": f"Cortex Agent error: {e}"}}))
+        finally:
+            events.close()
+            self._out.put((self, None))
+
+    def cancel(self):
+        """Stop forwarding events and close the response, so a stalled read ends now."""
+        with self._lock:
+            self._stop.set()
+            resp, self._resp = self._resp, None
+        if resp is not None:
+            _abort_response(resp)
+
+    def latency(self):
+        """Seconds from sending the request to its first content, excluding scheduler queueing."""
+        return time.perf_counter() - self._started - self.stats.get("queue_wait_ms", 0) / 1000
+
+    def started_before(self, other):
+        return self._started < other._started
+
+    def describe(self):
+        return {"endpoint": self.endpoint.name, "role": self.role, "outcome": self.outcome}
+
+
+def _iter_routed_cortex_events(router, body, stats):
+    """
+    Run one Cortex Agent call across `router`'s endpoints. Each attempt is
+    read on a worker thread and its events are held back until it produces
+    content; the first attempt to do so is streamed and the others are
+    cancelled. An attempt that fails before that fails over to the next
+    endpoint in the plan. If one is still silent `router.hedge_delay()`
+    after it was sent (time queued for a Snowflake slot doesn't count), a
+    single hedge goes to the next endpoint, unless the Snowflake pool is
+    already saturated. When every endpoint fails, the last failure is
+    yielded with the route taken.
+    """
+    import queue
+
+    out = queue.Queue()
+    pending = router.plan()
+    attempts = []
+    winner = failed = None
+    hedge_at = None
+
+    def launch(role):
+        while pending:
+            ep = pending.pop(0)
+            if router.admit(ep):
+                att = _CortexAttempt(ep, role, out)
+                attempts.append(att)
+                att.start(body, router.failover_retries)
+                return att
+        return None
+
+    def hedge_deadline(att):
+        if att.role != "hedge" and router.hedge and pending and not any(a.role == "hedge" for a in attempts):
+            return time.monotonic() + router.hedge_delay(att.endpoint)
+        return None
+
+    def flush(att, failed=False):
+        route = [a.describe() for a in attempts]
+        for ev in att.buffer:
+            if ev["type"] == "transport":
+                ev = dict(ev, endpoint=att.endpoint.name, route=route)
+            elif failed and ev["type"] == "result" and isinstance(ev["data"], dict):
+                ev = dict(ev, data=dict(ev["data"], route=route))
+            yield ev
+
+    first = launch("primary")
+    if first is None:
+        yield {"type": "result", "data": {"error": "Cortex Agent error: every endpoint's circuit breaker is open"}}
+        return
+    try:
+        while True:
+            timeout = None if hedge_at is None else max(0.0, hedge_at - time.monotonic())
+            try:
+                att, ev = out.get(timeout=timeout)
+            except queue.Empty:
+                hedge_at = None
+                if not limits()["snowflake"].saturated():
+                    launch("hedge")
+                continue
+            if att is winner:
+                if ev is None:
+                    break
+                yield ev
+                continue
+            if winner is not None or att.outcome is not None:
+                continue
+            if ev is not None and ev["type"] == "sent":
+                hedge_at = hedge_at or hedge_deadline(att)
+                continue
+            if ev is not None:
+                att.buffer.append(ev)
+            outcome = _cortex_event_outcome(ev)
+            if outcome is None:
+                continue
+            att.outcome = outcome
+            if outcome == "error":
+                att.cancel()
+                router.record(att.endpoint, outcome, hedge=att.role == "hedge")
+                failed = att
+                if any(a.outcome is None for a in attempts):
+                    continue
+                if launch("failover") is None:
+                    break
+                continue
+            winner, hedge_at = att, None
+            router.record(att.endpoint, outcome, att.latency(), hedge=att.role == "hedge")
+            router.won(att.endpoint)
+            for other in attempts:
+                if other.outcome is None:
+                    other.outcome = "cancelled"
+                    other.cancel()
+                    slower = other.latency() if other.started_before(att) else None
+                    router.record(other.endpoint, "cancelled", slower, hedge=other.role == "hedge")
+            yield from flush(att)
+        if winner is None and failed is not None:
+            yield from flush(failed, failed=True)
+    finally:
+        for att in attempts:
+            if att.outcome is None:
+                att.outcome = "cancelled"
+                att.cancel()
+                router.record(att.endpoint, "cancelled", hedge=att.role == "hedge")
+        source = winner or failed
+        if stats is not None and source is not None:
+            stats.update(source.stats)
+
+
+def _cortex_agent_request_events(url, headers, body, token, stats, timeout_s, token_key="SNOWFLAKE_AUTH_TOKEN",
+                                 max_retries=None, on_response=None):
+    attempts = []
+    try:
+        resp = _cortex_http().post_stream(url, headers, body, timeout_s, attempts=attempts, max_retries=max_retries)
+        if resp.status_code == 401:
+            # The PAT may have been rotated since it was cached: refresh once
+            # (shared with any other request that hit the same 401) and retry.
+            fresh = credentials().refresh_rejected(token_key, token)
+            if fresh:
+                resp.close()
+                headers["Authorization"] = f"Bearer {fresh}"
+                resp = _cortex_http().post_stream(
+                    url, headers, body, timeout_s, attempts=attempts, max_retries=max_retries
+                )
+    except Exception as e:
+        yield {"type": "transport", "attempts": attempts}
+        yield {"type": "result", "data": {"error": f"Cortex Agent error: {e}"}}
+        return
+    if on_response is not None:
+        on_response(resp)
+    yield {"type": "transport", "attempts": attempts}
+    watchdog = _DeadlineWatchdog(resp)
+    try:
+        # Decode the event stream line by line as it arrives, so memory stays
+        # bounded and events are available before the last byte. `resp.text`
+        # is never read on this path, which is what previously conflicted
+        # with `iter_lines()`.
+        with resp:
+            resp.raise_for_status()
+            ctype = resp.headers.get("Content-Type", "")
+            if "text/event-stream" in ctype:
+                yield from iter_cortex_events(_iter_response_lines(resp), stats=stats)
+                # An aborted read may just look like the end of the stream.
+                if watchdog.fired:
+                    yield {"type": "result", "data": dict(_STREAM_DEADLINE_ERROR)}
+                return
+            # If it's already JSON, just return it as-is.
+            if "application/json" in ctype:
+                try:
+                    yield {"type": "result", "data": resp.json()}
+                    return
+                except Exception:
+                    pass
+            # Fallback: return whatever raw text we received for debugging.
+            yield {
+                "type": "result",
+                "data": {
+                    "raw": resp.text or "",
+                    "status_code": resp.status_code,
+                    "content_type": ctype,
+                },
+            }
+    except Exception as e:
+        if watchdog.fired:
+            yield {"type": "result", "data": dict(_STREAM_DEADLINE_ERROR)}
+            return
+        yield {"type": "result", "data": {"error": f"Cortex Agent error: {e}"}}
+    finally:
+        watchdog.cancel()
+
+def extract_agent_text(agent_resp):
+    """
+    Best-effort extraction of the main text answer from a Cortex Agent response.
+    Falls back to JSON if we can't find a clean text field.
+    """
+    if isinstance(agent_resp, str):
+        return agent_resp
+    if not isinstance(agent_resp, dict):
+        return str(agent_resp)
+
+    for key in ("output", "answer", "text"):
+        val = agent_resp.get(key)
+        if isinstance(val, str):
+            return val
+
+    # Shape used by Cortex Agents: a top-level message with content items.
+    content = agent_resp.get("content")
+    if isinstance(content, list):
+        texts = []
+        for item in content:
+            if not isinstance(item, dict):
+                continue
+            # Prefer content items explicitly marked as text
+            if item.get("type") == "text" and isinstance(item.get("text"), str):
+                texts.append(item["text"])
+            # Fallback: any direct text field
+            elif isinstance(item.get("text"), str):
+                texts.append(item["text"])
+        if texts:
+            return "\n\n".join(texts)
+
+    msg = agent_resp.get("message") or agent_resp.get("final_message")
+    if isinstance(msg, dict):
+        contents = msg.get("content") or []
+        if isinstance(contents, list):
+            for c in contents:
+                if isinstance(c, dict) and c.get("type") == "text" and isinstance(c.get("text"), str):
+                    return c["text"]
+
+    return json.dumps(agent_resp)
+
+
+def snowflake_query(statement, timeout_s=60):
+    """
+    Run `statement` through the Snowflake SQL API (`/api/v2/statements`) with
+    the cached PAT and return the complete `result_set`, following async
+    execution and fetching every result partition.
+    """
+    cfg = get_config()
+    token = credentials().get("SNOWFLAKE_AUTH_TOKEN")
+    if not cfg.cortex_base_url or not token:
+        raise RuntimeError("SNOWFLAKE_ACCOUNT / SNOWFLAKE_AUTH_TOKEN are not set")
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "X-Snowflake-Authorization-Token-Type": "PROGRAMMATIC_ACCESS_TOKEN",
+    }
+    body = {
+        "statement": statement,
+        "timeout": int(timeout_s),
+        "database": _canon_ident(cfg.snowflake_database),
+        "schema": _canon_ident(cfg.snowflake_schema),
+    }
+    if cfg.snowflake_warehouse:
+        body["warehouse"] = cfg.snowflake_warehouse
+    with limits()["snowflake"].acquire():
+        return _snowflake_statement(cfg, headers, body, timeout_s)
+
+
+def _snowflake_statement(cfg, headers, body, timeout_s):
+    http = _cortex_http()
+    base = f"{cfg.cortex_base_url}/api/v2/statements"
+
+    def _read(resp):
+        with resp:
+            resp.raise_for_status()
+            return resp.status_code, resp.json()
+
+    status, out = _read(http.post_stream(base, headers, body, timeout_s))
+    deadline = time.monotonic() + timeout_s
+    while status == 202:
+        # Still running: poll the statement handle until the result is ready.
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"statement did not finish within {timeout_s}s")
+        time.sleep(0.5)
+        status, out = _read(http.get(f"{base}/{out['statementHandle']}", headers, timeout_s))
+    meta = out.get("resultSetMetaData") or {}
+    data = list(out.get("data") or [])
+    for part in range(1, len(meta.get("partitionInfo") or [])):
+        _, chunk = _read(http.get(f"{base}/{out['statementHandle']}?partition={part}", headers, timeout_s))
+        data.extend(chunk.get("data") or [])
+    return {"resultSetMetaData": meta, "data": data}
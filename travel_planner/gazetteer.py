@@ -0,0 +1,166 @@
+"""Network-free destination extraction over the bundled place names."""
+
+import json, os
+
+from .config import get_config, singleton
+
+
+# Alias -> Wikipedia title. Extends the place names found in the CSV data with
+# common alternative spellings and a few destinations the data doesn't cover.
+_GAZETTEER_ALIASES = {
+    "bangalore": "Bengaluru",
+    "new delhi": "Delhi",
+    "bombay": "Mumbai",
+    "madras": "Chennai",
+    "pune": "Pune",
+    "poona": "Pune",
+    "goa": "Goa",
+    "jaipur": "Jaipur",
+    "kolkata": "Kolkata",
+    "calcutta": "Kolkata",
+    "saigon": "Ho Chi Minh City",
+    "hcmc": "Ho Chi Minh City",
+    "denpasar": "Bali",
+    "denpasar (bali)": "Bali",
+    "kl": "Kuala Lumpur",
+    "cebu": "Cebu City",
+    "nadi": "Nadi, Fiji",
+    "peking": "Beijing",
+    "japan": "Japan",
+    "singapura": "Singapore",
+}
+
+_GAZETTEER_TOKEN_RE = None
+# Tokens that mark the place right after them as the origin, and the ones that
+# mark the place right before them as the origin ("Delhi to Pune").
+_GAZETTEER_ORIGIN_BEFORE = {"from", "leaving", "departing", "ex"}
+_GAZETTEER_ORIGIN_AFTER = {"to", "->", "→"}
+
+
+def _gazetteer_tokens(text: str):
+    global _GAZETTEER_TOKEN_RE
+    if _GAZETTEER_TOKEN_RE is None:
+        import re
+
+        _GAZETTEER_TOKEN_RE = re.compile(r"->|→|[^\W_]+(?:['’][^\W_]+)*")
+    return _GAZETTEER_TOKEN_RE.findall(text or "")
+
+
+class Gazetteer:
+    """
+    Word-level trie over known place names for network-free destination
+    extraction. Matching is longest-match-first, case-insensitive for names
+    and case-sensitive (upper-case only) for IATA codes such as "SIN".
+    """
+
+    def __init__(self):
+        self._root = {}
+        self._iata = {}
+        self.size = 0
+
+    def add(self, name: str, title: str):
+        tokens = [t.casefold() for t in _gazetteer_tokens(name)]
+        if not tokens:
+            return
+        node = self._root
+        for tok in tokens:
+            node = node.setdefault(tok, {})
+        if "$" not in node:
+            self.size += 1
+        node["$"] = title
+
+    def add_iata(self, code: str, title: str):
+        code = (code or "").strip()
+        if len(code) == 3 and code.isalpha():
+            self._iata.setdefault(code.upper(), title)
+
+    @classmethod
+    def from_data(cls, data_dir: str, aliases: dict):
+        import csv
+
+        gaz = cls()
+        places = {}
+        sources = (
+            ("HOTEL_DATA.csv", (("CITY", None),)),
+            ("FLIGHT_DATA.csv", (("SOURCE", "IATA_SOURCE"), ("DESTINATION", "IATA_DESTINATION"))),
+        )
+        for fname, cols in sources:
+            path = os.path.join(data_dir, fname)
+            try:
+                with open(path, newline="", encoding="utf-8") as fh:
+                    for row in csv.DictReader(fh):
+                        for name_col, iata_col in cols:
+                            name = (row.get(name_col) or "").strip()
+                            if not name:
+                                continue
+                            places.setdefault(name, name)
+                            if iata_col:
+                                gaz.add_iata(row.get(iata_col), name)
+            except OSError as e:
+                print(f"Warning: gazetteer could not read {path}: {e}")
+        for name in places:
+            title = aliases.get(name.casefold(), name)
+            gaz.add(name, title)
+        for alias, title in aliases.items():
+            gaz.add(alias, title)
+        # IATA codes should resolve to the same titles as the names they stand for.
+        gaz._iata = {code: aliases.get(name.casefold(), name) for code, name in gaz._iata.items()}
+        return gaz
+
+    def find(self, text: str):
+        """Return `[{"text", "title", "role"}]` for every place mentioned in `text`."""
+        tokens = _gazetteer_tokens(text)
+        folded = [t.casefold() for t in tokens]
+        matches, i = [], 0
+        while i < len(tokens):
+            node, j, hit = self._root, i, None
+            while j < len(tokens) and folded[j] in node:
+                node = node[folded[j]]
+                j += 1
+                if "$" in node:
+                    hit = (j, node["$"])
+            if hit is None and tokens[i].isupper() and tokens[i] in self._iata:
+                hit = (i + 1, self._iata[tokens[i]])
+            if hit is None:
+                i += 1
+                continue
+            end, title = hit
+            matches.append({"text": " ".join(tokens[i:end]), "title": title, "start": i, "end": end})
+            i = end
+
+        for k, m in enumerate(matches):
+            before = folded[m["start"] - 1] if m["start"] > 0 else ""
+            after = folded[m["end"]] if m["end"] < len(folded) else ""
+            next_is_place = k + 1 < len(matches) and matches[k + 1]["start"] == m["end"] + 1
+            is_origin = before in _GAZETTEER_ORIGIN_BEFORE or (after in _GAZETTEER_ORIGIN_AFTER and next_is_place)
+            m["role"] = "origin" if is_origin else "destination"
+        return [{"text": m["text"], "title": m["title"], "role": m["role"]} for m in matches]
+
+
+@singleton
+def get_gazetteer():
+    """Build the gazetteer once, from the CSV data plus the alias tables."""
+    cfg = get_config()
+    aliases = {k.casefold(): v for k, v in _GAZETTEER_ALIASES.items()}
+    if cfg.gazetteer_aliases_file:
+        try:
+            with open(cfg.gazetteer_aliases_file, encoding="utf-8") as fh:
+                aliases.update({str(k).casefold(): str(v) for k, v in json.load(fh).items()})
+        except Exception as e:
+            print(f"Warning: could not load gazetteer aliases from {cfg.gazetteer_aliases_file}: {e}")
+    return Gazetteer.from_data(cfg.gazetteer_data_dir, aliases)
+
+
+def gazetteer_destinations(user_input: str):
+    """
+    Resolve destinations locally, without a network call. Places that read as
+    the origin ("from Delhi", "Delhi to ...") are reported but not returned
+    as destinations. Same shape as `_wiki_build_destinations_from_input`.
+    """
+    matches = get_gazetteer().find(user_input or "")
+    dests, seen = [], set()
+    for m in matches:
+        if m["role"] == "destination" and m["title"] not in seen:
+            seen.add(m["title"])
+            dests.append(m["title"])
+    return {"destinations": dests, "raw": {"source": "gazetteer", "matches": matches}}
@@ -0,0 +1,111 @@
+"""Response profiles and pre-serialised JSON responses."""
+
+from .config import get_config
+from .serialization import json_dumps
+
+
+RESPONSE_PROFILES = ("minimal", "ui", "debug")
+# Per-destination Wikipedia fields the UI renders; `raw` is left out.
+_WIKI_UI_FIELDS = ("title", "description", "extract", "lang", "page_url", "thumbnail", "images", "error", "status_code")
+
+
+def _compress_blob(value):
+    """gzip+base64 form of `value` if its JSON is at least RESPONSE_COMPRESS_MIN_BYTES, else `value`."""
+    data = json_dumps(value)
+    if len(data) < get_config().response_compress_min_bytes:
+        return value
+    import base64, gzip
+
+    return {
+        "encoding": "gzip+base64",
+        "original_bytes": len(data),
+        "data": base64.b64encode(gzip.compress(data, 6)).decode("ascii"),
+    }
+
+
+def _project_wiki(info):
+    """Wiki destination info without the raw API payloads or extraction debug data."""
+    if not isinstance(info, dict):
+        return info
+    out = {k: info[k] for k in ("destinations", "travel_summary", "cache", "error", "partial", "missing") if k in info}
+    out["summaries"] = [
+        {k: s[k] for k in _WIKI_UI_FIELDS if k in s} if isinstance(s, dict) else s
+        for s in info.get("summaries") or []
+    ]
+    return out
+
+
+def shape_response(result, profile=None, compress=False):
+    """
+    Project a trip / wiki / batch result onto a response profile (see
+    RESPONSE_PROFILE). Builds new containers and never modifies `result`,
+    which may be shared with the trip or wiki caches.
+    """
+    profile = (profile or get_config().response_profile).lower()
+    if not isinstance(result, dict):
+        return result
+    if isinstance(result.get("items"), list):
+        return {**result, "items": [_shape_event(ev, profile, compress) for ev in result["items"]]}
+    ctx = result.get("raw_context")
+    if profile == "debug":
+        if not compress or not isinstance(ctx, dict):
+            return result
+        ctx = dict(ctx)
+        for key in ("cortex_agent_response", "wiki_destination_info"):
+            if key in ctx:
+                ctx[key] = _compress_blob(ctx[key])
+        return {**result, "raw_context": ctx}
+
+    if "summaries" in result and "best_trip_recommendation" not in result:
+        # `mode="wiki"` result.
+        return _project_wiki(result)
+    out = {k: v for k, v in result.items() if k != "raw_context"}
+    if profile == "ui" and isinstance(ctx, dict):
+        slim = {k: ctx[k] for k in ("timings", "cache") if k in ctx}
+        if "wiki_destination_info" in ctx:
+            slim["wiki_destination_info"] = _project_wiki(ctx["wiki_destination_info"])
+        out["raw_context"] = slim
+    return out
+
+
+def _shape_event(ev, profile, compress):
+    """`shape_response` for one streaming / batch event."""
+    if not isinstance(ev, dict) or profile == "debug" and not compress:
+        return ev
+    kind = ev.get("type")
+    if kind == "final":
+        return {**ev, "data": shape_response(ev.get("data"), profile, compress)}
+    if kind == "item" and "result" in ev:
+        return {**ev, "result": shape_response(ev["result"], profile, compress)}
+    if profile == "debug":
+        return ev
+    if kind == "wiki":
+        return {**ev, "data": _project_wiki(ev.get("data"))}
+    if kind == "table":
+        # The decoded table is sent again in the final `tables`; point at it instead.
+        table = ev.get("table") or {}
+        return {"type": "table", "title": ev.get("title"), "index": ev.get("index"), "num_rows": table.get("num_rows")}
+    if kind == "error" and "raw_context" in ev:
+        return {k: v for k, v in ev.items() if k != "raw_context"}
+    return ev
+
+
+def shape_events(events, profile, compress):
+    try:
+        for ev in events:
+            yield _shape_event(ev, profile, compress)
+    finally:
+        events.close()
+
+
+def json_response(body: bytes, result: dict, status_code: int = 200, headers: dict = None):
+    """
+    Wrap an already-serialised body in a Starlette response, which AgentCore
+    passes through untouched. Falls back to the dict itself if Starlette is
+    not importable.
+    """
+    try:
+        from starlette.responses import Response
+    except ImportError:
+        return result
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
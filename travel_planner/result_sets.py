@@ -0,0 +1,170 @@
+"""Typed, columnar decoding of Snowflake result sets."""
+
+import datetime, decimal
+
+
+# Cortex Agent tables are decoded into typed columns. Snowflake's JSON
+# result format sends every value as a string; dates are days since the
+# epoch, TIME values seconds since midnight and timestamps epoch seconds
+# (TIMESTAMP_TZ adds " <offset minutes + 1440>"). Columns are decoded once
+# into numbers in those native units and temporal columns are then rendered
+# as ISO strings.
+
+_EPOCH_DATE = datetime.date(1970, 1, 1)
+_EPOCH_DATETIME = datetime.datetime(1970, 1, 1)
+
+
+def _rs_dtype(col):
+    """Logical dtype for a `rowType` entry."""
+    kind = str(col.get("type") or "text").lower()
+    if kind == "fixed":
+        return "float64" if col.get("scale") else "int64"
+    if kind in ("real", "float", "double"):
+        return "float64"
+    if kind == "boolean":
+        return "bool"
+    if kind == "date":
+        return "date"
+    if kind == "time":
+        return "time"
+    if kind.startswith("timestamp"):
+        return "timestamp"
+    return "string"
+
+
+def _rs_int(v):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return int(decimal.Decimal(str(v)))
+
+
+def _rs_bool(v):
+    return v if isinstance(v, bool) else str(v).strip().lower() in ("true", "1", "t", "yes")
+
+
+def _rs_days(v):
+    s = str(v)
+    if "-" in s[1:]:
+        return (datetime.date.fromisoformat(s[:10]) - _EPOCH_DATE).days
+    return int(s)
+
+
+def _rs_time_us(v):
+    s = str(v)
+    if ":" in s:
+        t = datetime.time.fromisoformat(s)
+        return ((t.hour * 60 + t.minute) * 60 + t.second) * 1_000_000 + t.microsecond
+    return round(float(s) * 1_000_000)
+
+
+def _rs_timestamp_us(v):
+    """Epoch microseconds (UTC) and the UTC offset in minutes, if any."""
+    s = str(v).strip()
+    if "-" in s[1:] and ":" in s:
+        dt = datetime.datetime.fromisoformat(s.replace("Z", "+00:00"))
+        offset = dt.utcoffset()
+        naive = dt.replace(tzinfo=None) - (offset or datetime.timedelta(0))
+        minutes = int(offset.total_seconds() // 60) if offset is not None else None
+        return (naive - _EPOCH_DATETIME) // datetime.timedelta(microseconds=1), minutes
+    seconds, _, tz = s.partition(" ")
+    us = int((decimal.Decimal(seconds) * 1_000_000).to_integral_value())
+    return us, (int(tz) - 1440 if tz else None)
+
+
+_RS_DECODERS = {
+    "int64": _rs_int,
+    "float64": float,
+    "bool": _rs_bool,
+    "date": _rs_days,
+    "time": _rs_time_us,
+    "timestamp": lambda v: _rs_timestamp_us(v)[0],
+    "string": str,
+}
+
+
+def rs_columns(rs):
+    """
+    Decode a `result_set` column by column: returns `[(meta, values)]` with
+    values in native units (ints, floats, bools, epoch days/microseconds,
+    strings; `None` for nulls). A column that fails to decode keeps its raw
+    strings and is reported as `"string"`.
+    """
+    meta = (rs or {}).get("resultSetMetaData") or {}
+    row_type = meta.get("rowType") or []
+    rows = (rs or {}).get("data") or []
+    raw_columns = list(zip(*rows)) if rows else [()] * len(row_type)
+    out, seen = [], {}
+    for i, col in enumerate(row_type):
+        name = str(col.get("name") or f"col_{i}")
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 0
+        dtype = _rs_dtype(col)
+        raw = raw_columns[i] if i < len(raw_columns) else ()
+        try:
+            dec = _RS_DECODERS[dtype]
+            values = [None if v is None else dec(v) for v in raw]
+        except Exception:
+            dtype, values = "string", [None if v is None else str(v) for v in raw]
+        info = {"name": name, "type": str(col.get("type") or "text").lower(), "dtype": dtype}
+        if dtype == "timestamp":
+            info["tz"] = "UTC" if info["type"] in ("timestamp_ltz", "timestamp_tz") else None
+            if info["type"] == "timestamp_tz":
+                offsets = [_rs_timestamp_us(v)[1] for v in raw if v is not None]
+                info["utc_offset_minutes"] = offsets[0] if offsets and len(set(offsets)) == 1 else None
+        out.append((info, values))
+    return out
+
+
+def rs_iso(dtype, values):
+    if dtype == "date":
+        return [None if v is None else (_EPOCH_DATE + datetime.timedelta(days=v)).isoformat() for v in values]
+    if dtype == "time":
+        return [
+            None if v is None else (datetime.datetime.min + datetime.timedelta(microseconds=v)).time().isoformat()
+            for v in values
+        ]
+    if dtype == "timestamp":
+        return [
+            None if v is None else (_EPOCH_DATETIME + datetime.timedelta(microseconds=v)).isoformat()
+            for v in values
+        ]
+    return values
+
+
+def decode_result_set(rs, title=None):
+    """
+    Turn a Cortex Agent `result_set` into a JSON-ready columnar table:
+
+        {"title", "num_rows",
+         "columns": [{"name", "type", "dtype", ...}],
+         "data": {column_name: [values...]}}
+
+    Numbers come back as ints/floats, booleans as bools and DATE / TIME /
+    TIMESTAMP columns as ISO 8601 strings (timestamps in UTC). `dtype` is one
+    of int64, float64, bool, date, time, timestamp or string, so consumers can
+    build typed frames without inspecting values.
+    """
+    cols = rs_columns(rs)
+    return {
+        "title": title,
+        "num_rows": len((rs or {}).get("data") or []),
+        "columns": [info for info, _ in cols],
+        "data": {info["name"]: rs_iso(info["dtype"], values) for info, values in cols},
+    }
+
+
+def agent_tables(agent_resp):
+    """Decoded `decode_result_set` tables for every table item in a Cortex Agent response."""
+    content = agent_resp.get("content") if isinstance(agent_resp, dict) else None
+    tables = []
+    for item in content if isinstance(content, list) else []:
+        if not isinstance(item, dict) or item.get("type") != "table":
+            continue
+        block = item.get("table") or {}
+        if block.get("result_set"):
+            tables.append(decode_result_set(block["result_set"], title=block.get("title")))
+    return tables
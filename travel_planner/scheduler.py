@@ -0,0 +1,257 @@
+"""Admission control, per-dependency limits, request deadlines and cancellation."""
+
+import concurrent.futures, contextvars, heapq, itertools, threading, time
+
+from .config import get_config, singleton
+from .telemetry import telemetry
+
+
+_SCHEDULER_LANES = {"interactive": 0, "batch": 1, "background": 2}
+request_lane = contextvars.ContextVar("travel_agent_lane", default="interactive")
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a scheduler queue is full or a waiter times out."""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Slot:
+    """One acquired `Limiter` slot; `release()` may be called more than once."""
+
+    __slots__ = ("_limiter", "wait_seconds")
+
+    def __init__(self, limiter, wait_seconds):
+        self._limiter = limiter
+        self.wait_seconds = wait_seconds
+
+    def release(self):
+        limiter, self._limiter = self._limiter, None
+        if limiter is not None:
+            limiter._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class Limiter:
+    """
+    Bounded concurrency pool plus token-bucket rate limit with priority lanes.
+
+    `acquire()` returns a `_Slot` once fewer than `max_concurrency` holders
+    are active and a token is available (`rate` tokens per second, bursting
+    to one second's worth; `rate <= 0` disables the bucket). Waiters are
+    served strictly by lane priority, then arrival order. A lane whose queue
+    already holds `queue_max` waiters is shed at once, and waiters give up
+    after `queue_timeout`; both raise `SchedulerOverloaded`. Queue-wait time
+    is reported to the telemetry histogram and kept per lane in `stats()`.
+    """
+
+    def __init__(self, name, max_concurrency, rate=0.0, queue_max=64, queue_timeout=15.0):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.rate = max(0.0, float(rate))
+        self.burst = max(1.0, self.rate)
+        self.queue_max = int(queue_max)
+        self.queue_timeout = float(queue_timeout)
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._tokens, self._stamp = self.burst, time.monotonic()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._queued = dict.fromkeys(_SCHEDULER_LANES, 0)
+        self._metrics = {
+            lane: {"admitted": 0, "shed": 0, "timeouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+            for lane in _SCHEDULER_LANES
+        }
+
+    def _delay(self, now):
+        """Seconds until a slot and a token are free; None while the pool is full."""
+        if self._in_flight >= self.max_concurrency:
+            return None
+        if self.rate <= 0:
+            return 0.0
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def _take(self):
+        self._in_flight += 1
+        if self.rate > 0:
+            self._tokens -= 1
+
+    def acquire(self, lane=None):
+        lane = lane if lane in _SCHEDULER_LANES else request_lane.get()
+        t0 = time.monotonic()
+        with self._cond:
+            if self._waiting or self._delay(t0) != 0.0:
+                self._wait_turn(lane, t0)
+            self._take()
+            # The next waiter may be able to go too (e.g. tokens to spare).
+            self._cond.notify_all()
+            waited = time.monotonic() - t0
+            m = self._metrics[lane]
+            m["admitted"] += 1
+            m["wait_seconds"] += waited
+            m["max_wait_seconds"] = max(m["max_wait_seconds"], waited)
+        telemetry.observe_wait(self.name, lane, waited)
+        return _Slot(self, waited)
+
+    def _wait_turn(self, lane, t0):
+        if self._queued[lane] >= self.queue_max:
+            self._metrics[lane]["shed"] += 1
+            raise SchedulerOverloaded(f"{self.name} overloaded: {lane} queue is full ({self.queue_max} waiting)")
+        ticket = (_SCHEDULER_LANES[lane], next(self._seq))
+        heapq.heappush(self._waiting, ticket)
+        self._queued[lane] += 1
+        request_end = request_deadline.get()
+        deadline = t0 + self.queue_timeout
+        if request_end is not None:
+            deadline = min(deadline, request_end)
+        try:
+            while True:
+                now = time.monotonic()
+                delay = self._delay(now)
+                if self._waiting[0] == ticket and delay == 0.0:
+                    heapq.heappop(self._waiting)
+                    return
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._metrics[lane]["timeouts"] += 1
+                    if request_end is not None and now >= request_end:
+                        raise DeadlineExceeded(f"request deadline reached while queued for {self.name}")
+                    raise SchedulerOverloaded(
+                        f"{self.name} overloaded: no {lane} slot within {self.queue_timeout:g}s"
+                    )
+                self._cond.wait(min(remaining, delay) if delay else remaining)
+        except BaseException:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+            self._cond.notify_all()
+            raise
+        finally:
+            self._queued[lane] -= 1
+
+    def _release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def saturated(self):
+        """True while every slot is taken or callers are queued for one."""
+        with self._cond:
+            return bool(self._waiting) or self._in_flight >= self.max_concurrency
+
+    def stats(self):
+        with self._cond:
+            lanes = {lane: dict(m) for lane, m in self._metrics.items()}
+            out = {
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "rate_per_second": self.rate,
+                "queued": dict(self._queued),
+            }
+        for m in lanes.values():
+            m["avg_wait_seconds"] = round(m["wait_seconds"] / m["admitted"], 4) if m["admitted"] else 0.0
+            m["wait_seconds"] = round(m["wait_seconds"], 4)
+            m["max_wait_seconds"] = round(m["max_wait_seconds"], 4)
+        out["lanes"] = lanes
+        return out
+
+
+@singleton
+def admission():
+    """The request admission limiter every invoke goes through."""
+    cfg = get_config()
+    return Limiter(
+        "requests",
+        cfg.scheduler_max_concurrency,
+        queue_max=cfg.scheduler_queue_max,
+        queue_timeout=cfg.scheduler_queue_timeout_seconds,
+    )
+
+
+@singleton
+def limits():
+    """Per-dependency limiters, by name: "snowflake", "bedrock" and "wikipedia"."""
+    cfg = get_config()
+    queue = {"queue_max": cfg.scheduler_queue_max, "queue_timeout": cfg.scheduler_queue_timeout_seconds}
+    return {
+        "snowflake": Limiter("snowflake", cfg.snowflake_max_concurrency, cfg.snowflake_rate_per_second, **queue),
+        "bedrock": Limiter("bedrock", cfg.bedrock_max_concurrency, cfg.bedrock_rate_per_second, **queue),
+        "wikipedia": Limiter("wikipedia", cfg.wiki_max_concurrency, cfg.wiki_rate_per_second, **queue),
+    }
+
+
+def scheduler_stats():
+    """Admission and per-dependency pool counters, including queue-wait times per lane."""
+    return {"requests": admission().stats(), **{name: lim.stats() for name, lim in limits().items()}}
+
+
+request_deadline = contextvars.ContextVar("travel_agent_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the request's deadline budget is used up before a stage can run."""
+
+
+def time_left():
+    """Seconds left before the current request's deadline, or None without one."""
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def deadline_budget(limit=None):
+    """`limit` (None or 0 for unbounded) capped to the time left before the request deadline."""
+    left = time_left()
+    if left is None:
+        return limit
+    left = max(left, 0.001)
+    return min(limit, left) if limit else left
+
+
+def stage_timeout(limit, stage):
+    """Like `deadline_budget`, but raises DeadlineExceeded if the budget is already spent."""
+    left = time_left()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"request deadline reached before {stage}")
+    return deadline_budget(limit)
+
+
+class BranchCancelled(Exception):
+    """Raised inside a pipeline branch when its cancel event has been set."""
+
+
+def check_cancel(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise BranchCancelled("cancelled")
+
+
+@singleton
+def _executors():
+    return {}
+
+
+_executors_lock = threading.Lock()
+
+
+def shared_executor(name, max_workers):
+    """
+    Process-wide thread pool `name`, created on first use so importing the
+    package starts no pools; its threads are named after it.
+    """
+    pools = _executors()
+    pool = pools.get(name)
+    if pool is None:
+        with _executors_lock:
+            pool = pools.get(name)
+            if pool is None:
+                pool = pools[name] = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix=name
+                )
+    return pool
@@ -0,0 +1,464 @@
+"""Local flight and hotel search over an in-memory FLIGHT_DATA / HOTEL_DATA snapshot."""
+
+import contextvars, datetime, os, threading, time
+
+from .config import get_config, singleton
+from .cortex_client import snowflake_query
+from .gazetteer import get_gazetteer
+from .result_sets import rs_columns, rs_iso
+from .scheduler import request_lane
+from .telemetry import span
+
+
+# FLIGHT_DATA / HOTEL_DATA column types, as created by snowflake_setup_worksheet.sql.
+_FLIGHT_ROW_TYPE = [
+    {"name": "AIRLINE", "type": "text"},
+    {"name": "SOURCE", "type": "text"},
+    {"name": "DESTINATION", "type": "text"},
+    {"name": "NEAREST_AIRPORT_SOURCE", "type": "text"},
+    {"name": "NEAREST_AIRPORT_DESTINATION", "type": "text"},
+    {"name": "IATA_SOURCE", "type": "text"},
+    {"name": "IATA_DESTINATION", "type": "text"},
+    {"name": "ROUTE", "type": "text"},
+    {"name": "DEP_TIME", "type": "time"},
+    {"name": "ARRIVAL_TIME", "type": "time"},
+    {"name": "DURATION", "type": "text"},
+    {"name": "TOTAL_STOPS", "type": "fixed", "scale": 0},
+    {"name": "ADDITIONAL_INFO", "type": "text"},
+    {"name": "PRICE", "type": "fixed", "scale": 0},
+    {"name": "DIRECT_CONNECTING", "type": "text"},
+]
+_HOTEL_ROW_TYPE = [
+    {"name": "HOTEL_NAME", "type": "text"},
+    {"name": "HOTEL_RATING", "type": "real"},
+    {"name": "CITY", "type": "text"},
+    {"name": "HOTEL_TYPE", "type": "text"},
+    {"name": "BREAKFAST_INCLUDED", "type": "text"},
+    {"name": "WIFI_INCLUDED", "type": "text"},
+    {"name": "PARKING_INCLUDED", "type": "text"},
+    {"name": "FACILITY_1", "type": "text"},
+    {"name": "FACILITY_2", "type": "text"},
+    {"name": "FACILITY_3", "type": "text"},
+    {"name": "FACILITY_4", "type": "text"},
+    {"name": "FACILITY_5", "type": "text"},
+    {"name": "HOTEL_PRICE", "type": "fixed", "scale": 0},
+]
+
+
+def _csv_result_set(path, row_type):
+    """Read a CSV export of a table into the `result_set` shape Snowflake returns."""
+    import csv
+
+    names = [c["name"] for c in row_type]
+    with open(path, newline="", encoding="utf-8") as fh:
+        data = [[(row.get(n) or "").strip() or None for n in names] for row in csv.DictReader(fh)]
+    return {"resultSetMetaData": {"rowType": row_type, "numRows": len(data)}, "data": data}
+
+
+def _search_key(value):
+    return " ".join(str(value or "").split()).casefold()
+
+
+def _place_keys(name):
+    """Lookup keys for a place name: "Denpasar (Bali)" -> full name, "denpasar", "bali"."""
+    key = _search_key(name)
+    if not key:
+        return []
+    keys = [key]
+    if "(" in key and key.endswith(")"):
+        base, _, alias = key[:-1].partition("(")
+        keys += [k for k in (base.strip(), alias.strip()) if k]
+    return keys
+
+
+class _SearchTable:
+    """Decoded columns of one table plus helpers shared by its indexes."""
+
+    def __init__(self, rs):
+        cols = rs_columns(rs)
+        self.info = [info for info, _ in cols]
+        self.columns = {info["name"]: values for info, values in cols}
+        self.num_rows = len((rs or {}).get("data") or [])
+        self._arrays = {}
+
+    def column(self, name):
+        return self.columns.get(name) or [None] * self.num_rows
+
+    def sorted_ids(self, name):
+        """Row ids ordered by a numeric column (nulls dropped) and the matching values."""
+        col = self.column(name)
+        ids = sorted((i for i, v in enumerate(col) if v is not None), key=col.__getitem__)
+        return ids, [col[i] for i in ids]
+
+    def array(self, name):
+        """Column as a float64 NumPy array (NaN for nulls), or None without NumPy."""
+        if name not in self._arrays:
+            try:
+                import numpy as np
+            except ImportError:
+                return None
+            self._arrays[name] = np.array(
+                [np.nan if v is None else v for v in self.column(name)], dtype=np.float64
+            )
+        return self._arrays[name]
+
+    def table(self, ids, title):
+        """`decode_result_set`-shaped columnar table for the given rows."""
+        return {
+            "title": title,
+            "num_rows": len(ids),
+            "columns": self.info,
+            "data": {
+                info["name"]: rs_iso(info["dtype"], [self.columns[info["name"]][i] for i in ids])
+                for info in self.info
+            },
+        }
+
+
+def _duration_minutes(value):
+    try:
+        h, _, m = str(value).partition(":")
+        return int(h) * 60 + int(m or 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TravelSearchIndex:
+    """
+    Immutable in-memory snapshot of FLIGHT_DATA and HOTEL_DATA with lookup
+    indexes: flights by route (IATA_SOURCE, IATA_DESTINATION), by source and
+    destination (city name or IATA code) and by stop count, hotels by city,
+    and both tables by price for range scans. A query narrows the candidate
+    rows through the most selective index first; the remaining predicates and
+    the sort then run over NumPy column arrays when NumPy is installed and
+    enough rows are left, otherwise in plain Python.
+    """
+
+    VECTOR_MIN_ROWS = 256
+    FLIGHT_SORTS = {"price": ("PRICE", False), "duration": ("DURATION_MINUTES", False),
+                    "departure": ("DEP_TIME", False), "stops": ("TOTAL_STOPS", False)}
+    HOTEL_SORTS = {"price": ("HOTEL_PRICE", False), "rating": ("HOTEL_RATING", True)}
+
+    def __init__(self, flights_rs, hotels_rs, origin):
+        self.origin = origin
+        self.loaded_at = time.time()
+        self.flights = _SearchTable(flights_rs)
+        self.hotels = _SearchTable(hotels_rs)
+        f = self.flights
+        f.columns["DURATION_MINUTES"] = [_duration_minutes(v) for v in f.column("DURATION")]
+
+        self.routes, self.by_stops = {}, {}
+        self.by_source, self.by_destination = {}, {}
+        for i, (src, dst, src_city, dst_city, stops) in enumerate(zip(
+            f.column("IATA_SOURCE"), f.column("IATA_DESTINATION"),
+            f.column("SOURCE"), f.column("DESTINATION"), f.column("TOTAL_STOPS"),
+        )):
+            self.routes.setdefault((_search_key(src), _search_key(dst)), []).append(i)
+            self.by_stops.setdefault(stops, []).append(i)
+            for key in {_search_key(src), *_place_keys(src_city)} - {""}:
+                self.by_source.setdefault(key, []).append(i)
+            for key in {_search_key(dst), *_place_keys(dst_city)} - {""}:
+                self.by_destination.setdefault(key, []).append(i)
+        self.flight_price = f.sorted_ids("PRICE")
+
+        self.by_city = {}
+        for i, city in enumerate(self.hotels.column("CITY")):
+            for key in _place_keys(city):
+                self.by_city.setdefault(key, []).append(i)
+        self.hotel_price = self.hotels.sorted_ids("HOTEL_PRICE")
+
+    @staticmethod
+    def _price_range(index, lo, hi):
+        import bisect
+
+        ids, prices = index
+        start = bisect.bisect_left(prices, lo) if lo is not None else 0
+        end = bisect.bisect_right(prices, hi) if hi is not None else len(prices)
+        return ids[start:end]
+
+    @staticmethod
+    def _narrow(candidates, ids):
+        return set(ids) if candidates is None else candidates & set(ids)
+
+    def _filter_sort(self, table, ids, preds, sort_col, descending, limit):
+        """Apply `(column, op, value)` predicates, sort, and return `(top_ids, total)`."""
+        ids = sorted(ids)
+        arrays = [table.array(col) for col, _, _ in preds] if len(ids) >= self.VECTOR_MIN_ROWS else None
+        key_arr = table.array(sort_col) if arrays is not None else None
+        if arrays is not None and key_arr is not None and all(a is not None for a in arrays):
+            import numpy as np
+
+            idx = np.asarray(ids, dtype=np.int64)
+            mask = np.ones(len(idx), dtype=bool)
+            for arr, (_, op, value) in zip(arrays, preds):
+                vals = arr[idx]
+                mask &= (vals <= value) if op == "<=" else (vals >= value)
+            idx = idx[mask]
+            keys = key_arr[idx]
+            order = np.argsort(-keys if descending else keys, kind="stable")
+            return idx[order[:limit]].tolist(), int(len(idx))
+
+        cols = [(table.column(col), op, value) for col, op, value in preds]
+        kept = [
+            i for i in ids
+            if all(c[i] is not None and (c[i] <= v if op == "<=" else c[i] >= v) for c, op, v in cols)
+        ]
+        key_col = table.column(sort_col)
+        present = [i for i in kept if key_col[i] is not None]
+        present.sort(key=key_col.__getitem__, reverse=descending)
+        ordered = present + [i for i in kept if key_col[i] is None]
+        return ordered[:limit], len(kept)
+
+    def search_flights(self, source=None, destination=None, min_price=None, max_price=None,
+                       max_stops=None, direct=None, airline=None, sort="price", limit=10):
+        if sort not in self.FLIGHT_SORTS:
+            raise ValueError(f"sort must be one of {sorted(self.FLIGHT_SORTS)}")
+        if direct:
+            max_stops = 0
+        src, dst = _search_key(source), _search_key(destination)
+        candidates = None
+        if src and dst and (src, dst) in self.routes:
+            candidates = set(self.routes[(src, dst)])
+        else:
+            if src:
+                candidates = self._narrow(candidates, self.by_source.get(src, ()))
+            if dst:
+                candidates = self._narrow(candidates, self.by_destination.get(dst, ()))
+        if candidates is None and (min_price is not None or max_price is not None):
+            candidates = set(self._price_range(self.flight_price, min_price, max_price))
+        if candidates is None and max_stops is not None:
+            candidates = {i for stops, ids in self.by_stops.items() if stops is not None and stops <= max_stops for i in ids}
+        if candidates is None:
+            candidates = range(self.flights.num_rows)
+        if airline:
+            wanted = _search_key(airline)
+            col = self.flights.column("AIRLINE")
+            candidates = [i for i in candidates if wanted in _search_key(col[i])]
+
+        preds = []
+        if min_price is not None:
+            preds.append(("PRICE", ">=", float(min_price)))
+        if max_price is not None:
+            preds.append(("PRICE", "<=", float(max_price)))
+        if max_stops is not None:
+            preds.append(("TOTAL_STOPS", "<=", int(max_stops)))
+        sort_col, descending = self.FLIGHT_SORTS[sort]
+        return self._filter_sort(self.flights, candidates, preds, sort_col, descending, int(limit))
+
+    def search_hotels(self, city=None, min_price=None, max_price=None, min_rating=None,
+                      breakfast=None, sort="price", limit=10):
+        if sort not in self.HOTEL_SORTS:
+            raise ValueError(f"sort must be one of {sorted(self.HOTEL_SORTS)}")
+        candidates = None
+        if _search_key(city):
+            candidates = set(self.by_city.get(_search_key(city), ()))
+        elif min_price is not None or max_price is not None:
+            candidates = set(self._price_range(self.hotel_price, min_price, max_price))
+        if candidates is None:
+            candidates = range(self.hotels.num_rows)
+        if breakfast:
+            col = self.hotels.column("BREAKFAST_INCLUDED")
+            candidates = [i for i in candidates if _search_key(col[i]).startswith("free")]
+
+        preds = []
+        if min_price is not None:
+            preds.append(("HOTEL_PRICE", ">=", float(min_price)))
+        if max_price is not None:
+            preds.append(("HOTEL_PRICE", "<=", float(max_price)))
+        if min_rating is not None:
+            preds.append(("HOTEL_RATING", ">=", float(min_rating)))
+        sort_col, descending = self.HOTEL_SORTS[sort]
+        return self._filter_sort(self.hotels, candidates, preds, sort_col, descending, int(limit))
+
+
+class TravelSearchStore:
+    """
+    Holds the current `TravelSearchIndex`. The first snapshot is built from
+    the bundled CSVs on the first search; once that one is `refresh_seconds`
+    old, a fresh snapshot is pulled from Snowflake on a background thread
+    (single-flight) and swapped in whole, so a query always sees one
+    consistent snapshot and a process that never searches never runs the
+    refresh queries. A failed refresh keeps the current data and is retried
+    after `retry_seconds`.
+    """
+
+    def __init__(self, data_dir, refresh_seconds, retry_seconds):
+        self.data_dir = data_dir
+        self.refresh_seconds = refresh_seconds
+        self.retry_seconds = retry_seconds
+        self._index = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._next_refresh = 0.0
+        self._stats = {"refreshes": 0, "failures": 0, "last_error": None}
+
+    def get(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    with span("travel_search.load", origin="csv"):
+                        self._index = TravelSearchIndex(
+                            _csv_result_set(os.path.join(self.data_dir, "FLIGHT_DATA.csv"), _FLIGHT_ROW_TYPE),
+                            _csv_result_set(os.path.join(self.data_dir, "HOTEL_DATA.csv"), _HOTEL_ROW_TYPE),
+                            origin="csv",
+                        )
+                        self._next_refresh = time.monotonic() + self.refresh_seconds
+        if self.refresh_seconds > 0 and time.monotonic() >= self._next_refresh:
+            with self._lock:
+                start = not self._refreshing and time.monotonic() >= self._next_refresh
+                self._refreshing = self._refreshing or start
+            if start:
+                threading.Thread(
+                    target=contextvars.copy_context().run, args=(self._refresh,),
+                    name="travel-search-refresh", daemon=True,
+                ).start()
+        return self._index
+
+    def _refresh(self):
+        # Runs in its own copied context, so this only demotes the refresh.
+        request_lane.set("background")
+        try:
+            with span("travel_search.load", origin="snowflake") as sp:
+                cols = lambda row_type: ", ".join(c["name"] for c in row_type)
+                index = TravelSearchIndex(
+                    snowflake_query(f"SELECT {cols(_FLIGHT_ROW_TYPE)} FROM FLIGHT_DATA"),
+                    snowflake_query(f"SELECT {cols(_HOTEL_ROW_TYPE)} FROM HOTEL_DATA"),
+                    origin="snowflake",
+                )
+                sp.set("flights", index.flights.num_rows)
+                sp.set("hotels", index.hotels.num_rows)
+            with self._lock:
+                self._index = index
+                self._stats["refreshes"] += 1
+                self._stats["last_error"] = None
+                self._next_refresh = time.monotonic() + self.refresh_seconds
+        except Exception as e:
+            with self._lock:
+                self._stats["failures"] += 1
+                self._stats["last_error"] = str(e)
+                self._next_refresh = time.monotonic() + self.retry_seconds
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def stats(self):
+        idx = self._index
+        with self._lock:
+            out = dict(self._stats)
+        if idx is not None:
+            out.update(
+                origin=idx.origin,
+                loaded_at=datetime.datetime.fromtimestamp(idx.loaded_at, datetime.timezone.utc).isoformat(),
+                flights=idx.flights.num_rows,
+                hotels=idx.hotels.num_rows,
+            )
+        return out
+
+
+@singleton
+def travel_search_store():
+    cfg = get_config()
+    return TravelSearchStore(
+        cfg.gazetteer_data_dir,
+        refresh_seconds=cfg.travel_search_refresh_seconds,
+        retry_seconds=cfg.travel_search_retry_seconds,
+    )
+
+
+def travel_search_stats():
+    """Origin, age and size of the in-memory flight/hotel snapshot."""
+    return travel_search_store().stats()
+
+
+def parse_search_prompt(prompt: str):
+    """
+    Rule-based reading of short structured questions such as
+    "cheapest direct flight SIN→HND" or "hotels in Tokyo under 300 with free
+    breakfast" into `(kind, filters)` for `travel_search`. Places come from
+    the gazetteer, which also tells the origin from the destination.
+    """
+    import re
+
+    low = (prompt or "").casefold()
+    kind = "hotels" if re.search(r"\b(hotels?|stay|accommodation|rooms?)\b", low) and not re.search(r"\bflights?\b", low) else "flights"
+    filters = {}
+    m = re.search(r"\b(?:under|below|less than|cheaper than|max(?:imum)?|up to|within)\s*(?:[a-z]{3}\s*)?[$₹€£¥]?\s*([\d][\d,]*)", low)
+    if m:
+        filters["max_price"] = float(m.group(1).replace(",", ""))
+    m = re.search(r"\btop\s+(\d+)\b", low)
+    if m:
+        filters["limit"] = int(m.group(1))
+
+    places = get_gazetteer().find(prompt or "")
+    if kind == "flights":
+        origin = next((p["text"] for p in places if p["role"] == "origin"), None)
+        dest = next((p["text"] for p in places if p["role"] == "destination"), None)
+        if origin:
+            filters["source"] = origin
+        if dest:
+            filters["destination"] = dest
+        if re.search(r"\b(direct|non-?stop)\b", low):
+            filters["max_stops"] = 0
+        if re.search(r"\b(fastest|shortest|quickest)\b", low):
+            filters["sort"] = "duration"
+        elif re.search(r"\bearliest\b", low):
+            filters["sort"] = "departure"
+    else:
+        if places:
+            filters["city"] = places[-1]["text"]
+        m = re.search(r"\b(\d(?:\.\d)?)\s*(?:\+|stars?|and above|or (?:better|higher))", low)
+        if m:
+            filters["min_rating"] = float(m.group(1))
+        if re.search(r"free breakfast|breakfast included|with breakfast", low):
+            filters["breakfast"] = True
+        if re.search(r"\b(best|top|highest)[- ]rated\b|\bbest\b", low):
+            filters["sort"] = "rating"
+    return kind, filters
+
+
+def travel_search(kind=None, filters=None, prompt=None):
+    """
+    Answer structured flight/hotel questions from the in-memory FLIGHT_DATA /
+    HOTEL_DATA snapshot, without calling Snowflake.
+
+    `kind` is "flights" or "hotels"; `filters` are the keyword arguments of
+    `TravelSearchIndex.search_flights` / `search_hotels` (places may be city
+    names or IATA codes). With `prompt`, kind and filters are read from the
+    text first and explicit `filters` override them. The matching rows come
+    back as a `decode_result_set`-shaped table under `tables`.
+    """
+    t0 = time.perf_counter()
+    parsed = {}
+    if prompt:
+        parsed_kind, parsed = parse_search_prompt(prompt)
+        kind = kind or parsed_kind
+    kind = (kind or "flights").lower()
+    if kind not in ("flights", "hotels"):
+        return {"error": "kind must be 'flights' or 'hotels'"}
+    if filters is not None and not isinstance(filters, dict):
+        return {"error": "filters must be an object"}
+    query = {**parsed, **(filters or {})}
+    index = travel_search_store().get()
+    with span("travel_search", kind=kind) as sp:
+        try:
+            if kind == "flights":
+                ids, total = index.search_flights(**query)
+                title = "Flights"
+            else:
+                ids, total = index.search_hotels(**query)
+                title = "Hotels"
+        except (TypeError, ValueError) as e:
+            return {"error": f"invalid search filters: {e}", "kind": kind, "query": query}
+        sp.set("matches", total)
+        table = (index.flights if kind == "flights" else index.hotels).table(ids, title)
+    return {
+        "kind": kind,
+        "query": query,
+        "total_matches": total,
+        "tables": [table],
+        "source": {
+            "origin": index.origin,
+            "loaded_at": datetime.datetime.fromtimestamp(index.loaded_at, datetime.timezone.utc).isoformat(),
+        },
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+    }
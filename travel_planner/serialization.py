@@ -0,0 +1,57 @@
+"""Single-pass JSON encoding of results."""
+
+import datetime, decimal, json
+
+
+# JSON encoding: a response is serialised once, directly from the result
+# objects, with orjson when it is installed and the stdlib encoder otherwise.
+# datetime/date/time values are written as str(value), Decimals as floats and
+# bytes as (UTF-8 decoded) text while encoding, so nothing has to be copied
+# into a "safe" form first. Any other type is an error rather than its repr.
+_orjson = None
+
+
+def _json_default(obj):
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return bytes(obj).decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps(obj) -> bytes:
+    """Serialise `obj` to UTF-8 JSON bytes in one pass."""
+    global _orjson
+    if _orjson is None:
+        try:
+            import orjson
+
+            _orjson = orjson
+        except ImportError:
+            _orjson = False
+    if _orjson:
+        try:
+            return _orjson.dumps(
+                obj,
+                default=_json_default,
+                option=_orjson.OPT_NON_STR_KEYS | _orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except _orjson.JSONEncodeError as e:
+            # orjson rejects integers wider than 64 bits; the stdlib does not.
+            # Anything else (an unsupported type) fails the same way there.
+            if "Integer exceeds" not in str(e):
+                raise
+    return json.dumps(obj, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def make_json_safe(obj):
+    """
+    Plain-JSON copy of `obj` (datetimes as strings, Decimals as floats). The
+    runtime no longer needs this, since `json_dumps` converts those types
+    during encoding; it is kept for callers that want a detached copy.
+    """
+    return json.loads(json_dumps(obj))
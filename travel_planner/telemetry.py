@@ -0,0 +1,165 @@
+"""Per-stage spans and latency histograms for the invoke pipeline."""
+
+import contextlib, contextvars, json, os, threading, time
+
+
+
+class _SpanHandle:
+    """Attribute sink for one pipeline stage; mirrors attributes to OTel."""
+
+    __slots__ = ("name", "attrs", "otel")
+
+    def __init__(self, name, attrs, otel=None):
+        self.name = name
+        self.attrs = attrs
+        self.otel = otel
+
+    def set(self, key, value):
+        if value is None:
+            return
+        if not isinstance(value, (str, bool, int, float)):
+            value = str(value)
+        self.attrs[key] = value
+        if self.otel is not None:
+            self.otel.set_attribute(key, value)
+
+
+class _Telemetry:
+    """
+    Per-stage spans and latency histograms for the invoke pipeline.
+
+    Uses the OpenTelemetry API when it is importable (the container runs
+    under `opentelemetry-instrument`, so spans join the request trace and
+    histograms are exported with the distro's metrics), and/or appends spans
+    to `trace_file` (TRAVEL_AGENT_TRACE_FILE unless given). With neither
+    available every call is a no-op. The OpenTelemetry API and the trace file
+    setting are resolved on first use, not at module import.
+    """
+
+    _current = contextvars.ContextVar("travel_agent_span", default=None)
+
+    def __init__(self, trace_file=None):
+        self.trace_file = trace_file
+        self._file_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._ready = False
+        self._enabled = False
+        self.tracer = self._stage_hist = self._size_hist = self._wait_hist = None
+
+    @property
+    def enabled(self):
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    self._init()
+                    self._ready = True
+        return self._enabled
+
+    def _init(self):
+        if self.trace_file is None:
+            from .config import Config
+
+            self.trace_file = Config.from_env().trace_file
+        try:
+            from opentelemetry import metrics, trace
+
+            self.tracer = trace.get_tracer("travel_agent")
+            meter = metrics.get_meter("travel_agent")
+            self._stage_hist = meter.create_histogram(
+                "travel_agent.stage.duration", unit="s", description="Wall-clock time per pipeline stage"
+            )
+            self._size_hist = meter.create_histogram(
+                "travel_agent.payload.size", unit="By", description="Request/response payload sizes"
+            )
+            self._wait_hist = meter.create_histogram(
+                "travel_agent.scheduler.queue_wait", unit="s", description="Time spent queued for a scheduler slot"
+            )
+        except Exception:
+            pass
+        self._enabled = bool(self.tracer is not None or self.trace_file)
+
+    def _export(self, name, start, seconds, attrs, status, ids):
+        if not self.trace_file:
+            return
+        trace_id, span_id, parent_id = ids
+        line = json.dumps({
+            "name": name,
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "start": round(start, 6),
+            "duration_ms": round(seconds * 1000, 3),
+            "status": status,
+            "thread": threading.current_thread().name,
+            "attributes": attrs,
+        }, default=str)
+        try:
+            with self._file_lock, open(self.trace_file, "a", encoding="utf-8") as fh:
+                fh.write(line + "\n")
+        except Exception:
+            pass
+
+    def _ids(self):
+        parent = self._current.get()
+        trace_id = parent[0] if parent else os.urandom(16).hex()
+        return trace_id, os.urandom(8).hex(), parent[1] if parent else None
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        """Time a stage as the current span; yields a handle for attributes."""
+        if not self.enabled:
+            yield _SpanHandle(name, {})
+            return
+        ids = self._ids()
+        token = self._current.set((ids[0], ids[1]))
+        otel_cm = self.tracer.start_as_current_span(name) if self.tracer is not None else contextlib.nullcontext()
+        start, t0, status = time.time(), time.perf_counter(), "ok"
+        with otel_cm as otel_span:
+            handle = _SpanHandle(name, {}, otel_span)
+            for k, v in attrs.items():
+                handle.set(k, v)
+            try:
+                yield handle
+            except BaseException as e:
+                status = "cancelled" if isinstance(e, GeneratorExit) else "error"
+                handle.set("error", f"{type(e).__name__}: {e}")
+                raise
+            finally:
+                seconds = time.perf_counter() - t0
+                self._current.reset(token)
+                self.observe(name, seconds, status)
+                self._export(name, start, seconds, handle.attrs, status, ids)
+
+    def record(self, name, seconds, status="ok", **attrs):
+        """Record an already-timed stage (e.g. one spanning generator yields)."""
+        if not self.enabled:
+            return
+        start = time.time() - seconds
+        if self.tracer is not None:
+            otel_span = self.tracer.start_span(name, start_time=int(start * 1e9))
+            for k, v in attrs.items():
+                _SpanHandle(name, {}, otel_span).set(k, v)
+            otel_span.end()
+        self.observe(name, seconds, status)
+        self._export(name, start, seconds, {k: v for k, v in attrs.items() if v is not None}, status, self._ids())
+
+    def observe(self, stage, seconds, status="ok"):
+        if self.enabled and self._stage_hist is not None:
+            self._stage_hist.record(seconds, {"stage": stage, "status": status})
+
+    def observe_size(self, kind, nbytes):
+        if self.enabled and self._size_hist is not None:
+            self._size_hist.record(nbytes, {"kind": kind})
+
+    def observe_wait(self, resource, lane, seconds):
+        if self.enabled and self._wait_hist is not None:
+            self._wait_hist.record(seconds, {"resource": resource, "lane": lane})
+
+
+telemetry = _Telemetry()
+span = telemetry.span
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """`executor.submit` that carries the caller's span/OTel context into the worker."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
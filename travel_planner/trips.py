@@ -0,0 +1,598 @@
+"""Trip planning: the Cortex Agent call and wiki enrichment, streamed, batched and cached."""
+
+import concurrent.futures, threading, time
+
+from .caching import TripResponseCache
+from .config import get_config, singleton
+from .cortex_client import CortexStreamCollector, call_cortex_agent, extract_agent_text, iter_cortex_agent_events
+from .gazetteer import gazetteer_destinations
+from .result_sets import agent_tables, decode_result_set
+from .scheduler import BranchCancelled, DeadlineExceeded, deadline_budget, shared_executor, time_left
+from .telemetry import span, submit_in_context, telemetry
+from .wiki import new_wiki_prefetcher, wiki_destination_info, wiki_destination_info_from_prompt, wiki_title_key
+
+
+def _branch_executor():
+    return shared_executor("trip-branch", get_config().trip_branch_workers)
+
+
+def _timed_call(fn, *args, **kwargs):
+    """Run `fn` and return `(result, error, elapsed_seconds)` without raising."""
+    t0 = time.perf_counter()
+    try:
+        return fn(*args, **kwargs), None, time.perf_counter() - t0
+    except Exception as e:
+        return None, e, time.perf_counter() - t0
+
+
+def run_branches(branches, cancel_event=None, poll_seconds=0.05):
+    """
+    Fan out independent pipeline branches on the shared branch executor.
+
+    `branches` maps a branch name to `(fn, timeout_seconds)`; each `fn` is
+    called with a per-branch `threading.Event` it may poll to stop early.
+    Waiting stops for a branch when it finishes, its timeout elapses, or the
+    caller sets `cancel_event` (which also signals every still-running branch).
+
+    Returns `(results, timings)`: `results[name]` is the branch return value
+    or an `{"error": ...}` dict, and `timings[name]` records the status and
+    elapsed seconds of that branch.
+    """
+    start = time.perf_counter()
+    stops = {name: threading.Event() for name in branches}
+    pending = {
+        name: submit_in_context(_branch_executor(), _timed_call, fn, stops[name])
+        for name, (fn, _) in branches.items()
+    }
+    results, timings = {}, {}
+
+    def _abandon(name, status, message):
+        stops[name].set()
+        pending.pop(name).cancel()
+        results[name] = {"error": message}
+        timings[name] = {"status": status, "seconds": round(time.perf_counter() - start, 3)}
+
+    while pending:
+        for name in [n for n, f in pending.items() if f.done()]:
+            value, err, elapsed = pending.pop(name).result()
+            if isinstance(err, BranchCancelled):
+                results[name] = {"error": "cancelled"}
+                timings[name] = {"status": "cancelled", "seconds": round(elapsed, 3)}
+            elif isinstance(err, DeadlineExceeded):
+                results[name] = {"error": str(err)}
+                timings[name] = {"status": "timeout", "seconds": round(elapsed, 3)}
+            elif err is not None:
+                results[name] = {"error": str(err)}
+                timings[name] = {"status": "error", "seconds": round(elapsed, 3)}
+            else:
+                results[name] = value
+                timings[name] = {"status": "ok", "seconds": round(elapsed, 3)}
+        if not pending:
+            break
+        if cancel_event is not None and cancel_event.is_set():
+            for name in list(pending):
+                _abandon(name, "cancelled", "cancelled")
+            break
+        now = time.perf_counter() - start
+        for name in list(pending):
+            timeout_s = branches[name][1]
+            if timeout_s and now >= timeout_s:
+                _abandon(name, "timeout", f"{name} timed out after {timeout_s:g}s")
+        if pending:
+            concurrent.futures.wait(
+                list(pending.values()),
+                timeout=poll_seconds,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+    timings["total_seconds"] = round(time.perf_counter() - start, 3)
+    return results, timings
+
+
+@singleton
+def _trip_cache():
+    cfg = get_config()
+    return TripResponseCache(
+        max_entries=cfg.trip_cache_max_entries,
+        ttl_seconds=cfg.trip_cache_ttl_seconds,
+        semantic=cfg.trip_cache_semantic,
+        threshold=cfg.trip_cache_similarity,
+    )
+
+
+def trip_cache_stats():
+    """Hit/miss counters for the trip response cache."""
+    return _trip_cache().stats()
+
+
+def cortex_agent_trip(user_input, execution=None, cancel_event=None, use_cache=True):
+    """
+    Plan a trip with the Snowflake Cortex Agent, answering from the trip
+    response cache when an equivalent prompt was planned recently.
+
+    `raw_context["cache"]` reports whether the response was a cache hit (and
+    whether it matched exactly or by similarity); `use_cache=False` skips the
+    lookup but still refreshes the cache with the new result.
+    """
+    with span("cortex_agent_trip", execution=execution or get_config().trip_execution_mode, use_cache=use_cache) as sp:
+        if use_cache:
+            cached = _trip_cache().lookup(user_input)
+            if cached is not None:
+                sp.set("cache_hit", True)
+                sp.set("cache_match", cached["raw_context"]["cache"].get("match"))
+                return cached
+        sp.set("cache_hit", False)
+        result = _cortex_agent_trip_uncached(user_input, execution=execution, cancel_event=cancel_event)
+        if isinstance(result.get("raw_context"), dict):
+            result["raw_context"]["cache"] = {"hit": False, "bypassed": not use_cache}
+        sp.set("error", result.get("error"))
+        _trip_cache().store(user_input, result)
+        return result
+
+
+def _cortex_agent_trip_uncached(user_input, execution=None, cancel_event=None):
+    """
+    Single-call mode that delegates the entire planning task to your Snowflake
+    Cortex Agent object (e.g. travel_db.public.TRAVEL_AGENT). This bypasses
+    the explicit Cortex Analyst + Cortex Search calls in this file and lets
+    the configured agent orchestration handle everything.
+
+    In `"concurrent"` execution (the default, see TRIP_EXECUTION_MODE) the
+    Cortex Agent request and the Wikipedia enrichment pipeline start at the
+    same time, so latency is bounded by the slower branch rather than their
+    sum. Per-branch timings are reported under `raw_context["timings"]`.
+    Destinations the agent mentions while it streams are handed to the wiki
+    branch through a `WikiPrefetcher`.
+
+    Both branch timeouts are capped to the request deadline. A branch cut
+    off by it leaves what is ready: the plan text streamed so far, or the
+    trip without wiki info, marked `"partial": true` (see `_mark_partial`).
+    """
+    execution = (execution or get_config().trip_execution_mode).lower()
+    if execution != "concurrent":
+        return _cortex_agent_trip_sequential(user_input)
+
+    transport = {}
+    prefetch = new_wiki_prefetcher()
+    # Added to on the cortex branch thread, which may still be running when a
+    # timeout makes this thread read what has streamed in so far.
+    streamed = CortexStreamCollector()
+    streamed_lock = threading.Lock()
+
+    def _on_cortex_event(ev):
+        if ev["type"] == "transport":
+            transport["cortex_http_attempts"] = ev["attempts"]
+            if "route" in ev:
+                transport["cortex_route"] = ev["route"]
+            return
+        with streamed_lock:
+            streamed.add(ev)
+        if prefetch is not None:
+            prefetch.observe(ev)
+
+    def _cortex_branch(stop):
+        try:
+            raw = call_cortex_agent(user_input, on_event=_on_cortex_event, cancel_event=stop)
+        except BaseException:
+            if prefetch is not None:
+                prefetch.cancel()
+            raise
+        if prefetch is not None:
+            if isinstance(raw, dict) and raw.get("error"):
+                prefetch.cancel()
+            else:
+                prefetch.finish()
+        return raw
+
+    results, timings = run_branches(
+        {
+            "cortex_agent": (_cortex_branch, deadline_budget(get_config().cortex_branch_timeout_seconds)),
+            "wiki": (
+                lambda stop: wiki_destination_info_from_prompt(user_input, cancel_event=stop, prefetch=prefetch),
+                deadline_budget(get_config().wiki_branch_timeout_seconds),
+            ),
+        },
+        cancel_event=cancel_event,
+    )
+    timings.update(transport)
+    if prefetch is not None:
+        # The wiki branch may have given up waiting on a cortex branch that
+        # timed out; don't leave its queued fetches behind.
+        prefetch.cancel()
+    raw = results["cortex_agent"]
+    if timings["cortex_agent"]["status"] == "timeout":
+        # Keep whatever plan text and tables had streamed in before the cut-off.
+        with streamed_lock:
+            so_far = streamed.result()
+        if isinstance(so_far, dict) and not so_far.get("error"):
+            raw = {**so_far, "incomplete": True}
+    if isinstance(raw, dict) and raw.get("error"):
+        out = {
+            "error": raw["error"],
+            "raw_context": {**raw, "timings": timings},
+        }
+        if timings["cortex_agent"]["status"] == "timeout" and not results["wiki"].get("error"):
+            out["raw_context"]["wiki_destination_info"] = results["wiki"]
+            _mark_partial(out, ["trip_plan"])
+        return out
+
+    text = extract_agent_text(raw)
+    ctx = {
+        "cortex_agent_response": raw,
+        "wiki_destination_info": results["wiki"],
+        "timings": timings,
+    }
+    if prefetch is not None:
+        ctx["wiki_prefetch"] = prefetch.stats()
+    result = {
+        "best_trip_recommendation": text,
+        "tables": agent_tables(raw),
+        "raw_context": ctx,
+    }
+    return _mark_partial(result, _missing_parts(timings, results["wiki"]))
+
+
+def _missing_parts(timings, wiki_info):
+    """Parts of a trip response cut off by a timeout or the request deadline."""
+    missing = []
+    if timings.get("cortex_agent", {}).get("status") == "timeout":
+        missing.append("trip_plan")
+    if timings.get("wiki", {}).get("status") == "timeout":
+        missing.append("wiki_destination_info")
+    elif isinstance(wiki_info, dict):
+        missing.extend(wiki_info.get("missing") or [])
+    return missing
+
+
+def _mark_partial(result, missing):
+    """Flag `result` as `"partial": true` with the `missing` part names, if there are any."""
+    if missing:
+        result["partial"] = True
+        result["missing"] = missing
+    return result
+
+
+def _cortex_agent_trip_sequential(user_input):
+    """Original one-after-the-other flow: Cortex Agent first, then Wikipedia."""
+    t0 = time.perf_counter()
+    prefetch = new_wiki_prefetcher()
+    raw = call_cortex_agent(user_input, on_event=prefetch.observe if prefetch is not None else None)
+    timings = {"cortex_agent": {"status": "ok", "seconds": round(time.perf_counter() - t0, 3)}}
+    if isinstance(raw, dict) and raw.get("error"):
+        if prefetch is not None:
+            prefetch.cancel()
+        return {"error": raw["error"], "raw_context": raw}
+    if prefetch is not None:
+        prefetch.finish()
+
+    # Try to enrich the context with Wikipedia destination info inferred from
+    # the same user input. This does NOT affect the main trip plan text, which
+    # still comes entirely from the Cortex Agent in Snowflake.
+    wiki_info = None
+    t1 = time.perf_counter()
+    try:
+        wiki_info = wiki_destination_info_from_prompt(user_input, prefetch=prefetch)
+        status = "ok"
+    except DeadlineExceeded as e:
+        wiki_info = {"error": str(e)}
+        status = "timeout"
+    except Exception as e:
+        wiki_info = {"error": str(e)}
+        status = "error"
+    timings["wiki"] = {"status": status, "seconds": round(time.perf_counter() - t1, 3)}
+    timings["total_seconds"] = round(time.perf_counter() - t0, 3)
+
+    text = extract_agent_text(raw)
+    ctx = {"cortex_agent_response": raw}
+    if wiki_info is not None:
+        ctx["wiki_destination_info"] = wiki_info
+    if prefetch is not None:
+        ctx["wiki_prefetch"] = prefetch.stats()
+    ctx["timings"] = timings
+
+    result = {
+        "best_trip_recommendation": text,
+        "tables": agent_tables(raw),
+        "raw_context": ctx,
+    }
+    return _mark_partial(result, _missing_parts(timings, wiki_info))
+
+
+def cortex_agent_trip_stream(user_input, cancel_event=None, use_cache=True):
+    """
+    Streaming variant of `cortex_agent_trip` for the AgentCore entrypoint.
+
+    Yields small JSON-safe dicts, one per SSE event, as work completes:
+
+    - `{"type": "delta", "text": ...}` Cortex Agent answer text as it streams
+    - `{"type": "status", "message": ...}` Cortex planning status updates
+    - `{"type": "tool_use", "name": ...}` / `{"type": "table", ...}`
+    - `{"type": "wiki", "data": {...}}` Wikipedia info once the wiki branch is done
+    - `{"type": "final", "data": {...}}` the same dict `cortex_agent_trip` returns
+    - `{"type": "error", "error": ...}` if the Cortex Agent call fails
+
+    The Wikipedia pipeline runs in the background from the start, prefetching
+    destinations as the agent mentions them; closing the generator (e.g.
+    client disconnect), a failed Cortex call or setting `cancel_event` stops it.
+    When the request deadline passes, even while the agent is silent, the
+    plan streamed so far (and the wiki info, if ready) is sent as a `final`
+    result marked `"partial": true`.
+    A trip response cache hit is returned as a single `final` event.
+    """
+    if use_cache:
+        cached = _trip_cache().lookup(user_input)
+        if cached is not None:
+            yield {"type": "final", "data": cached}
+            return
+    t0 = time.perf_counter()
+    stop = threading.Event()
+    prefetch = new_wiki_prefetcher()
+    wiki_future = submit_in_context(
+        _branch_executor(),
+        _timed_call,
+        lambda: wiki_destination_info_from_prompt(user_input, cancel_event=stop, prefetch=prefetch),
+    )
+    wiki_sent = False
+    timings = {}
+
+    def _wiki_event():
+        value, err, elapsed = wiki_future.result()
+        if isinstance(err, BranchCancelled):
+            value, status = {"error": "cancelled"}, "cancelled"
+        elif isinstance(err, DeadlineExceeded):
+            value, status = {"error": str(err)}, "timeout"
+        elif err is not None:
+            value, status = {"error": str(err)}, "error"
+        else:
+            status = "ok"
+        timings["wiki"] = {"status": status, "seconds": round(elapsed, 3)}
+        return value
+
+    collector = CortexStreamCollector()
+    raw = None
+    stats, status = {}, "ok"
+    events = iter_cortex_agent_events(user_input, stats=stats)
+    timed_out, cutoff = False, None
+    table_count = 0
+    try:
+        yield {"type": "status", "message": "started"}
+        for ev in events:
+            if cancel_event is not None and cancel_event.is_set():
+                yield {"type": "error", "error": "cancelled"}
+                return
+            kind = ev["type"]
+            if kind == "result":
+                if isinstance(ev["data"], dict) and ev["data"].get("deadline_exceeded"):
+                    # A stalled read was aborted at the deadline: keep what streamed in.
+                    timed_out, cutoff = True, ev["data"]
+                else:
+                    raw = ev["data"]
+                break
+            left = time_left()
+            if left is not None and left <= 0:
+                # Keep the event already in hand; only stop waiting for more.
+                timed_out = True
+                if kind != "transport":
+                    collector.add(ev)
+                events.close()
+                break
+            if kind == "transport":
+                timings["cortex_http_attempts"] = ev["attempts"]
+                if "route" in ev:
+                    timings["cortex_route"] = ev["route"]
+                continue
+            collector.add(ev)
+            if prefetch is not None:
+                prefetch.observe(ev)
+            if kind == "text_delta":
+                stats.setdefault("first_delta_ms", round((time.perf_counter() - t0) * 1000, 3))
+                yield {"type": "delta", "text": ev.get("text", "")}
+            elif kind == "status":
+                data = ev["data"] if isinstance(ev["data"], dict) else {}
+                yield {"type": "status", "message": data.get("message") or data.get("status")}
+            elif kind == "tool_use":
+                yield {"type": "tool_use", "name": ev.get("name"), "input": ev.get("input")}
+            elif kind == "table":
+                yield {
+                    "type": "table",
+                    "title": ev.get("title"),
+                    # Position of this table in the final `tables` list, which skips empty results.
+                    "index": table_count if ev.get("result_set") else None,
+                    "result_set": ev.get("result_set"),
+                    "table": decode_result_set(ev.get("result_set"), title=ev.get("title")),
+                }
+                table_count += bool(ev.get("result_set"))
+            if not wiki_sent and wiki_future.done():
+                wiki_sent = True
+                wiki_info = _wiki_event()
+                yield {"type": "wiki", "data": wiki_info}
+        if raw is None:
+            raw = collector.result() or cutoff or {"error": "Cortex Agent returned an empty event stream"}
+            if timed_out and not raw.get("error"):
+                raw = {**raw, "incomplete": True}
+        cortex_status = "timeout" if timed_out else "error" if raw.get("error") else "ok"
+        timings["cortex_agent"] = {"status": cortex_status, "seconds": round(time.perf_counter() - t0, 3)}
+        if raw.get("error"):
+            stop.set()
+            status = "error"
+            yield {"type": "error", "error": raw["error"], "raw_context": {**raw, "timings": timings}}
+            return
+        if prefetch is not None:
+            prefetch.finish()
+
+        if not wiki_sent:
+            remaining = get_config().wiki_branch_timeout_seconds - (time.perf_counter() - t0) if get_config().wiki_branch_timeout_seconds else None
+            remaining = deadline_budget(remaining)
+            try:
+                concurrent.futures.wait([wiki_future], timeout=max(0.0, remaining) if remaining is not None else None)
+            except Exception:
+                pass
+            if wiki_future.done():
+                wiki_info = _wiki_event()
+            else:
+                stop.set()
+                wiki_info = {"error": f"wiki timed out after {time.perf_counter() - t0:.1f}s"}
+                timings["wiki"] = {"status": "timeout", "seconds": round(time.perf_counter() - t0, 3)}
+            yield {"type": "wiki", "data": wiki_info}
+        timings["total_seconds"] = round(time.perf_counter() - t0, 3)
+
+        ctx = {
+            "cortex_agent_response": raw,
+            "wiki_destination_info": wiki_info,
+            "timings": timings,
+            "cache": {"hit": False, "bypassed": not use_cache},
+        }
+        if prefetch is not None:
+            ctx["wiki_prefetch"] = prefetch.stats()
+        result = {
+            "best_trip_recommendation": extract_agent_text(raw),
+            "tables": agent_tables(raw),
+            "raw_context": ctx,
+        }
+        _mark_partial(result, _missing_parts(timings, wiki_info))
+        _trip_cache().store(user_input, result)
+        yield {"type": "final", "data": result}
+    except GeneratorExit:
+        status = "cancelled"
+        raise
+    finally:
+        stop.set()
+        if prefetch is not None:
+            prefetch.cancel()
+        # Spans can't stay "current" across yields, so the stream is recorded
+        # as one already-timed span once it finishes.
+        telemetry.record(
+            "cortex_agent_trip_stream",
+            time.perf_counter() - t0,
+            status=status,
+            sse_events=stats.get("events", 0),
+            sse_data_bytes=stats.get("data_bytes", 0),
+            sse_parse_ms=round(stats.get("parse_seconds", 0.0) * 1000, 3),
+            first_delta_ms=stats.get("first_delta_ms"),
+        )
+
+
+def _batch_items(prompts):
+    """Normalise batch input (strings or `{"id", "prompt"|"query"}` dicts) to `[(id, prompt)]`."""
+    items = []
+    for p in prompts:
+        if isinstance(p, dict):
+            items.append((p.get("id"), str(p.get("prompt") or p.get("query") or "").strip()))
+        else:
+            items.append((None, str(p or "").strip()))
+    return items
+
+
+def _batch_run_item(index, item_id, prompt, execution, use_cache, cancel_event):
+    t0 = time.perf_counter()
+    result, error = None, None
+    try:
+        if not prompt:
+            error = "empty prompt"
+        else:
+            result = cortex_agent_trip(prompt, execution=execution, cancel_event=cancel_event, use_cache=use_cache)
+            error = result.get("error") if isinstance(result, dict) else None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    ev = {
+        "type": "item",
+        "index": index,
+        "id": item_id,
+        "prompt": prompt,
+        "status": "error" if error else "ok",
+        "seconds": round(time.perf_counter() - t0, 3),
+    }
+    if error:
+        ev["error"] = error
+    if result is not None:
+        ev["result"] = result
+    return ev
+
+
+def cortex_agent_trip_batch(prompts, max_concurrency=None, execution=None, use_cache=True, cancel_event=None):
+    """
+    Plan many trips in one call. Each prompt runs through `cortex_agent_trip`
+    with at most `max_concurrency` (capped at BATCH_MAX_CONCURRENCY) in flight,
+    and this generator yields one `{"type": "item", "index", "id", "prompt",
+    "status", "seconds", "result"|"error"}` event per prompt as it completes,
+    then a `{"type": "summary"}` event. A failing prompt only fails its own
+    item.
+
+    Wikipedia lookups are shared: destinations the gazetteer finds across the
+    whole batch are fetched once up front, and prompts that race for the same
+    title join a single in-flight fetch.
+    """
+    t0 = time.perf_counter()
+    if isinstance(prompts, str):
+        prompts = [prompts]
+    if not isinstance(prompts, list) or not prompts:
+        yield {"type": "error", "error": "prompts must be a non-empty list"}
+        return
+    if len(prompts) > get_config().batch_max_items:
+        yield {"type": "error", "error": f"batch too large: {len(prompts)} prompts (max {get_config().batch_max_items})"}
+        return
+
+    items = _batch_items(prompts)
+    limit = max(1, min(int(max_concurrency or get_config().batch_max_concurrency), get_config().batch_max_concurrency))
+    stop = threading.Event()
+    counts = {"ok": 0, "error": 0}
+    status = "ok"
+
+    prefetch_titles = []
+    if get_config().destination_extractor != "llm":
+        for _, prompt in items:
+            prefetch_titles.extend(gazetteer_destinations(prompt)["destinations"])
+    if prefetch_titles:
+        submit_in_context(_branch_executor(), wiki_destination_info, prefetch_titles)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=limit, thread_name_prefix="batch")
+    try:
+        futures = [
+            submit_in_context(executor, _batch_run_item, i, item_id, prompt, execution, use_cache, stop)
+            for i, (item_id, prompt) in enumerate(items)
+        ]
+        for f in concurrent.futures.as_completed(futures):
+            ev = f.result()
+            counts[ev["status"]] += 1
+            yield ev
+            if cancel_event is not None and cancel_event.is_set():
+                status = "cancelled"
+                break
+        yield {
+            "type": "summary",
+            "items": len(items),
+            "ok": counts["ok"],
+            "errors": counts["error"],
+            "not_run": len(items) - counts["ok"] - counts["error"],
+            "max_concurrency": limit,
+            "wiki_prefetch_titles": len({wiki_title_key(t) for t in prefetch_titles}),
+            "seconds": round(time.perf_counter() - t0, 3),
+        }
+    except GeneratorExit:
+        status = "cancelled"
+        raise
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        telemetry.record(
+            "cortex_agent_trip_batch",
+            time.perf_counter() - t0,
+            status=status,
+            items=len(items),
+            ok=counts["ok"],
+            errors=counts["error"],
+            max_concurrency=limit,
+        )
+
+
+def collect_batch(events):
+    """Drain a batch generator into `{"items": [...in input order], "summary": {...}}`."""
+    items, summary = [], None
+    for ev in events:
+        if ev.get("type") == "item":
+            items.append(ev)
+        elif ev.get("type") == "summary":
+            summary = ev
+        else:
+            return ev
+    items.sort(key=lambda ev: ev["index"])
+    return {"items": items, "summary": summary}
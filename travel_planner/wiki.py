@@ -0,0 +1,705 @@
+"""Wikipedia destination info: summary fetches, caching, prefetch and travel summaries."""
+
+import concurrent.futures, json, threading, time, urllib.parse
+
+from .agents import agent_pool
+from .caching import TTLCache
+from .config import get_config, singleton
+from .gazetteer import gazetteer_destinations, get_gazetteer
+from .scheduler import BranchCancelled, DeadlineExceeded, check_cancel, limits, shared_executor, stage_timeout
+from .serialization import json_dumps
+from .telemetry import span, submit_in_context
+
+
+@singleton
+def _wiki_summary_cache():
+    cfg = get_config()
+    return TTLCache(
+        "wiki_summary",
+        max_entries=cfg.wiki_cache_max_entries,
+        ttl_seconds=cfg.wiki_cache_ttl_seconds,
+        path=cfg.wiki_cache_path or None,
+    )
+
+
+@singleton
+def _travel_summary_cache():
+    cfg = get_config()
+    return TTLCache(
+        "travel_summary",
+        max_entries=cfg.travel_summary_cache_max_entries,
+        ttl_seconds=cfg.travel_summary_cache_ttl_seconds,
+        path=cfg.wiki_cache_path or None,
+    )
+
+
+def wiki_cache_stats():
+    """Hit/miss counters for the Wikipedia page summary cache."""
+    return _wiki_summary_cache().stats()
+
+
+def travel_summary_cache_stats():
+    """Hit/miss counters for the per-destination-set travel summary cache."""
+    return _travel_summary_cache().stats()
+
+
+def _wiki_build_destinations_from_input(user_input: str, model: str = None, extractor: str = None,
+                                        prefetch=None, cancel_event=None):
+    """
+    Extract destination names from a free-form travel query. This is only
+    used for the optional Wikipedia lookup mode.
+
+    With the default "auto" extractor (see DESTINATION_EXTRACTOR) the local
+    gazetteer answers without a network call and Claude (via Strands) is
+    only asked when the gazetteer finds no destination. If a `WikiPrefetcher`
+    is watching the Cortex Agent stream, the destinations it picks up are
+    used before falling back to Claude.
+    """
+    extractor = (extractor or get_config().destination_extractor).lower()
+    with span("wiki.extract_destinations", extractor=extractor, prompt_chars=len(user_input or "")) as sp:
+        result = None
+        if extractor in ("auto", "gazetteer"):
+            local = gazetteer_destinations(user_input)
+            if local["destinations"]:
+                result = local
+            elif prefetch is not None:
+                titles = prefetch.wait_destinations(cancel_event)
+                if titles:
+                    result = {"destinations": titles, "raw": {"source": "cortex_stream", "found_in": prefetch.sources()}}
+            if result is None and extractor == "gazetteer":
+                result = local
+        if result is None:
+            result = _llm_destinations_from_input(user_input, model=model)
+        raw = result.get("raw")
+        sp.set("source", raw.get("source", "llm") if isinstance(raw, dict) else "llm")
+        sp.set("destinations", len(result["destinations"]))
+        return result
+
+
+_WIKI_EXTRACT_SYSTEM_PROMPT = (
+    "You are a travel destination extractor.\n"
+    "Given a user's natural language travel request, extract the main cities/countries\n"
+    "they are travelling to (NOT the origin city) as a JSON object:\n"
+    "{\n"
+    '  "destinations": ["<city or country>", ...]\n'
+    "}\n"
+    "- Only output valid JSON (no backticks, no explanation).\n"
+    "- Use concise Wikipedia-friendly titles, e.g. 'Singapore', 'Tokyo', 'Bali', 'Japan'.\n"
+    "- If you can't infer any, return {\"destinations\": []}.\n"
+)
+
+
+def _llm_destinations_from_input(user_input: str, model: str = None):
+    """
+    Use Claude (via Strands) to extract destination names from a free-form
+    travel query.
+    """
+    m = model or get_config().model_id
+    raw = agent_pool().call(m, _WIKI_EXTRACT_SYSTEM_PROMPT, user_input or "")
+    obj = _parse_llm_json(raw)
+    if obj is None:
+        return {"destinations": [], "raw": raw}
+    return {"destinations": _llm_destination_list(obj), "raw": obj}
+
+
+def _parse_llm_json(raw: str):
+    """Parse a model reply as a JSON object, falling back to its first {...} block."""
+    try:
+        obj = json.loads(raw)
+    except Exception:
+        import re
+
+        mobj = re.search(r"\{.*\}", raw, re.S)
+        if not mobj:
+            return None
+        try:
+            obj = json.loads(mobj.group(0))
+        except Exception:
+            return None
+    return obj if isinstance(obj, dict) else None
+
+
+def _llm_destination_list(obj: dict):
+    dests = obj.get("destinations") or []
+    if not isinstance(dests, list):
+        dests = []
+    # Normalise to simple strings
+    return [str(d).strip() for d in dests if str(d).strip()]
+
+
+_wiki_session_obj = None
+_wiki_session_lock = threading.Lock()
+
+
+def _wiki_executor():
+    """Per-title Wikipedia fetches, at most WIKI_MAX_CONCURRENCY at a time."""
+    return shared_executor("wiki", max(1, get_config().wiki_max_concurrency))
+
+
+def _wiki_session():
+    """
+    Shared `requests.Session` for Wikipedia so every title reuses the same
+    keep-alive connection pool to en.wikipedia.org instead of paying a fresh
+    TCP+TLS handshake per call.
+    """
+    global _wiki_session_obj
+    if _wiki_session_obj is None:
+        with _wiki_session_lock:
+            if _wiki_session_obj is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                sess = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, get_config().wiki_max_concurrency))
+                sess.mount("https://", adapter)
+                sess.mount("http://", adapter)
+                sess.headers.update({"User-Agent": get_config().wiki_user_agent})
+                _wiki_session_obj = sess
+    return _wiki_session_obj
+
+
+def wiki_title_key(title: str) -> str:
+    """Normalise a page title so 'tokyo', 'Tokyo ' and 'Tokyo' share one fetch."""
+    return " ".join((title or "").replace("_", " ").split()).casefold()
+
+
+def _wiki_get_page_summary(title: str):
+    """
+    Call Wikipedia's REST API `/page/summary/{title}` to fetch a short summary
+    for a given page title.
+
+    This follows the reference OpenAPI spec the user provided and respects the
+    required `User-Agent` header.
+    """
+    title = (title or "").strip()
+    if not title:
+        return {"error": "empty_title"}
+
+    # Wikipedia expects spaces as underscores in titles
+    encoded_title = urllib.parse.quote(title.replace(" ", "_"))
+    cfg = get_config()
+    url = f"{cfg.wiki_base_url}/page/summary/{encoded_title}"
+    headers = {"User-Agent": cfg.wiki_user_agent}
+    timeout_s = stage_timeout(cfg.wiki_timeout_seconds, "the Wikipedia fetch")
+
+    with span("wiki.fetch_summary", title=title) as sp:
+        return _wiki_fetch_summary(url, title, headers, timeout_s, sp)
+
+
+def _wiki_fetch_summary(url, title, headers, timeout_s, sp):
+    try:
+        with limits()["wikipedia"].acquire() as slot:
+            sp.set("queue_wait_ms", round(slot.wait_seconds * 1000, 3))
+            resp = _wiki_session().get(url, headers=headers, timeout=timeout_s)
+        sp.set("status_code", resp.status_code)
+        if resp.status_code == 404:
+            return {"title": title, "error": "not_found", "status_code": 404}
+        resp.raise_for_status()
+        data = resp.json()
+
+        # Return a richer, travel-planner–friendly structure
+        content_urls = data.get("content_urls") or {}
+        desktop = content_urls.get("desktop") or {}
+        thumb_obj = data.get("thumbnail") or {}
+        orig_obj = data.get("originalimage") or {}
+        thumb_src = thumb_obj.get("source")
+        orig_src = orig_obj.get("source")
+
+        images = []
+        if thumb_src:
+            images.append(thumb_src)
+        if orig_src and orig_src != thumb_src:
+            images.append(orig_src)
+
+        return {
+            "title": data.get("title", title),
+            "extract": data.get("extract"),
+            "lang": data.get("lang", "en"),
+            "page_url": desktop.get("page"),
+            "thumbnail": thumb_src,
+            "images": images,
+            "description": data.get("description"),
+            "raw": data,
+        }
+    except Exception as e:
+        return {"title": title, "error": str(e)}
+
+
+def _wiki_cache_store(title: str, summary: dict):
+    """Cache successful summaries and 404s; transient errors are not cached."""
+    if not isinstance(summary, dict):
+        return
+    if summary.get("status_code") == 404:
+        _wiki_summary_cache().set(wiki_title_key(title), summary, ttl_seconds=get_config().wiki_cache_negative_ttl_seconds)
+    elif not summary.get("error"):
+        _wiki_summary_cache().set(wiki_title_key(title), summary)
+
+
+# Titles currently being fetched, keyed by `wiki_title_key`, so concurrent
+# requests (e.g. the items of one batch) that name the same destination wait
+# for a single fetch instead of each missing the cache and fetching it again.
+_wiki_inflight = {}
+_wiki_inflight_lock = threading.Lock()
+
+
+def _wiki_fetch_shared(title: str, inline: bool = False):
+    """
+    Return a future for `title`'s summary, joining a fetch already in flight
+    for the same title or starting one (on the wiki executor, or in the
+    calling thread with `inline=True`). The result is cached before the
+    in-flight entry is released.
+    """
+    key = wiki_title_key(title)
+    with _wiki_inflight_lock:
+        fut = _wiki_inflight.get(key)
+        if fut is not None:
+            return fut
+        fut = _wiki_inflight[key] = concurrent.futures.Future()
+
+    def _run():
+        try:
+            summary = _wiki_get_page_summary(title)
+            _wiki_cache_store(title, summary)
+        except Exception as e:
+            summary = {"title": title, "error": str(e)}
+        with _wiki_inflight_lock:
+            _wiki_inflight.pop(key, None)
+        fut.set_result(summary)
+
+    if inline:
+        _run()
+    else:
+        submit_in_context(_wiki_executor(), _run)
+    return fut
+
+
+def _wiki_get_page_summaries(titles, max_concurrency=None):
+    """
+    Batched `_wiki_get_page_summary`: drops duplicate titles (by normalised
+    title, keeping the first spelling), serves what it can from the summary
+    cache, fetches the rest concurrently over the shared connection pool with
+    at most `max_concurrency` requests in flight (joining fetches other
+    requests already started), and returns `(unique_titles, summaries,
+    cache_hits)` in input order.
+    """
+    unique, seen = [], set()
+    for t in titles:
+        key = wiki_title_key(t)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(t)
+
+    summaries = [None] * len(unique)
+    to_fetch = []
+    for idx, t in enumerate(unique):
+        cached = _wiki_summary_cache().get(wiki_title_key(t))
+        if cached is not None:
+            summaries[idx] = cached
+        else:
+            to_fetch.append(idx)
+    cache_hits = len(unique) - len(to_fetch)
+
+    limit = max(1, int(max_concurrency or get_config().wiki_max_concurrency))
+    in_flight = {}
+
+    def _collect(f):
+        summaries[in_flight.pop(f)] = f.result()
+
+    for idx in to_fetch:
+        if len(in_flight) >= limit:
+            done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for f in done:
+                _collect(f)
+        # A lone title is fetched in the calling thread, skipping the hand-off.
+        in_flight[_wiki_fetch_shared(unique[idx], inline=len(to_fetch) == 1)] = idx
+    for f in list(concurrent.futures.as_completed(list(in_flight))):
+        _collect(f)
+    return unique, summaries, cache_hits
+
+
+def wiki_destination_info(destinations, max_concurrency=None):
+    """
+    Get Wikipedia summaries for one or more destination titles.
+
+    IMPORTANT: This function does **not** infer destinations from the user
+    query. The caller must explicitly pass the destination titles it wants
+    summaries for, so Trip Plan behaviour remains unchanged.
+
+    Duplicate titles are dropped, cached summaries are reused, and the
+    remaining ones are fetched in parallel (up to `max_concurrency`, default
+    WIKI_MAX_CONCURRENCY); the order of `destinations` and `summaries`
+    follows the input.
+    """
+    if isinstance(destinations, str):
+        destinations = [destinations]
+    if not isinstance(destinations, list):
+        return {"error": "destinations must be a string or a list of strings"}
+
+    cleaned = [str(d).strip() for d in destinations if str(d).strip()]
+    with span("wiki.fetch_summaries", requested=len(cleaned)) as sp:
+        cleaned, summaries, cache_hits = _wiki_get_page_summaries(cleaned, max_concurrency=max_concurrency)
+        sp.set("titles", len(cleaned))
+        sp.set("cache_hits", cache_hits)
+        sp.set("cache_misses", len(cleaned) - cache_hits)
+    return {
+        "destinations": cleaned,
+        "summaries": summaries,
+        "cache": {"hits": cache_hits, "misses": len(cleaned) - cache_hits},
+    }
+
+
+_WIKI_SUMMARY_GUIDELINES = (
+    "- Briefly introduces each destination (1–2 sentences).\n"
+    "- Highlights top family-friendly attractions and experiences.\n"
+    "- Mentions any notable culture, food, or neighborhoods that visitors should know.\n"
+    "- Adds 2–4 practical notes: safety, transport basics, when to visit, or local tips.\n"
+    "- Do NOT copy raw Wikipedia text verbatim; rewrite in your own words.\n"
+    "- Do NOT invent specific statistics or facts that are not implied by the data.\n"
+)
+
+_WIKI_SUMMARY_SYSTEM_PROMPT = (
+    "You are a travel assistant.\n"
+    "You are given JSON containing Wikipedia metadata for one or more travel destinations.\n"
+    "Write a concise, traveller-focused markdown summary that:\n"
+) + _WIKI_SUMMARY_GUIDELINES
+
+_WIKI_FUSED_SYSTEM_PROMPT = (
+    "You are a travel assistant.\n"
+    "Given a user's natural language travel request:\n"
+    "1. Work out the main cities/countries they are travelling to (NOT the origin city),\n"
+    "   as concise Wikipedia-friendly titles, e.g. 'Singapore', 'Tokyo', 'Bali', 'Japan'.\n"
+    "2. Call fetch_wikipedia_summaries once with all of those titles.\n"
+    "3. From the returned summaries, write a concise, traveller-focused markdown summary that:\n"
+) + _WIKI_SUMMARY_GUIDELINES + (
+    "Reply with only a JSON object (no backticks, no explanation):\n"
+    "{\n"
+    '  "destinations": ["<city or country>", ...],\n'
+    '  "travel_summary": "<markdown summary>"\n'
+    "}\n"
+    "If you can't infer any destination, reply {\"destinations\": [], \"travel_summary\": \"\"}.\n"
+)
+
+
+def _travel_summary_key(destinations, model):
+    """Cache key for a travel summary: the model plus the destination set, ignoring order and case."""
+    keys = sorted({wiki_title_key(d) for d in destinations or []} - {""})
+    return "\x1f".join([model, *keys]) if keys else None
+
+
+def wiki_travel_summary(wiki_info: dict, model: str = None, destinations=None) -> str:
+    """
+    Use Claude (via Strands) to turn raw Wikipedia destination info into a
+    traveller-focused summary: why visit, key highlights, family-friendliness,
+    safety/logistics notes, etc.
+
+    With `destinations`, summaries are cached per destination set, so a
+    repeat set is answered without calling the model.
+    """
+    m = model or get_config().model_id
+    key = _travel_summary_key(destinations, m)
+    if key is not None:
+        cached = _travel_summary_cache().get(key)
+        if cached is not None:
+            return cached
+    try:
+        with span("wiki.travel_summary") as sp:
+            prompt = json_dumps(wiki_info or {}).decode("utf-8")
+            sp.set("input_bytes", len(prompt))
+            summary = agent_pool().call(m, _WIKI_SUMMARY_SYSTEM_PROMPT, prompt)
+            sp.set("output_chars", len(summary))
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        return f"Could not summarize Wikipedia info: {e}"
+    # A summary written without any Wikipedia data is not kept: the next
+    # request for these destinations retries the lookups instead.
+    summaries = ((wiki_info or {}).get("wiki") or {}).get("summaries") or []
+    lookups_failed = all(not isinstance(s, dict) or s.get("error") for s in summaries)
+    if key is not None and summary.strip() and not lookups_failed:
+        _travel_summary_cache().set(key, summary)
+    return summary
+
+
+_wiki_fetch_tool_obj = None
+
+
+def _wiki_fetch_tool():
+    """The Strands tool the fused pipeline gives Claude for Wikipedia lookups."""
+    global _wiki_fetch_tool_obj
+    if _wiki_fetch_tool_obj is None:
+        from strands import tool
+
+        @tool
+        def fetch_wikipedia_summaries(titles: list) -> str:
+            """
+            Fetch short Wikipedia summaries for travel destinations.
+
+            Args:
+                titles: Wikipedia page titles of the destinations, e.g. ["Tokyo", "Kyoto"].
+            """
+            info = wiki_destination_info([str(t) for t in titles or []])
+            return json_dumps([
+                {k: s.get(k) for k in ("title", "description", "extract", "error") if s.get(k)}
+                for s in info.get("summaries", [])
+                if isinstance(s, dict)
+            ]).decode("utf-8")
+
+        _wiki_fetch_tool_obj = fetch_wikipedia_summaries
+    return _wiki_fetch_tool_obj
+
+
+def _wiki_fused_call(user_input: str, model: str = None):
+    """
+    One Claude call that extracts destinations, fetches their summaries via
+    `fetch_wikipedia_summaries` and writes the travel summary. Returns
+    `(destinations, travel_summary, raw)`.
+    """
+    m = model or get_config().model_id
+    with span("wiki.fused_call", prompt_chars=len(user_input or "")) as sp:
+        raw = agent_pool().call(m, _WIKI_FUSED_SYSTEM_PROMPT, user_input or "", tools=(_wiki_fetch_tool(),))
+        obj = _parse_llm_json(raw)
+        if obj is None:
+            return [], "", raw
+        dests = _llm_destination_list(obj)
+        summary = obj.get("travel_summary")
+        summary = summary.strip() if isinstance(summary, str) else ""
+        sp.set("destinations", len(dests))
+        if summary:
+            key = _travel_summary_key(dests, m)
+            if key is not None:
+                _travel_summary_cache().set(key, summary)
+        return dests, summary, {k: v for k, v in obj.items() if k != "travel_summary"}
+
+
+class WikiPrefetcher:
+    """
+    Speculative Wikipedia prefetch fed by Cortex Agent events.
+
+    `observe()` is called with each typed event as it streams in. Places found
+    in tool-use arguments, in the CITY / DESTINATION columns of result tables
+    and in the answer text (one line at a time) are resolved through the
+    gazetteer, and each new destination's summary fetch is started on the
+    wiki executor at once, so the summaries are cached or in flight by the
+    time the wiki branch asks for them. `finish()` marks the stream as
+    complete; `cancel()` (stream failed or was abandoned) drops fetches that
+    have not started yet.
+    """
+
+    TABLE_COLUMNS = ("CITY", "DESTINATION")
+
+    def __init__(self, max_titles=None):
+        self.max_titles = get_config().wiki_prefetch_max_titles if max_titles is None else max_titles
+        self._lock = threading.Lock()
+        self._titles, self._keys, self._futures = [], set(), []
+        self._found_in = {}
+        self._text = ""  # answer text after the last scanned line
+        self._stopped = threading.Event()
+        self._changed = threading.Event()
+        self._done = threading.Event()
+
+    def observe(self, ev):
+        if self._done.is_set():
+            return
+        kind = ev.get("type")
+        if kind == "tool_use":
+            self._scan(" , ".join(self._strings(ev.get("input"))), "tool_use")
+        elif kind == "table":
+            self._scan_table(ev.get("result_set"))
+        elif kind == "text_delta":
+            self._text += ev.get("text") or ""
+            end = self._text.rfind("\n")
+            if end >= 0:
+                self._scan(self._text[:end], "text")
+                self._text = self._text[end + 1:]
+
+    @classmethod
+    def _strings(cls, value):
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            for v in value.values():
+                yield from cls._strings(v)
+        elif isinstance(value, list):
+            for v in value:
+                yield from cls._strings(v)
+
+    def _scan(self, text, source):
+        if text.strip():
+            for m in get_gazetteer().find(text):
+                if m["role"] == "destination":
+                    self._add(m["title"], source)
+
+    def _scan_table(self, rs):
+        meta = (rs or {}).get("resultSetMetaData") or {}
+        names = [str(c.get("name") or "").upper() for c in meta.get("rowType") or []]
+        for col in self.TABLE_COLUMNS:
+            if col in names:
+                i = names.index(col)
+                values = {row[i] for row in (rs or {}).get("data") or [] if i < len(row) and row[i]}
+                self._scan(" , ".join(sorted(values)), "table")
+
+    def _add(self, title, source):
+        key = wiki_title_key(title)
+        with self._lock:
+            if key in self._keys or len(self._titles) >= self.max_titles or self._stopped.is_set():
+                return
+            self._keys.add(key)
+            self._titles.append(title)
+            self._found_in[title] = source
+            self._futures.append(submit_in_context(_wiki_executor(), self._fetch, title))
+        self._changed.set()
+
+    def _fetch(self, title):
+        # Runs on a wiki worker: fetch inline, or leave a fetch already in
+        # flight to its owner. Waiting on it here could take every worker
+        # while that fetch sits queued behind them.
+        if not self._stopped.is_set() and _wiki_summary_cache().get(wiki_title_key(title)) is None:
+            _wiki_fetch_shared(title, inline=True)
+
+    def finish(self):
+        """The stream ended normally: scan any trailing text and release waiters."""
+        if self._text:
+            self._scan(self._text, "text")
+            self._text = ""
+        self._done.set()
+        self._changed.set()
+
+    def cancel(self):
+        """The stream failed: cancel fetches that have not started and release waiters."""
+        if self._done.is_set():
+            return
+        self._stopped.set()
+        with self._lock:
+            for f in self._futures:
+                f.cancel()
+        self._done.set()
+        self._changed.set()
+
+    def wait_destinations(self, cancel_event=None, timeout=None):
+        """
+        Block until at least one destination is known or the stream is over
+        (at most `timeout`, default WIKI_PREFETCH_WAIT_SECONDS) and return the
+        titles found so far. Raises BranchCancelled if `cancel_event` is set
+        or the stream failed, since the trip has no plan to enrich then.
+        """
+        deadline = time.monotonic() + (get_config().wiki_prefetch_wait_seconds if timeout is None else timeout)
+        while True:
+            check_cancel(cancel_event)
+            if self._stopped.is_set():
+                raise BranchCancelled("Cortex Agent stream failed")
+            with self._lock:
+                if self._titles or self._done.is_set():
+                    return list(self._titles)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            self._changed.wait(min(remaining, 0.1))
+            self._changed.clear()
+
+    def sources(self):
+        with self._lock:
+            return dict(self._found_in)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "titles": list(self._titles),
+                "found_in": dict(self._found_in),
+                "cancelled": self._stopped.is_set(),
+            }
+
+
+def new_wiki_prefetcher():
+    """A `WikiPrefetcher` for one Cortex Agent call, or None when WIKI_PREFETCH is off."""
+    return WikiPrefetcher() if get_config().wiki_prefetch else None
+
+
+def wiki_destination_info_from_prompt(user_input: str, cancel_event=None, prefetch=None):
+    """
+    High-level helper: given a free-form user query, first use Claude/Strands
+    to extract destination names, then fetch Wikipedia summaries for those
+    destinations.
+
+    `cancel_event` (a `threading.Event`) is checked between stages so a
+    cancelled or timed-out caller stops the pipeline at the next boundary.
+    `prefetch` is the `WikiPrefetcher` watching the matching Cortex Agent
+    call, if any.
+
+    This is an additive capability and does NOT affect the main Trip Plan flow.
+    """
+    with span("wiki.pipeline", prompt_chars=len(user_input or "")):
+        return _wiki_pipeline(user_input, cancel_event, prefetch)
+
+
+def _wiki_pipeline(user_input, cancel_event, prefetch=None):
+    check_cancel(cancel_event)
+    fused = get_config().wiki_pipeline_mode == "fused"
+    if fused and get_config().destination_extractor == "llm":
+        return _wiki_fused_pipeline(user_input, cancel_event)
+    # In fused mode the model is only needed when no destination is known locally.
+    extraction = _wiki_build_destinations_from_input(
+        user_input, extractor="gazetteer" if fused else None, prefetch=prefetch, cancel_event=cancel_event
+    )
+    check_cancel(cancel_event)
+    dests = extraction.get("destinations") or []
+    if not dests:
+        if fused:
+            return _wiki_fused_pipeline(user_input, cancel_event)
+        # Nothing inferred – return just the extraction for debugging.
+        return {
+            "destinations": [],
+            "summaries": [],
+            "extraction": extraction,
+            "travel_summary": "",
+        }
+    wiki = wiki_destination_info(dests)
+    check_cancel(cancel_event)
+    # Ask Claude to produce a traveller-oriented summary based on the wiki info
+    # (or reuse the one cached for this destination set).
+    return _wiki_with_summary(extraction, wiki, dests)
+
+
+def _wiki_with_summary(extraction, wiki, dests, travel_summary=""):
+    """
+    Final wiki pipeline result. Without a `travel_summary`, one is generated
+    (or taken from the cache); if the request deadline runs out first, the
+    destinations and summaries are returned without it, marked partial.
+    """
+    out = {
+        "destinations": wiki.get("destinations", dests),
+        "summaries": wiki.get("summaries", []),
+        "extraction": extraction,
+        "travel_summary": travel_summary,
+    }
+    if not travel_summary:
+        try:
+            out["travel_summary"] = wiki_travel_summary(
+                {"extraction": extraction, "wiki": wiki}, destinations=out["destinations"]
+            )
+        except DeadlineExceeded:
+            out.update(partial=True, missing=["travel_summary"])
+    return out
+
+
+def _wiki_fused_pipeline(user_input, cancel_event):
+    """`_wiki_pipeline` for WIKI_PIPELINE_MODE="fused": one model call instead of two."""
+    dests, travel_summary, raw = _wiki_fused_call(user_input)
+    check_cancel(cancel_event)
+    extraction = {"destinations": dests, "raw": {"source": "llm_fused", "response": raw}}
+    if not dests:
+        return {"destinations": [], "summaries": [], "extraction": extraction, "travel_summary": ""}
+    # The tool call already put these summaries in the cache.
+    wiki = wiki_destination_info(dests)
+    check_cancel(cancel_event)
+    return _wiki_with_summary(extraction, wiki, dests, travel_summary)
+
+
+def agent_specs(model_id):
+    """`AgentPool.warm` specs for the Claude calls this pipeline makes with `model_id`."""
+    specs = [
+        (model_id, _WIKI_SUMMARY_SYSTEM_PROMPT),
+        (model_id, _WIKI_EXTRACT_SYSTEM_PROMPT),
+    ]
+    if get_config().wiki_pipeline_mode == "fused":
+        specs.append((model_id, _WIKI_FUSED_SYSTEM_PROMPT, (_wiki_fetch_tool(),)))
+    return specs